@@ -1,8 +1,8 @@
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from flask_cors import CORS
 import os
+import sys
 import shutil
-import yt_dlp
 from datetime import datetime
 
 # ============================================
@@ -14,6 +14,28 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
 STATIC_DIR = os.path.join(BASE_DIR, 'static')
 
+# Sibling modules import flat, both for `python app.py` and `backend.app`
+if BASE_DIR not in sys.path: sys.path.insert(0, BASE_DIR)
+import metrics
+from lazy_imports import lazy_import
+from jobs import JobManager
+from batch import BatchProcessor
+from streaming import MediaStreamer
+from file_server import send_media_file, resolve_file, safe_filename
+from download_cache import default_cache, KEYFRAME_PADDING
+from metadata_cache import default_metadata_cache
+from tts_cache import default_tts_cache
+from tts_backends import default_backend
+from ffmpeg_utils import probe_duration, copy_range
+from audio_mixer import DubMixer
+from previews import PreviewGenerator
+from workspace import workspaces_from_env, QuotaExceeded
+from encode_scheduler import default_scheduler
+from result_store import default_result_store, canonical_json
+
+# Heavy dependencies load on first use, so cold starts (/health, /) skip them
+imageio_ffmpeg = lazy_import('imageio_ffmpeg')
+
 app = Flask(__name__, template_folder=TEMPLATE_DIR, static_folder=STATIC_DIR)
 CORS(app)
 
@@ -29,18 +51,53 @@ else:
     DESKTOP_PATH = os.path.join(os.path.expanduser('~'), 'Desktop')
     DOWNLOAD_FOLDER = os.path.join(DESKTOP_PATH, 'Media_Toolkit_Downloads')
 
-# Init Folders (Only if not Vercel, or inside route)
-if not IS_VERCEL:
-    for d in [TEMP_DIR, DOWNLOAD_FOLDER]:
-        if os.path.exists(d): shutil.rmtree(d)
-        os.makedirs(d, exist_ok=True)
+# Length of the clip kept when segmenting
+SEGMENT_SECONDS = 30
+
+# Part of every stored result's key; bump when the pipeline's output changes
+PIPELINE_VERSION = 1
+
+# Background jobs need a process that outlives the request; serverless invocations do not
+BACKGROUND_JOBS = os.environ.get('BACKGROUND_JOBS', '0' if IS_VERCEL else '1') == '1'
+
+# Background pipeline workers (fixed pool, jobs queue beyond it)
+jobs = JobManager(max_workers=int(os.environ.get('JOB_WORKERS', '2')))
+
+# Shared with MediaDownloader (MEDIA_CACHE_DIR / MEDIA_CACHE_MAX_BYTES)
+download_cache = default_cache()
+
+# Extraction results (METADATA_CACHE_TTL / METADATA_CACHE_SIZE)
+metadata_cache = default_metadata_cache()
+
+# One private scratch dir per run (WORKSPACE_FAST_DIR / WORKSPACE_QUOTA_BYTES)
+workspaces = workspaces_from_env(TEMP_DIR)
+
+# Video encodes share one thread budget (ENCODE_THREADS / ENCODE_PROFILE)
+encoder = default_scheduler()
+
+# Synthesized voice clips (TTS_CACHE_DIR / TTS_CACHE_MAX_BYTES / TTS_CACHE_MEMORY_BYTES)
+tts_cache = default_tts_cache()
+# Speech synthesizer (TTS_BACKEND: gtts, or stub for offline runs)
+tts_backend = default_backend()
+
+# Lowers the original soundtrack under the dub voice, like NeuralDubber's default
+dub_mixer = DubMixer()
+
+# download -> ffmpeg -> chunked response pipelines (/api/stream)
+streamer = MediaStreamer(metadata_cache)
+
+# Keyframe-only thumbnails and seek sprites for saved clips
+previews = PreviewGenerator()
+
+# Finished outputs by pipeline spec (RESULT_STORE_DIR / RESULT_STORE_MAX_BYTES, 0 disables)
+result_store = default_result_store()
 
 # -------------------------------------------------------------
 # ROUTES
 # -------------------------------------------------------------
 @app.route('/')
 def home():
-    return render_template('index.html')
+    return render_template('index.html', background_jobs=BACKGROUND_JOBS)
 
 @app.route('/health')
 def health():
@@ -52,25 +109,8 @@ def video_info():
         url = request.json.get('url')
         if not url: return jsonify({'success': False, 'error': 'No URL'}), 400
 
-        ydl_opts = {
-            'nocheckcertificate': True,
-            'ignoreerrors': True,
-            'quiet': True,
-            'extract_flat': 'in_playlist',
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android', 'ios', 'web'],
-                    'skip': ['hls', 'dash']
-                }
-            },
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-            'source_address': '0.0.0.0', # Force IPv4 to avoid DNS/resolution issues on some Windows setups
-            'retries': 10,
-            'socket_timeout': 30
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        # Cached + coalesced extraction (shared with /api/process)
+        info = metadata_cache.resolve(url, {'ignoreerrors': True, 'extract_flat': 'in_playlist'})
             
         if not info: return jsonify({'success': False, 'error': 'Failed to fetch info'}), 500
 
@@ -101,40 +141,78 @@ def video_info():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/process', methods=['POST'])
-def process():
-    try:
-        # LAZY IMPORTS (Prevents Vercel Crash on Startup)
-        from moviepy.editor import VideoFileClip, AudioFileClip, CompositeAudioClip
-        from gtts import gTTS
-        import imageio_ffmpeg
+def format_selector(selected_fmt):
+    """yt-dlp format string for a UI quality choice ('best' or a height)"""
+    if selected_fmt and selected_fmt != 'best':
+        return f'bestvideo[height<={selected_fmt}]+bestaudio/best[height<={selected_fmt}]/best'
+    return 'bestvideo+bestaudio/best'
 
-        # Ensure folders exist in Vercel environment
-        if IS_VERCEL:
-            os.makedirs(TEMP_DIR, exist_ok=True)
-            os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
-
-        data = request.json
-        url = data.get('url')
-        selected_fmt = data.get('format', 'best')
-        enable_dubber = data.get('enable_dubber', False)
-        enable_segmenter = data.get('enable_segmenter', False)
-        
-        ffmpeg_path = imageio_ffmpeg.get_ffmpeg_exe()
+def dub_script(title):
+    """Intro line spoken by the AI dub"""
+    clean_text = "".join([c for c in title if c.isalnum() or c in " .,!?'"])
+    return f"Welcome. Watching {clean_text}. AI Dub engine active."
 
-        # DOWNLOAD
-        ts = datetime.now().strftime("%H%M%S")
-        temp_filename = f"temp_{ts}.mp4"
-        temp_path = os.path.join(TEMP_DIR, temp_filename)
-        
-        if selected_fmt and selected_fmt != 'best':
-            fmt_str = f'bestvideo[height<={selected_fmt}]+bestaudio/best[height<={selected_fmt}]/best'
-        else:
-            fmt_str = 'bestvideo+bestaudio/best'
+def expected_size(info, seconds=None):
+    """Download size estimate from format metadata (None when unknown)"""
+    formats = info.get('requested_formats') or [info]
+    sizes = [f.get('filesize') or f.get('filesize_approx') for f in formats]
+    if not all(sizes): return None
+    total = sum(sizes)
+    if seconds and info.get('duration'): total = int(total * min(1.0, seconds / info['duration']))
+    return total
+
+def pipeline_spec(info, data):
+    """Everything that shapes a pipeline's output, as the result store's key"""
+    enable_dubber = bool(data.get('enable_dubber', False))
+    enable_segmenter = bool(data.get('enable_segmenter', False))
+    extractor = info.get('extractor_key') or info.get('extractor')
+    # Generic ids are bare file names, so plain URLs are identified by the URL itself
+    identity = info.get('webpage_url') if extractor in (None, 'Generic') else info.get('id')
+    spec = {
+        'pipeline': PIPELINE_VERSION,
+        'source': {'extractor': extractor, 'id': identity or data.get('url')},
+        'format': {'requested': data.get('format', 'best'), 'resolved': info.get('format_id')},
+        'options': {'segmenter': enable_segmenter, 'dubber': enable_dubber,
+                    'segment_seconds': SEGMENT_SECONDS if enable_segmenter else None}
+    }
+    if enable_dubber:
+        spec['tts'] = {'backend': tts_backend.name, 'language': 'en', 'tld': 'co.uk',
+                       'script': dub_script(info.get('title', 'video'))}
+    return spec
+
+def request_key(data):
+    """Identity of a job request before extraction (same URL and options)"""
+    options = {k: bool(data.get(k, False)) for k in ('enable_dubber', 'enable_segmenter')}
+    return canonical_json(dict(options, url=data.get('url'), format=data.get('format', 'best')))
 
+def run_pipeline(data, job=None):
+    """Download + optional segment/dub pipeline shared by /api/process and jobs"""
+    with metrics.jobs_in_flight.track(), metrics.trace() as timings:
+        with metrics.span('pipeline'):
+            result = _run_pipeline(data, job)
+    # Per-request breakdown, on request ({"timings": true})
+    if data.get('timings'): result['timings'] = timings
+    return result
+
+def _run_pipeline(data, job):
+    os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+
+    url = data.get('url')
+    selected_fmt = data.get('format', 'best')
+    enable_dubber = data.get('enable_dubber', False)
+    enable_segmenter = data.get('enable_segmenter', False)
+    if not url: raise ValueError('No URL')
+
+    ffmpeg_path = imageio_ffmpeg.get_ffmpeg_exe()
+
+    ts = datetime.now().strftime("%H%M%S")
+    # Private scratch dir, so concurrent runs never see each other's files
+    workspace = workspaces.create()
+
+    try:
+        # DOWNLOAD
         ydl_opts = {
-            'format': fmt_str,
-            'outtmpl': temp_path,
+            'format': format_selector(selected_fmt),
             'ffmpeg_location': ffmpeg_path,
             'merge_output_format': 'mp4',
             'nocheckcertificate': True,
@@ -152,85 +230,313 @@ def process():
             'buffersize': 1024*1024,    # 1MB buffer
             'http_chunk_size': 10485760 # 10MB chunks to prevent connection drops
         }
+        if job:
+            ydl_opts['progress_hooks'] = [job.ytdlp_hook]
+            job.set_stage('download', 0, 70 if (enable_dubber or enable_segmenter) else 95, 'Downloading media...')
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            video_title = info.get('title', 'video')
+        # Reuses the extraction /api/video-info already made for this URL
+        with metrics.span('extract'):
+            info = metadata_cache.resolve(url, ydl_opts)
+        video_title = info.get('title', 'video')
 
-        # PROCESSING
-        processed_path = temp_path
-        final_suffix = ""
+        def produce():
+            # Served from the shared download cache when this video+format was fetched before.
+            # The segmenter keeps only the first clip, so only that window (+ keyframe padding) is fetched
+            window = SEGMENT_SECONDS + 2 * KEYFRAME_PADDING if enable_segmenter else None
+            with metrics.span('download'):
+                temp_path = download_cache.get_or_download(info, ydl_opts, workspace.path('source', expected_size(info, window)),
+                                                           end=SEGMENT_SECONDS if enable_segmenter else None)
+            workspace.check_quota()
+            if job: job.update(1.0)
 
-        if enable_dubber or enable_segmenter:
-            try:
-                clip = VideoFileClip(temp_path)
-                if enable_segmenter and clip.duration > 30:
-                    clip = clip.subclip(0, 30)
-                    final_suffix += "_Segmented"
-
-                if enable_dubber:
-                    uploader = info.get('uploader', 'Unknown')
-                    clean_text = "".join([c for c in video_title if c.isalnum() or c in " .,!?'"])
-                    tts_text = f"Welcome. Watching {clean_text}. AI Dub engine active."
-                    
-                    tts_file = os.path.join(TEMP_DIR, "dub.mp3")
-                    tts = gTTS(text=tts_text, lang='en', tld='co.uk')
-                    tts.save(tts_file)
+            # PROCESSING
+            processed_path = temp_path
+            final_suffix = ""
+
+            if enable_dubber or enable_segmenter:
+                try:
+                    # Trims start at 0 (a keyframe), so the video stream is always copied
+                    end = None
+                    if enable_segmenter and probe_duration(temp_path) > SEGMENT_SECONDS:
+                        end = SEGMENT_SECONDS
+                        final_suffix += "_Segmented"
+
+                    # Output is at most about the source size (video is copied)
+                    processed_path = workspace.path('processed.mp4', os.path.getsize(temp_path))
+
+                    if enable_dubber:
+                        if job: job.set_stage('dub', 70, 75, 'Synthesizing AI voice...')
+                        tts_text = dub_script(video_title)
                     
-                    dub_audio = AudioFileClip(tts_file)
-                    if dub_audio.duration < clip.duration:
-                        final_audio = CompositeAudioClip([dub_audio.set_start(0)])
+                        tts_file = workspace.path('dub.wav')
+                        with metrics.span('tts'):
+                            tts_cache.synthesize(tts_text, 'en', tts_file, tts_backend, tld='co.uk', backend=tts_backend.name)
+
+                        # Voice over the ducked original audio, encoding audio only (video is copied)
+                        if job: job.set_stage('encode', 75, 95, 'Mixing dubbed audio...')
+                        with metrics.span('encode'):
+                            dub_mixer.mix_into_video(temp_path, tts_file, processed_path, end=end,
+                                                     on_progress=job.update if job else None)
+                        metrics.written_bytes.inc(os.path.getsize(processed_path), stage='encode')
+                        final_suffix += "_AIDubbed"
+                    elif end:
+                        if job: job.set_stage('encode', 75, 95, 'Cutting clip...')
+                        with metrics.span('encode'):
+                            copy_range(temp_path, 0, end, processed_path)
+                        metrics.written_bytes.inc(os.path.getsize(processed_path), stage='encode')
                     else:
-                        final_audio = dub_audio.subclip(0, clip.duration)
-                    clip = clip.set_audio(final_audio)
-                    final_suffix += "_AIDubbed"
-
-                processed_filename = f"processed_{ts}.mp4"
-                processed_path = os.path.join(TEMP_DIR, processed_filename)
-                clip.write_videofile(processed_path, codec='libx264', audio_codec='aac', preset='ultrafast', logger=None)
-                clip.close()
-                if enable_dubber: dub_audio.close()
-            except Exception as e:
-                print(f"Processing Error: {e}")
-                processed_path = temp_path
+                        # Already shorter than one segment, nothing to cut
+                        processed_path = temp_path
+                    workspace.check_quota()
+                except QuotaExceeded:
+                    raise
+                except Exception as e:
+                    print(f"Processing Error: {e}")
+                    # Hand back the source, but never store it as this spec's result
+                    return temp_path, {'suffix': final_suffix, 'store': False}
+
+            return processed_path, {'suffix': final_suffix}
+
+        # Plain downloads are already kept by the download cache, so only processed outputs are stored
+        if result_store and (enable_dubber or enable_segmenter):
+            # Identical specs share one run; finished ones are served from the store
+            spec = pipeline_spec(info, data)
+            key = result_store.key_for(spec)
+            while True:
+                entry, result_cache = result_store.fetch(key, spec, produce)
+                if entry.get('stored') is False:
+                    processed_path = entry['path']
+                    break
+                try:
+                    # The store keeps its copy; this run gets its own link
+                    processed_path = workspace.path('result' + os.path.splitext(entry['path'])[1], entry['size'])
+                    result_store.materialize(entry, processed_path)
+                    break
+                except FileNotFoundError:
+                    continue  # Evicted between lookup and link; fetch again
+            final_suffix = entry['meta']['suffix']
+            if job and result_cache != 'miss': job.update(1.0, 'Reusing the result of an identical request...')
+        else:
+            processed_path, meta = produce()
+            final_suffix, result_cache = meta['suffix'], None
 
         # FINALIZE
+        if job: job.set_stage('finalize', 95, 100, 'Finalizing...')
         clean_title = "".join([c for c in video_title if c.isalnum() or c in (' ','-','_')]).rstrip()
         final_filename = f"{clean_title}{final_suffix}.mp4"
         
         if IS_VERCEL:
             # VERCEL: Stream file DIRECTLY (Solves 404 Error)
-            # We don't move to download folder, we just stream from temp
-            return send_file(processed_path, as_attachment=True, download_name=final_filename)
+            # We don't move to download folder, we just stream from temp.
+            # The caller owns one workspace reference until the file is sent
+            workspace.acquire()
+            return {'success': True, 'vercel': True, 'path': processed_path, 'download_name': final_filename,
+                    'workspace': workspace, 'result_cache': result_cache}
 
         else:
             # LOCAL: Move to Desktop
             local_dest = os.path.join(DOWNLOAD_FOLDER, final_filename)
             if os.path.exists(local_dest): local_dest = os.path.join(DOWNLOAD_FOLDER, f"{clean_title}_{ts}{final_suffix}.mp4")
-            shutil.move(processed_path, local_dest)
-            
-            return jsonify({'success': True, 'vercel': False, 'files': [{'filename': os.path.basename(local_dest)}]})
+            with metrics.span('finalize'):
+                shutil.move(processed_path, local_dest)
+            files = [{'filename': os.path.basename(local_dest)}]
+
+            if enable_segmenter:
+                # Served by /api/download_file, so the sprite index links through it too
+                with metrics.span('preview'):
+                    preview = previews.generate(local_dest, DOWNLOAD_FOLDER, os.path.splitext(files[0]['filename'])[0],
+                                                cuts=[(0, probe_duration(local_dest))], sprite_url='download_file?file={name}')
+                if preview['success']:
+                    files[0].update(thumbnail=preview['thumbnails'][0], sprite_vtt=preview['vtt'])
+
+            return {'success': True, 'vercel': False, 'files': files, 'result_cache': result_cache}
+
+    finally:
+        # CLEANUP (Always runs): deletes the workspace unless a response still holds it
+        workspace.release()
+
+def stream_response(data):
+    """Chunked fMP4 response: yt-dlp/ffmpeg output is sent as it is produced"""
+    url = data.get('url')
+    if not url: return jsonify({'success': False, 'error': 'No URL'}), 400
+    enable_dubber = str(data.get('enable_dubber', '')).lower() in ('1', 'true')
+    enable_segmenter = str(data.get('enable_segmenter', '')).lower() in ('1', 'true')
+
+    info = metadata_cache.resolve(url, {'format': format_selector(data.get('format', 'best'))})
+    video_title = info.get('title', 'video')
+    final_suffix = "_Segmented" if enable_segmenter else ""
 
+    # The dub track is tiny, so it is the only thing written to disk
+    tts_file = workspace = None
+    if enable_dubber:
+        workspace = workspaces.create('stream')
+        try:
+            tts_file = workspace.path('dub.wav')
+            tts_cache.synthesize(dub_script(video_title), 'en', tts_file, tts_backend, tld='co.uk', backend=tts_backend.name)
+        except Exception:
+            workspace.release()
+            raise
+        final_suffix += "_AIDubbed"
+
+    def cleanup():
+        if workspace: workspace.release()
+
+    chunks = streamer.stream(url, format_selector(data.get('format', 'best')),
+                             end=SEGMENT_SECONDS if enable_segmenter else None,
+                             dub_audio_path=tts_file, on_close=cleanup)
+    clean_title = "".join([c for c in video_title if c.isalnum() or c in (' ','-','_')]).rstrip()
+    return Response(stream_with_context(chunks), mimetype='video/mp4', headers={
+        'Content-Disposition': f'attachment; filename="{clean_title}{final_suffix}.mp4"',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/stream', methods=['GET', 'POST'])
+def stream():
+    try:
+        return stream_response(request.json if request.is_json else request.args)
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
-    
-    finally:
-        # CLEANUP (Always runs, keeps Vercel /tmp clean)
-        # Note: On Vercel send_file might need the file to exist, so we rely on Vercel's auto cleanup
-        # But for Local, we must clean temp
-        if not IS_VERCEL and os.path.exists(TEMP_DIR):
-             try: shutil.rmtree(TEMP_DIR)
-             except: pass
+
+@app.route('/api/process', methods=['POST'])
+def process():
+    try:
+        if request.json.get('stream'):
+            return stream_response(request.json)
+        result = run_pipeline(request.json)
+        if result.get('vercel'):
+            workspace = result.pop('workspace')
+            try:
+                # Released once the body has been sent (or the client went away)
+                response = send_media_file(result['path'], download_name=result['download_name'],
+                                           on_close=workspace.release)
+            except Exception:
+                workspace.release()
+                raise
+            if result.get('timings'): response.headers['Server-Timing'] = metrics.server_timing(result['timings'])
+            if result.get('result_cache'): response.headers['X-Result-Cache'] = result['result_cache']
+            return response
+        return jsonify(result)
+
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# -------------------------------------------------------------
+# BACKGROUND JOBS (submit -> poll / SSE progress -> fetch result)
+# -------------------------------------------------------------
+def _publish_result(result, job):
+    if result.get('vercel'):
+        # Keep the server path private, hand out a fetch URL instead
+        result['download_url'] = job.add_artifact(result.pop('path'), result['download_name'], result.pop('workspace'))
+    return result
+
+def _process_job(data, job):
+    return _publish_result(run_pipeline(data, job=job), job)
+
+def _process_batch(data, job):
+    urls = data.get('urls') or [data.get('url')]
+    options = {k: data.get(k) for k in ('format', 'enable_dubber', 'enable_segmenter') if k in data}
+
+    cap = int(os.environ.get('BATCH_MAX_ITEMS', '50'))
+
+    def on_item(done, total, item):
+        job.update(done / total, f"{item['status'].upper()}: {item['title'] or item['url']}")
+
+    processor = BatchProcessor(
+        lambda entry_url: _publish_result(run_pipeline(dict(options, url=entry_url)), job),
+        metadata_cache,
+        max_workers=int(os.environ.get('BATCH_WORKERS', '4')),
+        rate=float(os.environ.get('BATCH_HOST_RATE', '1.0')),
+        burst=int(os.environ.get('BATCH_HOST_BURST', '2')),
+        # A request may lower the server's cap, never raise it
+        max_items=min(data.get('limit') or cap, cap)
+    )
+    job.set_stage('expand', 0, 5, 'Expanding playlist...')
+    return processor.run(urls, on_item=on_item,
+                         on_expanded=lambda total, duplicates: job.set_stage('batch', 5, 100, f'Processing {total} entries...'))
+
+def jobs_unavailable():
+    return jsonify({'success': False, 'error': 'Background jobs are disabled on this deployment; use /api/process'}), 501
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    if not BACKGROUND_JOBS: return jobs_unavailable()
+    data = request.json or {}
+    if not data.get('url'): return jsonify({'success': False, 'error': 'No URL'}), 400
+    # An identical request still queued or running is joined instead of repeated
+    job, attached = jobs.submit_unique(request_key(data), _process_job, data)
+    return jsonify({'success': True, 'job_id': job.id, 'events_url': f"/api/jobs/{job.id}/events",
+                    'attached': attached}), 202
+
+@app.route('/api/batch', methods=['POST'])
+def submit_batch():
+    if not BACKGROUND_JOBS: return jobs_unavailable()
+    data = request.json or {}
+    urls = data.get('urls') or ([data['url']] if data.get('url') else [])
+    if not urls or not isinstance(urls, list): return jsonify({'success': False, 'error': 'No URLs'}), 400
+    limit = data.get('limit')
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 1):
+        return jsonify({'success': False, 'error': 'limit must be a positive integer'}), 400
+    job = jobs.submit(_process_batch, dict(data, urls=urls))
+    return jsonify({'success': True, 'job_id': job.id, 'events_url': f"/api/jobs/{job.id}/events"}), 202
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if not job: return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': True, **job.to_dict()})
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    job = jobs.get(job_id)
+    if not job: return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return Response(stream_with_context(jobs.stream(job)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/jobs/<job_id>/file')
+def job_file(job_id):
+    job = jobs.get(job_id)
+    item = request.args.get('item', '0')
+    if not job or not item.isdigit() or int(item) >= len(job.artifacts): return "File Not Found", 404
+    path, download_name, workspace = job.artifacts[int(item)]
+    # Hold the workspace while the body streams, even if the job expires meanwhile
+    if workspace and not workspace.acquire(): return "File Not Found", 404
+    if not os.path.exists(path):
+        if workspace: workspace.release()
+        return "File Not Found", 404
+    return send_media_file(path, download_name=download_name, on_close=workspace.release if workspace else None)
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    return jsonify({
+        'success': True,
+        'download_cache': download_cache.snapshot(),
+        'metadata_cache': metadata_cache.snapshot(),
+        'tts_cache': tts_cache.snapshot(),
+        'workspaces': workspaces.snapshot(),
+        'encoder': encoder.snapshot(),
+        'result_store': result_store.snapshot() if result_store else None
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/api/download_file')
 def download_file():
     fname = request.args.get('file')
-    if not fname or '/' in fname: return "Invalid File", 400
-    file_path = os.path.join(DOWNLOAD_FOLDER, fname)
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
+    if not safe_filename(fname): return "Invalid File", 400
+    # Segment/dub outputs included; supports Range, ETag and If-None-Match
+    file_path = resolve_file(DOWNLOAD_FOLDER, fname)
+    if file_path:
+        return send_media_file(file_path)
     return "File Not Found", 404
 
 if __name__ == '__main__':
+    # Fresh folders for each local server run (importing the app never touches disk)
+    for d in [TEMP_DIR, DOWNLOAD_FOLDER]:
+        if os.path.exists(d): shutil.rmtree(d)
+        os.makedirs(d, exist_ok=True)
+    workspaces.purge()
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,258 @@
+"""
+Audio Mixer Module
+Mixes a dub track over the original audio with sidechain ducking
+Streams fixed-size PCM blocks between ffmpeg pipes, so memory stays flat
+"""
+
+import time
+import queue
+import subprocess
+import threading
+import wave
+import logging
+
+import numpy as np
+
+from ffmpeg_utils import get_ffmpeg_exe, probe_duration, probe_streams, FFmpegError
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+BLOCK_FRAMES = SAMPLE_RATE      # One second of audio per block
+WINDOW_FRAMES = SAMPLE_RATE // 100  # Ducking envelope runs at 100 Hz
+
+DUCK_DB = -15.0         # Original audio level while the voice speaks
+THRESHOLD_DB = -45.0    # Voice level (RMS per window) that triggers ducking
+ATTACK = 0.03           # Seconds to duck once the voice starts
+RELEASE = 0.4           # Seconds to recover after it stops
+
+
+def _pcm_reader(cmd, block_bytes, blocks, stop):
+    """Run ffmpeg and push raw f32le blocks until EOF or ``stop``"""
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while not stop.is_set():
+            data = proc.stdout.read(block_bytes)
+            if data:
+                blocks.put(data)
+            if len(data) < block_bytes:
+                break
+    except Exception as e:
+        logger.error(f"Mixer reader failed: {str(e)}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+        blocks.put(None)
+
+
+class _Source:
+    """Decoded audio stream read ahead in blocks on a thread"""
+
+    def __init__(self, path, channels, sample_rate, stop):
+        cmd = [get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-loglevel', 'error', '-i', path,
+               '-map', '0:a:0', '-vn', '-ac', str(channels), '-ar', str(sample_rate), '-f', 'f32le', 'pipe:1']
+        self.channels = channels
+        self.blocks = queue.Queue(maxsize=4)
+        self.done = False
+        self.thread = threading.Thread(
+            target=_pcm_reader, args=(cmd, BLOCK_FRAMES * channels * 4, self.blocks, stop), daemon=True
+        )
+        self.thread.start()
+
+    def read(self, frames):
+        """Next ``frames`` frames, zero-padded once the stream has ended"""
+        block = np.zeros((frames, self.channels), dtype=np.float32)
+        if not self.done:
+            data = self.blocks.get()
+            if data is None:
+                self.done = True
+            else:
+                samples = np.frombuffer(data, dtype='<f4').reshape(-1, self.channels)[:frames]
+                block[:len(samples)] = samples
+        return block
+
+    def close(self):
+        # Unblock a reader waiting on a full queue so it can exit
+        while self.thread.is_alive():
+            try:
+                self.blocks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+class DubMixer:
+    """Block-based voice-over mixer with sidechain ducking"""
+
+    def __init__(self, duck_db=DUCK_DB, threshold_db=THRESHOLD_DB, attack=ATTACK, release=RELEASE,
+                 voice_gain_db=0.0, original_gain_db=0.0, sample_rate=SAMPLE_RATE):
+        """
+        Initialize mixer
+
+        Args:
+            duck_db (float): Gain applied to the original audio under speech
+            threshold_db (float): Voice RMS level counted as speech
+            attack (float): Ducking time constant in seconds
+            release (float): Recovery time constant in seconds
+            voice_gain_db (float): Gain of the dub track
+            original_gain_db (float): Gain of the original audio outside speech
+            sample_rate (int): Mix sample rate
+        """
+        self.duck_db = duck_db
+        self.threshold_db = threshold_db
+        self.attack = attack
+        self.release = release
+        self.voice_gain = 10 ** (voice_gain_db / 20)
+        self.original_gain = 10 ** (original_gain_db / 20)
+        self.sample_rate = sample_rate
+
+    def _blocks(self, original_path, voice_path, duration, stats):
+        """
+        Yield mixed stereo float32 blocks covering ``duration`` seconds
+
+        Both inputs are decoded by their own ffmpeg process into bounded
+        queues. Per block, the voice's RMS per 10 ms window drives a
+        target gain, smoothed with separate attack and release time
+        constants at that 100 Hz control rate, then interpolated to a
+        per-sample gain curve; everything per sample is NumPy.
+        """
+        rate = self.sample_rate
+        window_seconds = WINDOW_FRAMES / rate
+        attack = np.exp(-window_seconds / max(self.attack, 1e-6))
+        release = np.exp(-window_seconds / max(self.release, 1e-6))
+        threshold = 10 ** (self.threshold_db / 20)
+
+        stop = threading.Event()
+        original = _Source(original_path, CHANNELS, rate, stop) if 'audio' in probe_streams(original_path) else None
+        voice = _Source(voice_path, 1, rate, stop)
+        remaining = int(round(duration * rate))
+        gain_db = 0.0
+        last_gain = 1.0
+        try:
+            while remaining > 0:
+                frames = min(BLOCK_FRAMES, remaining)
+                speech = voice.read(BLOCK_FRAMES)[:frames, 0]
+                background = (original.read(BLOCK_FRAMES)[:frames] if original
+                              else np.zeros((frames, CHANNELS), dtype=np.float32))
+
+                windows = -(-frames // WINDOW_FRAMES)
+                padded = np.zeros(windows * WINDOW_FRAMES, dtype=np.float32)
+                padded[:frames] = speech
+                rms = np.sqrt(np.mean(padded.reshape(windows, WINDOW_FRAMES) ** 2, axis=1))
+                targets = np.where(rms > threshold, self.duck_db, 0.0)
+
+                # Envelope follower at the control rate (100 steps per second)
+                envelope = np.empty(windows)
+                for i, target in enumerate(targets):
+                    coef = attack if target < gain_db else release
+                    gain_db = target + coef * (gain_db - target)
+                    envelope[i] = gain_db
+                stats['ducked_seconds'] += float(np.count_nonzero(targets)) * window_seconds
+
+                # Per-sample gain: ramps from the previous window's gain to each window's
+                points = np.arange(windows + 1) * WINDOW_FRAMES
+                levels = np.concatenate(([last_gain], 10 ** (envelope / 20)))
+                curve = np.interp(np.arange(1, frames + 1), points, levels).astype(np.float32)
+                last_gain = float(levels[-1])
+
+                mixed = background * (curve * self.original_gain)[:, None] + (speech * self.voice_gain)[:, None]
+                np.clip(mixed, -1.0, 1.0, out=mixed)
+                remaining -= frames
+                yield mixed
+        finally:
+            stop.set()
+            for source in filter(None, (original, voice)):
+                source.close()
+
+    def mix_into_video(self, video_path, voice_path, output_path, end=None, on_progress=None):
+        """
+        Mix the voice over a video's audio and mux it, copying the video
+
+        Mixed blocks are written straight into the muxing ffmpeg's stdin;
+        no intermediate audio file exists.
+
+        Args:
+            video_path (str): Source video (its audio is ducked under the voice)
+            voice_path (str): Dub track (any ffmpeg-readable audio)
+            output_path (str): Destination MP4
+            end (float): Stop after this many seconds (default: the whole
+                video); the copied video is cut at the same point
+            on_progress (callable): Receives completion (0-1) per block
+
+        Returns:
+            dict: Mixed seconds, ducked seconds and real-time factor
+        """
+        duration = probe_duration(video_path)
+        if end:
+            duration = min(end, duration)
+        cmd = [
+            get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-y', '-loglevel', 'error',
+            '-i', video_path,
+            '-f', 'f32le', '-ar', str(self.sample_rate), '-ac', str(CHANNELS), '-i', 'pipe:0',
+            '-map', '0:v:0', '-map', '1:a:0', '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k',
+            '-t', f'{duration:.6f}', '-movflags', '+faststart', output_path
+        ]
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        errors = []
+        drain = threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)
+        drain.start()
+        stats = {'ducked_seconds': 0.0}
+        started = time.perf_counter()
+        try:
+            written = 0
+            for block in self._blocks(video_path, voice_path, duration, stats):
+                proc.stdin.write(block.astype('<f4', copy=False).tobytes())
+                written += len(block)
+                # A video without a usable duration mixes nothing to measure against
+                if on_progress and duration > 0:
+                    on_progress(min(written / self.sample_rate / duration, 1.0))
+        except BrokenPipeError:
+            pass  # ffmpeg failed; its error is reported below
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            returncode = proc.wait()
+            drain.join()
+        if returncode != 0:
+            raise FFmpegError(b''.join(errors).decode('utf-8', 'replace').strip()
+                              or f'ffmpeg exited with status {returncode}')
+        return self._summary(duration, stats, started)
+
+    def mix_to_wav(self, original_path, voice_path, output_path, duration=None):
+        """
+        Mix the voice over a file's audio into a 16-bit stereo WAV
+
+        Args:
+            original_path (str): Media whose audio is ducked under the voice
+            voice_path (str): Dub track
+            output_path (str): Destination WAV
+            duration (float): Seconds to mix (default: the original's duration)
+
+        Returns:
+            dict: Mixed seconds, ducked seconds and real-time factor
+        """
+        duration = duration or probe_duration(original_path)
+        stats = {'ducked_seconds': 0.0}
+        started = time.perf_counter()
+        with wave.open(output_path, 'wb') as f:
+            f.setnchannels(CHANNELS)
+            f.setsampwidth(2)
+            f.setframerate(self.sample_rate)
+            for block in self._blocks(original_path, voice_path, duration, stats):
+                f.writeframes((block * 32767).astype('<i2').tobytes())
+        return self._summary(duration, stats, started)
+
+    @staticmethod
+    def _summary(duration, stats, started):
+        wall = time.perf_counter() - started
+        logger.info(f"Mixed {duration:.1f}s of audio in {wall:.2f}s ({stats['ducked_seconds']:.1f}s ducked)")
+        return {
+            'seconds': round(duration, 3),
+            'ducked_seconds': round(stats['ducked_seconds'], 2),
+            'wall_seconds': round(wall, 3),
+            'realtime_factor': round(duration / wall, 1) if wall > 0 else None
+        }
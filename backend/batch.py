@@ -0,0 +1,174 @@
+"""
+Batch Processing Module
+Expands playlists / URL lists and processes entries concurrently
+Applies a per-host token bucket and skips duplicate entries
+"""
+
+import time
+import threading
+import logging
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``burst``"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """One token bucket per remote host"""
+
+    def __init__(self, rate=1.0, burst=2):
+        """
+        Initialize limiter
+
+        Args:
+            rate (float): Requests per second allowed per host
+            burst (int): Requests allowed back-to-back per host
+        """
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        """
+        Wait for permission to hit the host of ``url``
+
+        Args:
+            url (str): Request URL
+        """
+        host = urlparse(url).hostname or ''
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+
+class BatchProcessor:
+    """Runs a per-URL pipeline over many entries with bounded concurrency"""
+
+    def __init__(self, process_fn, metadata_cache, max_workers=4, rate=1.0, burst=2, max_items=50):
+        """
+        Initialize batch processor
+
+        Args:
+            process_fn (callable): ``process_fn(url)`` returning a result dict
+            metadata_cache (MetadataCache): Used to expand playlists
+            max_workers (int): Entries processed at the same time
+            rate (float): Per-host requests per second
+            burst (int): Per-host burst size
+            max_items (int): Cap on entries taken from one batch
+        """
+        self.process_fn = process_fn
+        self.metadata_cache = metadata_cache
+        self.max_workers = max_workers
+        self.limiter = HostRateLimiter(rate, burst)
+        self.max_items = max_items
+
+    def expand(self, urls):
+        """
+        Turn URLs (any of which may be a playlist/channel) into unique entries
+
+        Args:
+            urls (list): Video and/or playlist URLs
+
+        Returns:
+            tuple: (entries, duplicates) where entries are dicts with
+            'url', 'title' and 'key'
+        """
+        entries, seen, duplicates = [], set(), 0
+        for url in urls:
+            self.limiter.acquire(url)
+            info = self.metadata_cache.resolve(url, {'extract_flat': 'in_playlist', 'ignoreerrors': True})
+            if not info:
+                continue
+            items = info.get('entries') if info.get('_type') == 'playlist' else [info]
+            for item in items or []:
+                if not item:
+                    continue
+                entry_url = item.get('webpage_url') or item.get('url') or url
+                extractor = item.get('ie_key') or item.get('extractor_key') or ''
+                key = (extractor, item['id']) if item.get('id') else ('', entry_url)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                entries.append({'url': entry_url, 'title': item.get('title'), 'key': key})
+                if len(entries) >= self.max_items:
+                    return entries, duplicates
+        return entries, duplicates
+
+    def run(self, urls, on_item=None, on_expanded=None):
+        """
+        Expand and process a batch
+
+        Args:
+            urls (list): Video and/or playlist URLs
+            on_item (callable): Called as ``on_item(done, total, item)``
+                after each entry finishes
+            on_expanded (callable): Called as ``on_expanded(total, duplicates)``
+                once the URLs are expanded, before any entry is processed
+
+        Returns:
+            dict: Aggregate manifest
+        """
+        entries, duplicates = self.expand(urls)
+        total = len(entries)
+        if on_expanded:
+            on_expanded(total, duplicates)
+        done = [0]
+        lock = threading.Lock()
+
+        def work(index, entry):
+            item = {'index': index, 'url': entry['url'], 'title': entry['title']}
+            self.limiter.acquire(entry['url'])
+            started = time.perf_counter()
+            try:
+                result = self.process_fn(entry['url'])
+                item.update(status='done', result=result)
+            except Exception as e:
+                logger.error(f"Batch entry {entry['url']} failed: {str(e)}")
+                item.update(status='error', error=str(e))
+            item['seconds'] = round(time.perf_counter() - started, 2)
+            with lock:
+                done[0] += 1
+                if on_item:
+                    on_item(done[0], total, item)
+            return item
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, total or 1))) as executor:
+            items = list(executor.map(work, range(total), entries))
+
+        succeeded = sum(1 for i in items if i['status'] == 'done')
+        return {
+            'success': True,
+            'total': total,
+            'succeeded': succeeded,
+            'failed': total - succeeded,
+            'duplicates': duplicates,
+            'items': items
+        }
@@ -0,0 +1,411 @@
+"""
+Benchmark Suite
+Offline timings for the downloader, segmenter, dubber and full pipeline
+Synthetic lavfi inputs, a local HTTP server and stub TTS; JSON baselines
+
+Usage:
+    python benchmark.py                  run and compare with the baseline
+    python benchmark.py --save           run and store the new baseline
+    python benchmark.py --quick          smallest input only
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+if BASE_DIR not in sys.path: sys.path.insert(0, BASE_DIR)
+
+from ffmpeg_utils import get_ffmpeg_exe, run_ffmpeg, probe_duration
+
+BENCH_DIR = os.path.join(BASE_DIR, 'benchmarks')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+FIXTURE_DIR = os.path.join(tempfile.gettempdir(), 'media_toolkit_bench_inputs')
+
+# (name, width, height, seconds)
+INPUTS = [
+    ('360p_10s', 640, 360, 10),
+    ('360p_60s', 640, 360, 60),
+    ('720p_60s', 1280, 720, 60),
+]
+
+# Stages measured for every input, each in a fresh process
+STAGES = ['download', 'segment_keyframe', 'segment_smart', 'segment_exact', 'segment_content', 'segment_hls', 'dub', 'process']
+
+DUB_TEXT = "Welcome. This is a benchmark of the neural dubbing pipeline."
+
+
+# -------------------------------------------------------------
+# INPUTS
+# -------------------------------------------------------------
+def make_input(name, width, height, seconds):
+    """
+    Generate (once) a synthetic test video with lavfi sources
+
+    Args:
+        name (str): Input name, used as the file name
+        width (int): Frame width
+        height (int): Frame height
+        seconds (int): Duration
+
+    Returns:
+        str: Path of the MP4 (H.264 + AAC, 2s GOP, faststart)
+    """
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    path = os.path.join(FIXTURE_DIR, f'{name}.mp4')
+    if not os.path.exists(path):
+        run_ffmpeg([
+            '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate=25:duration={seconds}',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-g', '50', '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-movflags', '+faststart', path + '.part.mp4'
+        ])
+        os.replace(path + '.part.mp4', path)
+    return path
+
+
+# -------------------------------------------------------------
+# STAGE RUNNER (child process)
+# -------------------------------------------------------------
+def _files_bytes(root):
+    # Hard links (cache -> output) are only written once, count them once
+    seen, total = set(), 0
+    for folder, _, files in os.walk(root):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(folder, name))
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_size
+    return total
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None, None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(own, 1), round(children, 1)
+
+
+def run_stage(spec):
+    """
+    Run one stage in this process and measure it
+
+    Runs in a child process (see ``measure``) so peak RSS and the caches
+    belong to this stage alone. The working directory is private: caches
+    and outputs live under it.
+
+    Args:
+        spec (dict): 'stage', 'input', 'url', 'fixture', 'workdir'
+
+    Returns:
+        dict: Measurements ('wall_seconds', 'stages', 'bytes_written', ...)
+    """
+    stage, workdir = spec['stage'], spec['workdir']
+    folder = os.path.join(workdir, 'downloads')
+    os.makedirs(folder, exist_ok=True)
+    sid = 'bench'
+
+    # Setup (not timed): imports, and a local copy for stages after download
+    if stage not in ('download', 'process'):
+        shutil.copyfile(spec['fixture'], os.path.join(folder, f'{sid}_original.mp4'))
+
+    if stage == 'download':
+        from downloader import MediaDownloader
+        from download_cache import DownloadCache
+        from range_downloader import downloader_from_env
+        cache = DownloadCache(os.path.join(workdir, 'cache'), range_downloader=downloader_from_env())
+        downloader = MediaDownloader(folder, cache=cache)
+        work = lambda: downloader.download(spec['url'], sid)
+
+    elif stage == 'segment_content':
+        # Streaming silence/scene analysis, then keyframe cuts at the chosen points
+        from segmenter import MediaSegmenter
+        segmenter = MediaSegmenter(folder, max_segments=None)
+        work = lambda: segmenter.segment(f'{sid}_original.mp4', sid, segment_duration=10,
+                                         mode='keyframe', cut_points='content')
+
+    elif stage == 'segment_hls':
+        # One decode feeding the default ladder (rungs up to the input height)
+        from segmenter import MediaSegmenter
+        segmenter = MediaSegmenter(folder, max_segments=None)
+        work = lambda: segmenter.segment(f'{sid}_original.mp4', sid, segment_duration=6, output='hls')
+
+    elif stage.startswith('segment_'):
+        from segmenter import MediaSegmenter
+        segmenter = MediaSegmenter(folder)
+        work = lambda: segmenter.segment(f'{sid}_original.mp4', sid, mode=stage.split('_', 1)[1])
+
+    elif stage == 'dub':
+        from dubber import NeuralDubber
+        from tts_cache import TTSCache
+        from tts_backends import StubBackend
+        neural_dubber = NeuralDubber(folder, tts_cache=TTSCache(os.path.join(workdir, 'tts')), backend=StubBackend())
+        work = lambda: neural_dubber.dub(f'{sid}_original.mp4', sid, text=DUB_TEXT)
+
+    elif stage == 'process':
+        work = _process_runner(spec)
+
+    else:
+        raise ValueError(f'Unknown stage: {stage}')
+
+    before = _files_bytes(workdir)
+    started = time.perf_counter()
+    result = work()
+    wall = time.perf_counter() - started
+
+    timings = {}
+    if isinstance(result, tuple):
+        result, timings = result
+    if isinstance(result, dict) and result.get('success') is False:
+        raise RuntimeError(result.get('error'))
+
+    own_rss, child_rss = _peak_rss_mb()
+    return {
+        'wall_seconds': round(wall, 3),
+        'stages': timings or {stage: round(wall, 3)},
+        'bytes_written': _files_bytes(workdir) - before,
+        'peak_rss_mb': own_rss,
+        'peak_child_rss_mb': child_rss
+    }
+
+
+def _process_runner(spec):
+    """Full /api/process pipeline (segment + dub), returning per-stage timings"""
+    # Caches follow the environment ``measure`` sets; only the folders are fixed in the module
+    import app as web
+    from jobs import Job
+    from tts_backends import StubBackend
+    from workspace import WorkspaceManager
+
+    web.TEMP_DIR = os.path.join(spec['workdir'], 'temp')
+    web.DOWNLOAD_FOLDER = os.path.join(spec['workdir'], 'downloads')
+    web.workspaces = WorkspaceManager(web.TEMP_DIR, fast_reserve=0)
+    web.tts_backend = StubBackend()
+
+    class StageTimer(Job):
+        """Job that records how long each pipeline stage took"""
+
+        def __init__(self):
+            super().__init__('bench')
+            self.timings = {}
+            self._current = None
+
+        def set_stage(self, stage, start, end, message=None):
+            self.close_stage()
+            self._current = (stage, time.perf_counter())
+            super().set_stage(stage, start, end, message)
+
+        def close_stage(self):
+            if self._current:
+                stage, since = self._current
+                self.timings[stage] = round(self.timings.get(stage, 0) + time.perf_counter() - since, 3)
+                self._current = None
+
+    def work():
+        job = StageTimer()
+        result = web.run_pipeline({
+            'url': spec['url'], 'format': 'best',
+            'enable_segmenter': True, 'enable_dubber': True
+        }, job=job)
+        job.close_stage()
+        return result, job.timings
+
+    return work
+
+
+# -------------------------------------------------------------
+# DRIVER
+# -------------------------------------------------------------
+def measure(spec):
+    """
+    Run ``run_stage`` in a fresh Python process
+
+    Returns:
+        dict: The stage measurements
+    """
+    result_path = os.path.join(spec['workdir'], 'result.json')
+    # Shared caches would turn later stages into cache hits
+    env = dict(os.environ, PYTHONUNBUFFERED='1',
+               MEDIA_CACHE_DIR=os.path.join(spec['workdir'], 'cache'),
+               TTS_CACHE_DIR=os.path.join(spec['workdir'], 'tts'),
+               RESULT_STORE_DIR=os.path.join(spec['workdir'], 'results'))
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--stage', json.dumps(spec), '--result', result_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env
+    )
+    if proc.returncode != 0 or not os.path.exists(result_path):
+        tail = proc.stderr.decode('utf-8', 'replace').strip().splitlines()[-5:]
+        raise RuntimeError('\n'.join(tail) or 'stage failed')
+    with open(result_path) as f:
+        return json.load(f)
+
+
+def tool_versions():
+    """Versions that commonly explain a regression"""
+    versions = {'python': platform.python_version()}
+    try:
+        from yt_dlp.version import __version__ as ytdlp_version
+        versions['yt_dlp'] = ytdlp_version
+    except ImportError:
+        pass
+    try:
+        from moviepy.version import __version__ as moviepy_version
+        versions['moviepy'] = moviepy_version
+    except ImportError:
+        pass
+    out = subprocess.run([get_ffmpeg_exe(), '-version'], stdout=subprocess.PIPE).stdout
+    versions['ffmpeg'] = out.decode('utf-8', 'replace').split('\n', 1)[0].split(' ')[2]
+    return versions
+
+
+def run_suite(inputs, stages, repeat=1):
+    """
+    Benchmark every stage on every input
+
+    Args:
+        inputs (list): Entries of ``INPUTS``
+        stages (list): Stage names
+        repeat (int): Runs per case; the fastest is kept
+
+    Returns:
+        dict: Report with environment and per-case results
+    """
+    # The test suite's range-capable server (imports pytest)
+    from tests.conftest import serve_directory
+
+    fixtures = {name: make_input(name, w, h, s) for name, w, h, s in inputs}
+    server = serve_directory(FIXTURE_DIR)
+    base_url = server.url
+    results = []
+    try:
+        for name, _, _, _ in inputs:
+            media_seconds = probe_duration(fixtures[name])
+            for stage in stages:
+                runs = []
+                for _ in range(repeat):
+                    workdir = tempfile.mkdtemp(prefix='bench_')
+                    try:
+                        runs.append(measure({
+                            'stage': stage, 'input': name, 'workdir': workdir,
+                            'fixture': fixtures[name], 'url': f'{base_url}/{name}.mp4'
+                        }))
+                    except RuntimeError as e:
+                        print(f"  {name:<10} {stage:<17} FAILED: {e}")
+                        break
+                    finally:
+                        shutil.rmtree(workdir, ignore_errors=True)
+                if len(runs) < repeat:
+                    continue
+                best = min(runs, key=lambda r: r['wall_seconds'])
+                # Real-time factor: processing time per second of media (lower is faster)
+                best.update(case=f'{name}/{stage}', input=name, stage=stage,
+                            media_seconds=round(media_seconds, 2),
+                            rtf=round(best['wall_seconds'] / media_seconds, 4))
+                results.append(best)
+                print(f"  {name:<10} {stage:<17} {best['wall_seconds']:>8.2f}s  rtf {best['rtf']:<7.3f}"
+                      f" rss {best['peak_rss_mb']}/{best['peak_child_rss_mb']} MB"
+                      f"  wrote {best['bytes_written'] / 1024 ** 2:.1f} MB")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'versions': tool_versions(),
+        'results': results
+    }
+
+
+def compare(report, baseline, tolerance=0.15, noise=0.05):
+    """
+    Compare wall times against a baseline report
+
+    Args:
+        report (dict): Current report
+        baseline (dict): Earlier report
+        tolerance (float): Allowed relative slowdown
+        noise (float): Absolute seconds ignored as jitter
+
+    Returns:
+        list: Case names that regressed
+    """
+    previous = {r['case']: r for r in baseline.get('results', [])}
+    regressions = []
+    print(f"\nAgainst baseline from {baseline.get('created')} {baseline.get('versions')}")
+    for r in report['results']:
+        old = previous.get(r['case'])
+        if not old:
+            continue
+        delta = r['wall_seconds'] - old['wall_seconds']
+        change = delta / old['wall_seconds'] if old['wall_seconds'] else 0.0
+        flag = ''
+        if change > tolerance and delta > noise:
+            flag = '  REGRESSION'
+            regressions.append(r['case'])
+        print(f"  {r['case']:<28} {old['wall_seconds']:>8.2f}s -> {r['wall_seconds']:>8.2f}s ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline media pipeline benchmarks')
+    parser.add_argument('--quick', action='store_true', help='only the smallest input')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma-separated stage names')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case (fastest kept)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON path')
+    parser.add_argument('--save', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--output', help='also write this run to a JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown (0.15 = 15%%)')
+    parser.add_argument('--stage', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        # Child mode: one stage, result to a file
+        result = run_stage(json.loads(args.stage))
+        with open(args.result, 'w') as f:
+            json.dump(result, f)
+        return 0
+
+    inputs = INPUTS[:1] if args.quick else INPUTS
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    print(f"Benchmarking {len(inputs)} input(s) x {len(stages)} stage(s)")
+    report = run_suite(inputs, stages, args.repeat)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+
+    for path in filter(None, [args.output, args.baseline if args.save else None]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {path}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
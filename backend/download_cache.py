@@ -0,0 +1,507 @@
+"""
+Download Cache Module
+Content-addressed store for downloaded media, shared by all download paths
+Keys on extractor + video id + resolved format, evicts LRU over a byte budget
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import tempfile
+import threading
+import logging
+
+from singleflight import SingleFlight
+from file_lock import FileLock
+from ffmpeg_utils import run_ffmpeg
+from metrics import download_bytes
+from lazy_imports import lazy_import
+from range_downloader import RangeNotSupported, downloader_from_env
+
+yt_dlp = lazy_import('yt_dlp')
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'media_toolkit_cache')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+KEYFRAME_PADDING = 5.0             # Seconds fetched around a partial window
+INDEX_FLUSH_SECONDS = 30.0         # Longest a hit's access time waits to be written
+
+
+class DownloadCache:
+    """On-disk LRU cache of downloaded media files"""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, range_downloader=None):
+        """
+        Initialize cache
+
+        Args:
+            cache_dir (str): Directory holding cached files and the index
+            max_bytes (int): Total size budget before LRU eviction
+            range_downloader (RangeDownloader): Parallel, resumable fetcher for
+                direct HTTP formats (None: always use yt-dlp)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.range_downloader = range_downloader
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.partial_dir = os.path.join(cache_dir, 'partial')
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'evicted_bytes': 0}
+        self._lock = threading.RLock()
+        self._flight = SingleFlight()
+        # Directories are created on first write, so constructing is free
+        self._index = self._load_index()
+        self._removed = set()
+        self._saved_at = time.time()
+
+    @staticmethod
+    def key_for(info, extra=None):
+        """
+        Build the cache key for a resolved yt-dlp info dict
+
+        Args:
+            info (dict): Info dict after format selection
+            extra (str): Optional qualifier (e.g. a time range)
+
+        Returns:
+            str: Hex key, or None when the info cannot be cached
+        """
+        if not info or info.get('_type', 'video') != 'video':
+            return None
+        extractor = info.get('extractor_key') or info.get('extractor')
+        video_id = info.get('id')
+        format_id = info.get('format_id')
+        if not (extractor and video_id and format_id):
+            return None
+        raw = f"{extractor}\0{video_id}\0{format_id}\0{extra or ''}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        """
+        Find a cached file and mark it recently used
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            str: Path of the cached file, or None on a miss
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if not entry:
+                # Another worker process may have stored it since
+                self._merge(self._load_index())
+                entry = self._index.get(key)
+                if not entry:
+                    return None
+            path = os.path.join(self.cache_dir, entry['file'])
+            if not os.path.exists(path):
+                del self._index[key]
+                self._removed.add(key)
+                self._save_index()
+                return None
+            # Access times only order eviction, so hits are written in batches
+            entry['last_access'] = time.time()
+            if time.time() - self._saved_at >= INDEX_FLUSH_SECONDS:
+                self._save_index()
+            return path
+
+    def fetch(self, key, producer):
+        """
+        Return the cached file for ``key``, producing it on a miss
+
+        Concurrent misses for the same key run ``producer`` once; the
+        other callers wait and then share the stored file.
+
+        Args:
+            key (str): Cache key
+            producer (callable): ``producer(partial_base)`` writes the media
+                to a path starting with ``partial_base`` and returns it,
+                optionally as a ``(path, meta)`` tuple to store with the entry
+
+        Returns:
+            str: Path of the cached file
+        """
+        path = self.lookup(key)
+        if path:
+            with self._lock:
+                self.stats['hits'] += 1
+            return path
+
+        def produce():
+            # Another caller may have finished between lookup and here
+            existing = self.lookup(key)
+            if existing:
+                return existing, True
+            os.makedirs(self.partial_dir, exist_ok=True)
+            partial_base = os.path.join(self.partial_dir, f'{key}.{uuid.uuid4().hex}')
+            produced = producer(partial_base)
+            meta = None
+            if isinstance(produced, tuple):
+                produced, meta = produced
+            return self._store(key, produced, meta), False
+
+        (path, was_cached), shared = self._flight.do(key, produce)
+        with self._lock:
+            if shared:
+                self.stats['coalesced'] += 1
+            elif was_cached:
+                self.stats['hits'] += 1
+            else:
+                self.stats['misses'] += 1
+        return path
+
+    def get_or_download(self, info, ydl_opts, dest_base, extra=None, start=None, end=None,
+                        padding=KEYFRAME_PADDING):
+        """
+        Materialize the media for a resolved info dict at ``dest_base``
+
+        With ``start``/``end`` only that time window (widened by ``padding``
+        so it begins and ends on whole GOPs) is fetched; see
+        ``section_window``. Partial files are cached under their own key.
+
+        Args:
+            info (dict): Info dict from ``extract_info(download=False)``
+            ydl_opts (dict): yt-dlp options used for a real download
+            dest_base (str): Destination path without extension
+            extra (str): Optional key qualifier
+            start (float): Window start in seconds (default: beginning)
+            end (float): Window end in seconds (default: whole media)
+            padding (float): Seconds added on both sides of the window
+
+        Returns:
+            str: Destination path (``dest_base`` plus the media extension)
+        """
+        window = section_window(info, start, end, padding)
+        if window:
+            extra = f"{extra or ''}\0section={window[0]:.3f}-{window[1]:.3f}"
+
+        def download(outtmpl_base, key=None):
+            if window:
+                path = _download_section(info, ydl_opts, outtmpl_base, *window)
+                download_bytes.inc(os.path.getsize(path))
+                return path
+            if self.range_downloader and _is_direct(info):
+                try:
+                    return self._range_download(info, ydl_opts, outtmpl_base, key)
+                except RangeNotSupported as e:
+                    logger.info(f"Range download unavailable, using yt-dlp: {str(e)}")
+            opts = dict(ydl_opts, outtmpl=outtmpl_base + '.%(ext)s')
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                result = ydl.process_ie_result(info, download=True)
+                path = _downloaded_path(ydl, result)
+            download_bytes.inc(os.path.getsize(path))
+            return path
+
+        key = self.key_for(info, extra)
+        if key is None:
+            # Playlists and odd extractors bypass the cache
+            return download(dest_base)
+
+        def producer(partial_base):
+            return download(partial_base, key)
+
+        while True:
+            cached = self.fetch(key, producer)
+            dest = dest_base + os.path.splitext(cached)[1]
+            try:
+                _materialize(cached, dest)
+                return dest
+            except FileNotFoundError:
+                # Evicted between lookup and link; fetch again
+                continue
+
+    def _range_download(self, info, ydl_opts, outtmpl_base, key=None):
+        """
+        Fetch a direct HTTP format with the range downloader
+
+        Cached downloads use a stable partial path per key, so a run that
+        failed part-way resumes where it stopped. An OS lock on a file
+        next to it keeps two processes from writing the same partial file
+        (the loser downloads to a private path instead) and goes away with
+        a crashed holder. Progress dicts also name the
+        ``tmpfilename`` being written and its ``ready_bytes``: the prefix
+        already complete on disk, readable while later ranges arrive.
+
+        Returns:
+            str: Path of the finished file
+        """
+        ext = info.get('ext') or 'mp4'
+        path = f'{outtmpl_base}.{ext}'
+        lock = None
+        if key:
+            os.makedirs(self.partial_dir, exist_ok=True)
+            stable = os.path.join(self.partial_dir, f'{key}.range.{ext}')
+            candidate = FileLock(stable + '.lock', remove=True)
+            if candidate.acquire(blocking=False):
+                path, lock = stable, candidate
+
+        # Progress in the yt-dlp hook format, at most every quarter second
+        hooks = ydl_opts.get('progress_hooks') or []
+        started = time.monotonic()
+        last = {'at': 0.0, 'ready': 0}
+
+        def on_progress(done, total):
+            now = time.monotonic()
+            if now - last['at'] < 0.25 and done < total:
+                return
+            last['at'] = now
+            speed = done / max(now - started, 1e-6)
+            status = {'status': 'downloading', 'downloaded_bytes': done, 'total_bytes': total,
+                      'tmpfilename': path + '.part', 'ready_bytes': last['ready'],
+                      'speed': speed, '_percent_str': f'{done * 100 / total:.1f}%',
+                      '_speed_str': f'{speed / 1024 ** 2:.2f}MiB/s'}
+            for hook in hooks:
+                hook(status)
+
+        try:
+            result = self.range_downloader.download(
+                info['url'], path, headers=info.get('http_headers'),
+                max_bytes=ydl_opts.get('max_filesize'),
+                verify=not ydl_opts.get('nocheckcertificate'),
+                on_progress=on_progress if hooks else None,
+                on_ready=(lambda ready: last.update(ready=ready)) if hooks else None
+            )
+        finally:
+            if lock:
+                lock.release()
+        download_bytes.inc(result['fetched_bytes'])
+        for hook in hooks:
+            hook({'status': 'finished', 'filename': path})
+        return path
+
+    def snapshot(self):
+        """
+        Counters and usage for monitoring
+
+        Returns:
+            dict: Hit/miss/eviction counters plus entry count and bytes
+        """
+        with self._lock:
+            return dict(
+                self.stats,
+                entries=len(self._index),
+                bytes=sum(e['size'] for e in self._index.values()),
+                max_bytes=self.max_bytes
+            )
+
+    def meta(self, key):
+        """
+        Metadata stored alongside an entry by its producer
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            dict: Stored metadata (empty if none or not cached)
+        """
+        with self._lock:
+            entry = self._index.get(key) or {}
+            return dict(entry.get('meta') or {})
+
+    def _store(self, key, produced_path, meta=None):
+        ext = os.path.splitext(produced_path)[1]
+        filename = f'{key}{ext}'
+        final_path = os.path.join(self.cache_dir, filename)
+        os.replace(produced_path, final_path)  # atomic publish
+        size = os.path.getsize(final_path)
+        now = time.time()
+        with self._lock:
+            self._index[key] = {'file': filename, 'size': size, 'created': now, 'last_access': now}
+            if meta:
+                self._index[key]['meta'] = meta
+            self._removed.discard(key)
+            self._save_index(keep=key)
+        logger.info(f"Cached download {filename} ({size} bytes)")
+        return final_path
+
+    def _evict(self, keep=None):
+        total = sum(e['size'] for e in self._index.values())
+        by_age = sorted(self._index.items(), key=lambda kv: kv[1]['last_access'])
+        for key, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, entry['file']))
+            except FileNotFoundError:
+                pass
+            del self._index[key]
+            self._removed.add(key)
+            total -= entry['size']
+            self.stats['evictions'] += 1
+            self.stats['evicted_bytes'] += entry['size']
+            logger.info(f"Evicted cached download {entry['file']}")
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return {k: e for k, e in index.items()
+                if os.path.exists(os.path.join(self.cache_dir, e.get('file', '')))}
+
+    def _merge(self, disk):
+        # Entries other processes stored or used; the newer copy of each wins
+        for key, entry in disk.items():
+            if key in self._removed:
+                continue
+            mine = self._index.get(key)
+            if mine is None or entry['created'] > mine['created']:
+                self._index[key] = entry
+            elif entry['last_access'] > mine['last_access']:
+                mine['last_access'] = entry['last_access']
+
+    def _save_index(self, keep=None):
+        # Worker processes share the directory: merge what the others wrote
+        # since we loaded, under a lock, rather than overwrite it
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with FileLock(self.index_path + '.lock'):
+            self._merge(self._load_index())
+            # Gone from disk: evicted by another process
+            for key in [k for k, e in self._index.items()
+                        if k != keep and not os.path.exists(os.path.join(self.cache_dir, e['file']))]:
+                del self._index[key]
+            self._evict(keep=keep)
+            tmp_path = f'{self.index_path}.{uuid.uuid4().hex}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+        self._removed.clear()
+        self._saved_at = time.time()
+
+
+def _downloaded_path(ydl, result):
+    """Final file path of a finished yt-dlp download (after any merge)"""
+    downloads = result.get('requested_downloads') or []
+    if downloads and downloads[0].get('filepath'):
+        path = downloads[0]['filepath']
+    else:
+        path = result.get('filepath') or ydl.prepare_filename(result)
+    if not os.path.exists(path):
+        # e.g. skipped by max_filesize or a format filter
+        raise RuntimeError('Download produced no file')
+    return path
+
+
+def _is_direct(info):
+    """True for a single progressive file served over plain HTTP(S)"""
+    if info.get('requested_formats'):
+        return False  # Separate video and audio, merged by yt-dlp
+    return bool(info.get('url')) and info.get('protocol', 'https') in ('http', 'https')
+
+
+def section_window(info, start, end, padding=KEYFRAME_PADDING):
+    """
+    Time window to fetch for a ``start``/``end`` request
+
+    The window is widened by ``padding`` on each side so a stream copy
+    still finds a keyframe before ``start`` and the GOP holding ``end``
+    is complete.
+
+    Args:
+        info (dict): Resolved info dict (``duration`` may be missing)
+        start (float): Wanted start in seconds, or None
+        end (float): Wanted end in seconds, or None
+        padding (float): Seconds of padding on each side
+
+    Returns:
+        tuple: ``(start, end)`` to fetch, or None to fetch everything
+    """
+    if not start and not end:
+        return None
+    duration = info.get('duration')
+    fetch_start = max(start - padding, 0) if start else 0
+    fetch_end = end + padding if end else duration
+    if duration and fetch_end and fetch_end >= duration:
+        fetch_end = None
+    if not fetch_start and not fetch_end:
+        return None
+    return fetch_start, fetch_end
+
+
+def _download_section(info, ydl_opts, outtmpl_base, start, end):
+    """
+    Fetch only ``start``..``end`` seconds of the selected format(s)
+
+    Uses yt-dlp's ``download_ranges`` when it can find ffmpeg itself.
+    yt-dlp only looks for ffmpeg on PATH there, so with the bundled
+    imageio-ffmpeg build direct HTTP formats are cut the same way by
+    running ffmpeg on the URLs (input seeking issues range requests);
+    other protocols fall back to a full download.
+    """
+    FFmpegFD = lazy_import('yt_dlp.downloader.external').FFmpegFD
+    download_range_func = yt_dlp.utils.download_range_func
+
+    formats = info.get('requested_formats') or [info]
+    direct = all(f.get('url') and f.get('protocol', 'https') in ('http', 'https') for f in formats)
+
+    if FFmpegFD.available() or not direct:
+        opts = dict(ydl_opts, outtmpl=outtmpl_base + '.%(ext)s')
+        if FFmpegFD.available():
+            opts['download_ranges'] = download_range_func(None, [(start, end or float('inf'))])
+        else:
+            logger.info("ffmpeg not on PATH and format is not direct HTTP; downloading in full")
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            result = ydl.process_ie_result(info, download=True)
+            return _downloaded_path(ydl, result)
+
+    args = []
+    for f in formats:
+        headers = f.get('http_headers') or {}
+        if headers:
+            args += ['-headers', ''.join(f'{k}: {v}\r\n' for k, v in headers.items())]
+        if start:
+            args += ['-ss', f'{start:.3f}']
+        if end:
+            args += ['-t', f'{end - start:.3f}']
+        args += ['-i', f['url']]
+    for i in range(len(formats)):
+        args += ['-map', f'{i}:v?', '-map', f'{i}:a?']
+    ext = ydl_opts.get('merge_output_format') if len(formats) > 1 else None
+    path = f"{outtmpl_base}.{ext or info.get('ext') or 'mp4'}"
+    args += ['-c', 'copy', '-avoid_negative_ts', 'make_zero', path]
+    run_ffmpeg(args)
+    return path
+
+
+def _materialize(src, dest):
+    """Hard-link a cached file to ``dest`` (copy across filesystems)"""
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """
+    Process-wide cache configured from the environment
+
+    ``MEDIA_CACHE_DIR`` and ``MEDIA_CACHE_MAX_BYTES`` override the
+    defaults, so the web app and MediaDownloader share one store. Direct
+    HTTP formats use the range downloader (``DOWNLOAD_CONNECTIONS``,
+    ``DOWNLOAD_CHUNK_BYTES``).
+
+    Returns:
+        DownloadCache: Shared cache instance
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = DownloadCache(
+                os.environ.get('MEDIA_CACHE_DIR', DEFAULT_CACHE_DIR),
+                int(os.environ.get('MEDIA_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+                downloader_from_env()
+            )
+        return _default_cache
@@ -5,32 +5,49 @@ Uses yt-dlp library for robust media downloading
 """
 
 import os
-import yt_dlp
 import logging
 
+from download_cache import default_cache, section_window
+from metadata_cache import default_metadata_cache
+from metrics import span
+from lazy_imports import lazy_import
+
+yt_dlp = lazy_import('yt_dlp')
+
 logger = logging.getLogger(__name__)
 
 
 class MediaDownloader:
     """Handles media downloading from various sources"""
     
-    def __init__(self, download_folder):
+    def __init__(self, download_folder, cache=None):
         """
         Initialize downloader
         
         Args:
             download_folder (str): Path to store downloaded files
+            cache (DownloadCache): Download cache (default: shared process cache)
         """
         self.download_folder = download_folder
+        self.cache = cache if cache is not None else default_cache()
+        self.metadata = default_metadata_cache()
         os.makedirs(download_folder, exist_ok=True)
     
-    def download(self, url, session_id):
+    def download(self, url, session_id, start=None, end=None, on_progress=None):
         """
         Download media from URL
         
+        With ``start``/``end`` only that time window (plus keyframe
+        padding) is transferred; 'section' in the result gives the window
+        actually fetched, which is where time 0 of the file lies.
+        
         Args:
             url (str): Media URL to download
             session_id (str): Unique session identifier
+            start (float): Window start in seconds (default: beginning)
+            end (float): Window end in seconds (default: end of media)
+            on_progress (callable): Extra yt-dlp progress hook; direct
+                downloads also report 'ready_bytes' (see DownloadCache)
             
         Returns:
             dict: Result with success status and filename
@@ -55,7 +72,7 @@ class MediaDownloader:
                 'nocheckcertificate': True,
                 # Limit file size for educational demo (50MB)
                 'max_filesize': 50 * 1024 * 1024,
-                'progress_hooks': [self._progress_hook],
+                'progress_hooks': [self._progress_hook] + ([on_progress] if on_progress else []),
                 # Additional options for better compatibility
                 'ignoreerrors': False,
                 'no_color': True,
@@ -63,24 +80,31 @@ class MediaDownloader:
                 'legacy_server_connect': True,
             }
             
-            # Download the media
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                logger.info(f"Downloading from URL: {url}")
-                info = ydl.extract_info(url, download=True)
-                
-                # Get the actual filename
-                filename = ydl.prepare_filename(info)
-                filename = os.path.basename(filename)
-                
-                logger.info(f"Download complete: {filename}")
-                
-                return {
-                    'success': True,
-                    'filename': filename,
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration', 0),
-                    'ext': info.get('ext', 'mp4')
-                }
+            # Resolve the format first so the cache can be consulted
+            logger.info(f"Downloading from URL: {url}")
+            with span('extract'):
+                info = self.metadata.resolve(url, ydl_opts)
+            
+            # Download the media (or reuse a cached copy)
+            with span('download'):
+                filepath = self.cache.get_or_download(
+                    info, ydl_opts,
+                    os.path.join(self.download_folder, f'{session_id}_original'),
+                    start=start, end=end
+                )
+            section = section_window(info, start, end)
+            filename = os.path.basename(filepath)
+            
+            logger.info(f"Download complete: {filename}")
+            
+            return {
+                'success': True,
+                'filename': filename,
+                'title': info.get('title', 'Unknown'),
+                'duration': info.get('duration', 0),
+                'ext': info.get('ext', 'mp4'),
+                'section': list(section) if section else None
+            }
                 
         except yt_dlp.utils.DownloadError as e:
             logger.error(f"Download error: {str(e)}")
@@ -126,16 +150,16 @@ class MediaDownloader:
                 'extract_flat': True,
             }
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                return {
-                    'success': True,
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration', 0),
-                    'uploader': info.get('uploader', 'Unknown'),
-                    'thumbnail': info.get('thumbnail', '')
-                }
+            # Served from the shared metadata cache when possible
+            info = self.metadata.resolve(url, ydl_opts)
+            
+            return {
+                'success': True,
+                'title': info.get('title', 'Unknown'),
+                'duration': info.get('duration', 0),
+                'uploader': info.get('uploader', 'Unknown'),
+                'thumbnail': info.get('thumbnail', '')
+            }
                 
         except Exception as e:
             logger.error(f"Error getting video info: {str(e)}")
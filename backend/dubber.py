@@ -1,45 +1,74 @@
 """
 Neural Dubber Module (Demo Level)
 Simulates AI-based voice dubbing for educational demonstration
-Uses gTTS (Google Text-to-Speech) for voice synthesis
+Uses a pluggable TTS backend (gTTS by default) via the sentence-level dubbing engine
 """
 
 import os
-from moviepy.editor import VideoFileClip, AudioFileClip, CompositeAudioClip
-from gtts import gTTS
+from moviepy.editor import VideoFileClip, AudioFileClip
 import logging
 
+from tts_cache import default_tts_cache
+from dubbing_engine import DubbingEngine, parse_cues
+from audio_mixer import DubMixer
+from ffmpeg_utils import run_ffmpeg, probe_duration, mux_audio
+from metrics import span, timed, written_bytes
+from encode_scheduler import default_scheduler
+
 logger = logging.getLogger(__name__)
 
+# What happens to the original audio
+#   duck - kept under the voice, lowered while it speaks
+#   mute - replaced by the voice
+BACKGROUNDS = ('duck', 'mute')
+
 
 class NeuralDubber:
     """Handles neural dubbing demonstration"""
     
-    def __init__(self, download_folder):
+    def __init__(self, download_folder, tts_cache=None, backend=None, workers=None):
         """
         Initialize neural dubber
         
         Args:
             download_folder (str): Path to store dubbed files
+            tts_cache (TTSCache): Speech cache (default: shared process cache)
+            backend (TTSBackend): Synthesizer (default: ``TTS_BACKEND``, gTTS)
+            workers (int): Sentences synthesized concurrently
         """
         self.download_folder = download_folder
+        self.tts_cache = tts_cache if tts_cache is not None else default_tts_cache()
+        self.engine = DubbingEngine(backend, self.tts_cache, workers)
+        self.mixer = DubMixer()
         self.temp_folder = os.path.join(download_folder, 'temp')
         os.makedirs(self.temp_folder, exist_ok=True)
     
-    def dub(self, filename, session_id, text=None, language='en'):
+    @timed('dub')
+    def dub(self, filename, session_id, text=None, language='en', output_mode='remux', background='duck'):
         """
         Apply neural dubbing to media file (Demo)
         
         Args:
             filename (str): Input filename
             session_id (str): Unique session identifier
-            text (str): Text for dubbing (optional)
+            text (str): Text for dubbing (optional); SRT cues are placed at
+                their times. A list of Cue tuples is used as it is.
             language (str): Language code for TTS
+            output_mode (str): 'remux' copies the video stream and encodes
+                only the new audio; 'encode' re-encodes via MoviePy
+            background (str): Original video audio: 'duck' (mixed under the
+                voice) or 'mute'
             
         Returns:
             dict: Result with success status and dubbed filename
         """
         try:
+            if background not in BACKGROUNDS:
+                return {
+                    'success': False,
+                    'error': f'Unknown background: {background}'
+                }
+            
             input_path = os.path.join(self.download_folder, filename)
             
             if not os.path.exists(input_path):
@@ -62,13 +91,17 @@ class NeuralDubber:
             # Determine if it's video or audio
             file_ext = os.path.splitext(filename)[1].lower()
             
-            if file_ext in ['.mp4', '.avi', '.mov', '.mkv']:
-                return self._dub_video(input_path, session_id, text, language)
-            elif file_ext in ['.mp3', '.wav', '.m4a', '.aac']:
-                return self._dub_audio(input_path, session_id, text, language)
+            if file_ext in ['.mp3', '.wav', '.m4a', '.aac']:
+                result = self._dub_audio(input_path, session_id, text, language)
+            elif output_mode == 'remux':
+                result = self._dub_video_remux(input_path, session_id, text, language, background)
             else:
-                # Try as video
-                return self._dub_video(input_path, session_id, text, language)
+                # Video (or unknown, tried as video)
+                result = self._dub_video(input_path, session_id, text, language, background)
+            
+            if result.get('success'):
+                written_bytes.inc(os.path.getsize(os.path.join(self.download_folder, result['filename'])), stage='dub')
+            return result
                 
         except Exception as e:
             logger.error(f"Dubbing error: {str(e)}")
@@ -77,34 +110,52 @@ class NeuralDubber:
                 'error': str(e)
             }
     
-    def _generate_voice(self, text, language, output_path):
+    def _generate_voice(self, text, language, output_path, duration=None):
         """
         Generate synthetic voice using TTS
         
+        Sentences are synthesized concurrently (reused from the TTS cache
+        when possible) and laid out on one timeline.
+        
         Args:
-            text (str): Text to convert to speech
+            text (str): Script or SRT cues to convert to speech (or a list
+                of Cue tuples)
             language (str): Language code
             output_path (str): Output audio file path
+            duration (float): Timeline length, e.g. the video's (default: the speech's)
         """
         try:
-            # Generate speech using gTTS
-            tts = gTTS(text=text, lang=language, slow=False)
-            tts.save(output_path)
+            cues = parse_cues(text) if isinstance(text, str) else list(text)
+            with span('tts'):
+                if os.path.splitext(output_path)[1].lower() == '.wav':
+                    self.engine.render(cues, output_path, language, duration=duration)
+                else:
+                    wav_path = output_path + '.voice.wav'
+                    try:
+                        self.engine.render(cues, wav_path, language, duration=duration)
+                        run_ffmpeg(['-i', wav_path, output_path])
+                    finally:
+                        if os.path.exists(wav_path):
+                            os.remove(wav_path)
             logger.info(f"Generated voice audio: {output_path}")
             
         except Exception as e:
             logger.error(f"Voice generation error: {str(e)}")
             raise
     
-    def _dub_video(self, input_path, session_id, text, language):
+    def _dub_video(self, input_path, session_id, text, language, background='duck'):
         """
         Dub video file with synthetic voice
         
+        With ducking, the voice and original audio are mixed by the block
+        mixer into a WAV first; MoviePy then only reads a finished track.
+        
         Args:
             input_path (str): Path to input video
             session_id (str): Session identifier
             text (str): Dubbing text
             language (str): Language code
+            background (str): 'duck' or 'mute' the original audio
             
         Returns:
             dict: Dubbing result
@@ -113,21 +164,19 @@ class NeuralDubber:
             # Load video
             video = VideoFileClip(input_path)
             
-            # Generate voice audio
-            voice_audio_path = os.path.join(self.temp_folder, f'{session_id}_voice.mp3')
-            self._generate_voice(text, language, voice_audio_path)
-            
-            # Load generated voice
-            voice_audio = AudioFileClip(voice_audio_path)
+            # Generate voice audio, as long as the video (silence after the script)
+            voice_audio_path = os.path.join(self.temp_folder, f'{session_id}_voice.wav')
+            self._generate_voice(text, language, voice_audio_path, duration=video.duration)
             
-            # Adjust voice duration to match video (loop or trim)
-            if voice_audio.duration < video.duration:
-                # Loop the voice audio
-                loops_needed = int(video.duration / voice_audio.duration) + 1
-                voice_audio = voice_audio.loop(n=loops_needed)
+            mixed_audio_path = os.path.join(self.temp_folder, f'{session_id}_mixed.wav')
+            if background == 'duck':
+                self.mixer.mix_to_wav(input_path, voice_audio_path, mixed_audio_path, duration=video.duration)
+                track_path = mixed_audio_path
+            else:
+                track_path = voice_audio_path
             
-            # Trim to video duration
-            voice_audio = voice_audio.subclip(0, min(voice_audio.duration, video.duration))
+            # Load generated voice
+            voice_audio = AudioFileClip(track_path)
             
             # Replace video audio with dubbed voice
             dubbed_video = video.set_audio(voice_audio)
@@ -136,22 +185,25 @@ class NeuralDubber:
             dubbed_filename = f'{session_id}_dubbed.mp4'
             dubbed_path = os.path.join(self.download_folder, dubbed_filename)
             
-            # Write dubbed video
-            dubbed_video.write_videofile(
-                dubbed_path,
-                codec='libx264',
-                audio_codec='aac',
-                logger=None
-            )
+            # Write dubbed video (threads and preset from the shared encode budget)
+            with default_scheduler().slot() as encode:
+                dubbed_video.write_videofile(
+                    dubbed_path,
+                    codec='libx264',
+                    audio_codec='aac',
+                    logger=None,
+                    **encode.moviepy_params()
+                )
             
             # Cleanup
             video.close()
             voice_audio.close()
             dubbed_video.close()
             
-            # Remove temp voice file
-            if os.path.exists(voice_audio_path):
-                os.remove(voice_audio_path)
+            # Remove temp voice files
+            for path in (voice_audio_path, mixed_audio_path):
+                if os.path.exists(path):
+                    os.remove(path)
             
             logger.info(f"Created dubbed video: {dubbed_filename}")
             
@@ -168,6 +220,58 @@ class NeuralDubber:
                 'error': str(e)
             }
     
+    def _dub_video_remux(self, input_path, session_id, text, language, background='duck'):
+        """
+        Dub video by swapping the audio track only
+        
+        The original video stream is copied into the output container, so
+        the cost scales with the audio length rather than the resolution.
+        With ducking, mixed audio blocks are piped straight into the mux.
+        
+        Args:
+            input_path (str): Path to input video
+            session_id (str): Session identifier
+            text (str): Dubbing text
+            language (str): Language code
+            background (str): 'duck' or 'mute' the original audio
+            
+        Returns:
+            dict: Dubbing result
+        """
+        voice_audio_path = os.path.join(self.temp_folder, f'{session_id}_voice.wav')
+        try:
+            # Generate voice audio on a timeline as long as the video
+            self._generate_voice(text, language, voice_audio_path, duration=probe_duration(input_path))
+            
+            # Generate output filename
+            dubbed_filename = f'{session_id}_dubbed.mp4'
+            dubbed_path = os.path.join(self.download_folder, dubbed_filename)
+            
+            # Swap in the voice track (over the ducked original), copy the video stream
+            if background == 'duck':
+                self.mixer.mix_into_video(input_path, voice_audio_path, dubbed_path)
+            else:
+                mux_audio(input_path, voice_audio_path, dubbed_path, pad_audio=True)
+            
+            logger.info(f"Created dubbed video: {dubbed_filename}")
+            
+            return {
+                'success': True,
+                'filename': dubbed_filename,
+                'method': 'Neural TTS (Demo)'
+            }
+            
+        except Exception as e:
+            logger.error(f"Video dubbing error: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            # Remove temp voice file
+            if os.path.exists(voice_audio_path):
+                os.remove(voice_audio_path)
+    
     def _dub_audio(self, input_path, session_id, text, language):
         """
         Replace audio file with synthetic voice
@@ -0,0 +1,292 @@
+"""
+Dubbing Engine Module
+Splits scripts and SRT cue lists into sentences and synthesizes them concurrently
+Places each sentence at its cue time on one NumPy PCM timeline
+"""
+
+import io
+import os
+import re
+import time
+import wave
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from tts_cache import default_tts_cache
+from tts_backends import default_backend
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000          # Timeline rate (gTTS output rate)
+SENTENCE_GAP = 0.25          # Silence between untimed sentences, in seconds
+MAX_SENTENCE_CHARS = 200     # Longer sentences are split at clause breaks
+DEFAULT_WORKERS = 8          # Concurrent synthesis requests (network bound)
+BLOCK_SAMPLES = 65536        # Silence is written this many samples at a time
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?…])\s+|(?<=[.!?…]["\')\]])\s+')
+_CLAUSE_RE = re.compile(r'(?<=[,;:—])\s+')
+_SRT_TIME_RE = re.compile(
+    r'(\d+):(\d{2}):(\d{2})[,.](\d{3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{3})'
+)
+
+# One unit of speech; start/end are None for untimed script sentences
+Cue = namedtuple('Cue', 'start end text')
+
+
+def split_sentences(text):
+    """
+    Split text into sentences short enough to synthesize quickly
+
+    Sentences over ``MAX_SENTENCE_CHARS`` are split at clause breaks, then
+    between words, so no single request dominates synthesis latency.
+
+    Args:
+        text (str): Script text
+
+    Returns:
+        list: Non-empty sentence strings in order
+    """
+    sentences = []
+    for sentence in _SENTENCE_END_RE.split(' '.join(text.split())):
+        if len(sentence) <= MAX_SENTENCE_CHARS:
+            sentences.append(sentence)
+            continue
+        part = ''
+        for piece in (w for clause in _CLAUSE_RE.split(sentence) for w in _wrap(clause)):
+            if part and len(part) + 1 + len(piece) > MAX_SENTENCE_CHARS:
+                sentences.append(part)
+                part = piece
+            else:
+                part = f'{part} {piece}' if part else piece
+        sentences.append(part)
+    return [s for s in sentences if s.strip()]
+
+
+def _wrap(clause):
+    """A clause as-is, or its words when it alone is too long"""
+    return [clause] if len(clause) <= MAX_SENTENCE_CHARS else clause.split()
+
+
+def parse_srt(text):
+    """
+    Parse SubRip (or WebVTT-style) cues into sentence cues
+
+    A cue holding several sentences keeps its time for the first; the
+    rest follow it as untimed cues.
+
+    Args:
+        text (str): SRT file contents
+
+    Returns:
+        list: Cue tuples in time order
+    """
+    cues = []
+    for block in re.split(r'\n\s*\n', text.replace('\r\n', '\n').strip()):
+        lines = block.strip().split('\n')
+        for i, line in enumerate(lines):
+            match = _SRT_TIME_RE.search(line)
+            if not match:
+                continue
+            h1, m1, s1, ms1, h2, m2, s2, ms2 = (int(g) for g in match.groups())
+            start = h1 * 3600 + m1 * 60 + s1 + ms1 / 1000
+            end = h2 * 3600 + m2 * 60 + s2 + ms2 / 1000
+            # Drop inline markup such as <i> and {\an8}
+            body = re.sub(r'<[^>]+>|\{[^}]*\}', '', ' '.join(lines[i + 1:]))
+            for k, sentence in enumerate(split_sentences(body)):
+                cues.append(Cue(start, end, sentence) if k == 0 else Cue(None, None, sentence))
+            break
+    timed = [c for c in cues if c.start is not None]
+    if timed != sorted(timed, key=lambda c: c.start):
+        logger.warning("SRT cues are out of order; placing them in file order")
+    return cues
+
+
+def parse_cues(text):
+    """
+    Sentence cues from either a plain script or an SRT cue list
+
+    Args:
+        text (str): Script or SRT contents (detected by its ``-->`` timings)
+
+    Returns:
+        list: Cue tuples; plain scripts give untimed cues
+    """
+    if _SRT_TIME_RE.search(text):
+        return parse_srt(text)
+    return [Cue(None, None, sentence) for sentence in split_sentences(text)]
+
+
+def window_cues(cues, start, end):
+    """
+    The cues spoken within one time window, re-timed to the window's start
+
+    A timed cue belongs to the window holding its start time, and untimed
+    cues go with the timed cue before them. A script without any timings
+    is spoken in full in every window.
+
+    Args:
+        cues (list): Cue tuples
+        start (float): Window start in seconds
+        end (float): Window end in seconds
+
+    Returns:
+        list: Cue tuples with times relative to ``start``
+    """
+    if all(cue.start is None for cue in cues):
+        return list(cues)
+    window = []
+    inside = start <= 0 < end  # Untimed cues before the first timing open the media
+    for cue in cues:
+        if cue.start is not None:
+            inside = start <= cue.start < end
+            if inside:
+                window.append(Cue(cue.start - start, cue.end - start, cue.text))
+        elif inside:
+            window.append(cue)
+    return window
+
+
+def _decode_wav(data, sample_rate):
+    """WAV bytes as mono float32 samples at ``sample_rate``"""
+    with wave.open(io.BytesIO(data), 'rb') as f:
+        channels, width, rate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+        raw = f.readframes(f.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f'Unsupported WAV sample width: {width} bytes')
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate and len(samples):
+        # Linear resampling is plenty for speech
+        positions = np.arange(int(len(samples) * sample_rate / rate)) * (rate / sample_rate)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+
+def _write_silence(f, samples):
+    """Append ``samples`` of silence to a 16-bit WAV writer, one block at a time"""
+    block = bytes(2 * max(0, min(samples, BLOCK_SAMPLES)))
+    while samples > 0:
+        count = min(samples, BLOCK_SAMPLES)
+        f.writeframesraw(block[:2 * count])
+        samples -= count
+
+
+class DubbingEngine:
+    """Concurrent sentence synthesis assembled into one voice track"""
+
+    def __init__(self, backend=None, tts_cache=None, workers=None, sample_rate=SAMPLE_RATE):
+        """
+        Initialize dubbing engine
+
+        Args:
+            backend (TTSBackend): Synthesizer (default: ``TTS_BACKEND``)
+            tts_cache (TTSCache): Speech cache (default: shared process cache)
+            workers (int): Concurrent synthesis requests (default: ``TTS_WORKERS`` or 8)
+            sample_rate (int): Timeline sample rate
+        """
+        self.backend = backend or default_backend()
+        self.tts_cache = tts_cache if tts_cache is not None else default_tts_cache()
+        self.workers = workers or int(os.environ.get('TTS_WORKERS', DEFAULT_WORKERS))
+        self.sample_rate = sample_rate
+
+    def synthesize(self, cues, language='en', tld='com', speed=1.0):
+        """
+        Synthesize every cue's sentence concurrently
+
+        Sentences go to a thread pool, so a script's latency is about that
+        of its slowest sentence rather than the sum of all of them.
+        Repeated sentences are synthesized once (and cached across runs).
+
+        Args:
+            cues (list): Cue tuples
+            language (str): Language code
+            tld (str): Accent / regional domain
+            speed (float): Speaking rate
+
+        Returns:
+            list: Mono float32 sample arrays, one per cue
+        """
+        def speak(text):
+            data = self.tts_cache.read(text, language, self.backend, tld=tld,
+                                       backend=self.backend.name, speed=speed)
+            return _decode_wav(data, self.sample_rate)
+
+        texts = list(dict.fromkeys(cue.text for cue in cues))
+        if not texts:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(texts)))) as pool:
+            audio = dict(zip(texts, pool.map(speak, texts)))
+        return [audio[cue.text] for cue in cues]
+
+    def render(self, cues, output_path, language='en', tld='com', speed=1.0, duration=None):
+        """
+        Write the cues' speech as one WAV timeline
+
+        Timed cues start at their cue time; untimed ones follow the
+        previous sentence after a short gap. Speech never overlaps: a
+        sentence that would start before the previous one ends is
+        pushed back (and reported in the placements). The file is written
+        in order, sentence by sentence with the silence between them in
+        fixed-size blocks, so memory holds the speech but never the
+        whole timeline.
+
+        Args:
+            cues (list): Cue tuples
+            output_path (str): Output WAV path (mono, 16-bit)
+            language (str): Language code
+            tld (str): Accent / regional domain
+            speed (float): Speaking rate
+            duration (float): Timeline length in seconds, silence-padded or
+                truncated (default: until the last sentence ends)
+
+        Returns:
+            dict: 'duration', 'synth_seconds' and per-sentence 'placements'
+                (start, end, scheduled start) in seconds
+        """
+        started = time.perf_counter()
+        clips = self.synthesize(cues, language, tld, speed)
+        synth_seconds = time.perf_counter() - started
+
+        rate = self.sample_rate
+        gap = int(SENTENCE_GAP * rate)
+        positions = []
+        cursor = 0
+        for cue, clip in zip(cues, clips):
+            wanted = int(round(cue.start * rate)) if cue.start is not None else (cursor + gap if positions else 0)
+            begin = max(wanted, cursor)
+            positions.append((begin, wanted))
+            cursor = begin + len(clip)
+
+        length = int(round(duration * rate)) if duration else cursor
+        placements = []
+        with wave.open(output_path, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(rate)
+            f.setnframes(length)
+            written = 0
+            for (begin, wanted), clip in zip(positions, clips):
+                end = min(begin + len(clip), length)
+                if end > begin:
+                    _write_silence(f, begin - written)
+                    f.writeframesraw((np.clip(clip[:end - begin], -1.0, 1.0) * 32767).astype('<i2').tobytes())
+                    written = end
+                placements.append((round(begin / rate, 3), round((begin + len(clip)) / rate, 3), round(wanted / rate, 3)))
+            _write_silence(f, length - written)
+        if cursor > length:
+            logger.warning(f"Speech runs {(cursor - length) / rate:.1f}s past the timeline and was cut")
+
+        logger.info(f"Rendered {len(cues)} sentences ({length / rate:.1f}s) after {synth_seconds:.2f}s of synthesis")
+        return {
+            'duration': length / rate,
+            'synth_seconds': round(synth_seconds, 3),
+            'placements': placements
+        }
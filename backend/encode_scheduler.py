@@ -0,0 +1,193 @@
+"""
+Encode Scheduler Module
+Shares one CPU thread budget between all video encodes in the process
+Admits encodes in arrival order, assigning threads and x264 settings per profile
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import encode_wait_seconds, encode_queue_depth, encode_threads_in_use
+
+logger = logging.getLogger(__name__)
+
+# Named x264 profiles: preset, quality (CRF) and the threads one encode may use.
+# Fewer threads per encode scale better across many concurrent jobs.
+PROFILES = {
+    'throughput': {'preset': 'ultrafast', 'crf': 26, 'threads': 2},
+    'balanced': {'preset': 'veryfast', 'crf': 23, 'threads': 4},
+    'quality': {'preset': 'medium', 'crf': 20, 'threads': 8},
+}
+DEFAULT_PROFILE = 'balanced'
+
+
+class EncodeSlot:
+    """Settings granted to one admitted encode"""
+
+    def __init__(self, profile, threads, preset, crf):
+        self.profile = profile
+        self.threads = threads
+        self.preset = preset
+        self.crf = crf
+
+    def x264_args(self):
+        """
+        ffmpeg output options for libx264
+
+        Returns:
+            list: ``-c:v libx264`` with preset, CRF and thread count
+        """
+        return ['-c:v', 'libx264', '-preset', self.preset, '-crf', str(self.crf), '-threads', str(self.threads)]
+
+    def moviepy_params(self):
+        """
+        Keyword arguments for MoviePy's ``write_videofile``
+
+        Returns:
+            dict: Picklable, so it can be sent to pool workers
+        """
+        return {'preset': self.preset, 'threads': self.threads, 'ffmpeg_params': ['-crf', str(self.crf)]}
+
+
+class EncodeScheduler:
+    """FIFO admission of encodes against a thread budget"""
+
+    def __init__(self, budget=None, profile=DEFAULT_PROFILE):
+        """
+        Initialize scheduler
+
+        Args:
+            budget (int): Encoder threads shared by all encodes (default: CPU count)
+            profile (str): Profile used when callers do not name one
+        """
+        if profile not in PROFILES:
+            raise ValueError(f'Unknown encode profile: {profile}')
+        self.budget = max(1, budget or os.cpu_count() or 1)
+        self.profile = profile
+        self.stats = {'admitted': 0, 'queued': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+        self._cond = threading.Condition()
+        self._waiting = deque()
+        self._running = {}
+        self._in_use = 0
+        self._busy_seconds = 0.0  # Thread-seconds of finished encodes
+        self._started = time.monotonic()
+
+    @contextmanager
+    def slot(self, profile=None, threads=None):
+        """
+        Wait for room in the budget and hold it while encoding
+
+        Encodes are admitted strictly in arrival order. An encode starts
+        once at least half of its threads are free and gets what is left,
+        up to its profile's thread count, so the budget rarely sits idle
+        behind a queue while no encode is starved down to one thread.
+
+        Args:
+            profile (str): Profile name (default: the scheduler's)
+            threads (int): Override the profile's thread count (e.g. 1 for
+                single-threaded audio encodes)
+
+        Yields:
+            EncodeSlot: Threads, preset and CRF to encode with
+        """
+        name = profile or self.profile
+        if name not in PROFILES:
+            raise ValueError(f'Unknown encode profile: {name}')
+        spec = PROFILES[name]
+        wanted = max(1, min(threads or spec['threads'], self.budget))
+        minimum = max(1, wanted // 2)
+
+        ticket = object()
+        queued_at = time.monotonic()
+        with self._cond:
+            self._waiting.append(ticket)
+            encode_queue_depth.inc()
+            while self._waiting[0] is not ticket or self.budget - self._in_use < minimum:
+                self._cond.wait()
+            self._waiting.popleft()
+            encode_queue_depth.dec()
+            granted = min(wanted, self.budget - self._in_use)
+            self._in_use += granted
+            admitted_at = time.monotonic()
+            self._running[ticket] = (granted, admitted_at)
+            waited = admitted_at - queued_at
+            self.stats['admitted'] += 1
+            self.stats['wait_seconds'] += waited
+            self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], waited)
+            if waited > 0.001:
+                self.stats['queued'] += 1
+            # The next in line may fit into what is left
+            self._cond.notify_all()
+        encode_threads_in_use.inc(granted)
+        encode_wait_seconds.observe(waited, profile=name)
+        if waited > 1:
+            logger.info(f"Encode waited {waited:.1f}s for {granted} thread(s) ({name})")
+
+        try:
+            yield EncodeSlot(name, granted, spec['preset'], spec['crf'])
+        finally:
+            encode_threads_in_use.dec(granted)
+            with self._cond:
+                del self._running[ticket]
+                self._in_use -= granted
+                self._busy_seconds += granted * (time.monotonic() - admitted_at)
+                self._cond.notify_all()
+
+    def snapshot(self):
+        """
+        Queue and utilization figures for sizing hosts
+
+        Returns:
+            dict: Budget, threads in use, queue length, wait times and
+            utilization (busy thread-seconds over budget x uptime)
+        """
+        with self._cond:
+            now = time.monotonic()
+            busy = self._busy_seconds + sum(t * (now - since) for t, since in self._running.values())
+            stats = dict(self.stats)
+            uptime = now - self._started
+            snapshot = {
+                'budget': self.budget,
+                'profile': self.profile,
+                'threads_in_use': self._in_use,
+                'running': len(self._running),
+                'waiting': len(self._waiting)
+            }
+        admitted = stats['admitted']
+        snapshot.update(
+            admitted=admitted,
+            queued=stats['queued'],
+            avg_wait_seconds=round(stats['wait_seconds'] / admitted, 3) if admitted else 0.0,
+            max_wait_seconds=round(stats['max_wait_seconds'], 3),
+            utilization=round(busy / (self.budget * uptime), 4) if uptime > 0 else 0.0
+        )
+        return snapshot
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler():
+    """
+    Process-wide scheduler configured from the environment
+
+    ``ENCODE_THREADS`` sets the thread budget (default: CPU count; divide
+    it between server processes that share a host) and ``ENCODE_PROFILE``
+    the default profile.
+
+    Returns:
+        EncodeScheduler: Shared scheduler instance
+    """
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = EncodeScheduler(
+                int(os.environ.get('ENCODE_THREADS', '0')) or None,
+                os.environ.get('ENCODE_PROFILE', DEFAULT_PROFILE)
+            )
+        return _default_scheduler
@@ -0,0 +1,246 @@
+"""
+FFmpeg Utilities Module
+Thin helpers around the ffmpeg binary shipped with imageio-ffmpeg
+Used for stream-copy cutting and probing without MoviePy decoding
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import threading
+import logging
+
+from encode_scheduler import default_scheduler
+
+logger = logging.getLogger(__name__)
+
+_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+_PTS_TIME_RE = re.compile(r'pts_time:\s*(-?\d+(?:\.\d+)?)')
+_STREAM_RE = re.compile(r'Stream #0:\d+.*?: (Video|Audio):')
+_VIDEO_SIZE_RE = re.compile(r'Stream #0:\d+.*?: Video:.*?, (\d{2,5})x(\d{2,5})')
+
+
+class FFmpegError(RuntimeError):
+    """Raised when an ffmpeg invocation exits with a non-zero status"""
+
+
+def get_ffmpeg_exe():
+    """
+    Locate the ffmpeg binary
+
+    Returns:
+        str: Path to ffmpeg (imageio-ffmpeg build first, then system PATH)
+    """
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        exe = shutil.which('ffmpeg')
+        if not exe:
+            raise FFmpegError('ffmpeg executable not found')
+        return exe
+
+
+def run_ffmpeg(args, duration=None, on_progress=None):
+    """
+    Run ffmpeg with the given arguments
+
+    Args:
+        args (list): Arguments after the executable (inputs, filters, outputs)
+        duration (float): Expected output duration, enables fractional progress
+        on_progress (callable): Called with completion (0-1) while encoding
+
+    Returns:
+        str: Captured stderr output
+    """
+    cmd = [get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-y', '-loglevel', 'error']
+    if on_progress and duration:
+        cmd += ['-progress', 'pipe:1', '-nostats']
+    cmd += list(args)
+
+    if not (on_progress and duration):
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stderr = proc.stderr.decode('utf-8', 'replace')
+        returncode = proc.returncode
+    else:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        errors = []
+        drain = threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)
+        drain.start()
+        for line in proc.stdout:
+            key, _, value = line.decode('ascii', 'replace').strip().partition('=')
+            if key == 'out_time_us' and value.isdigit():
+                on_progress(min(int(value) / 1e6 / duration, 1.0))
+        returncode = proc.wait()
+        drain.join()
+        stderr = b''.join(errors).decode('utf-8', 'replace')
+
+    if returncode != 0:
+        raise FFmpegError(stderr.strip() or f'ffmpeg exited with status {returncode}')
+    return stderr
+
+
+def probe_duration(path):
+    """
+    Read the container duration of a media file
+
+    Args:
+        path (str): Media file path
+
+    Returns:
+        float: Duration in seconds
+    """
+    cmd = [get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-i', path]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    match = _DURATION_RE.search(proc.stderr.decode('utf-8', 'replace'))
+    if not match:
+        raise FFmpegError(f'Could not determine duration of {os.path.basename(path)}')
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def probe_streams(path):
+    """
+    List the kinds of streams in a media file
+
+    Args:
+        path (str): Media file path
+
+    Returns:
+        set: Any of 'video' and 'audio' (cover art is not video)
+    """
+    cmd = [get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-i', path]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    kinds = set()
+    for line in proc.stderr.decode('utf-8', 'replace').splitlines():
+        match = _STREAM_RE.search(line)
+        if match and 'attached pic' not in line:
+            kinds.add(match.group(1).lower())
+    return kinds
+
+
+def probe_video_size(path):
+    """
+    Read the frame size of the first video stream
+
+    Args:
+        path (str): Media file path
+
+    Returns:
+        tuple: (width, height) in pixels
+    """
+    cmd = [get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-i', path]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    for line in proc.stderr.decode('utf-8', 'replace').splitlines():
+        match = _VIDEO_SIZE_RE.search(line)
+        if match and 'attached pic' not in line:
+            return int(match.group(1)), int(match.group(2))
+    raise FFmpegError(f'No video stream in {os.path.basename(path)}')
+
+
+def probe_keyframes(path):
+    """
+    List keyframe timestamps of the first video stream
+
+    Only keyframes are decoded (``-skip_frame nokey``), so this is far
+    cheaper than a full decode.
+
+    Args:
+        path (str): Media file path
+
+    Returns:
+        list: Sorted keyframe presentation times in seconds
+    """
+    cmd = [
+        get_ffmpeg_exe(), '-hide_banner', '-nostdin',
+        '-skip_frame', 'nokey', '-i', path,
+        '-map', '0:v:0', '-vf', 'showinfo', '-f', 'null', '-'
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise FFmpegError(proc.stderr.decode('utf-8', 'replace').strip())
+    times = [float(t) for t in _PTS_TIME_RE.findall(proc.stderr.decode('utf-8', 'replace'))]
+    return sorted(set(times))
+
+
+def is_keyframe(path, timestamp, tolerance=0.02):
+    """
+    Check whether a timestamp lands on a video keyframe
+
+    Args:
+        path (str): Media file path
+        timestamp (float): Time in seconds
+        tolerance (float): Allowed distance in seconds
+
+    Returns:
+        bool: True if a keyframe lies within ``tolerance`` of ``timestamp``
+    """
+    return any(abs(k - timestamp) <= tolerance for k in probe_keyframes(path))
+
+
+def copy_range(input_path, start_time, end_time, output_path):
+    """
+    Stream copy a time range starting on a keyframe
+
+    Args:
+        input_path (str): Source media path
+        start_time (float): Range start in seconds (a keyframe)
+        end_time (float): Range end in seconds
+        output_path (str): Destination path
+    """
+    run_ffmpeg([
+        '-ss', f'{start_time:.6f}', '-i', input_path,
+        '-t', f'{end_time - start_time:.6f}',
+        '-map', '0:v:0?', '-map', '0:a:0?', '-c', 'copy',
+        '-avoid_negative_ts', 'make_zero', output_path
+    ])
+
+
+def mux_audio(video_path, audio_path, output_path, start=0.0, end=None,
+              loop_audio=False, pad_audio=False, on_progress=None):
+    """
+    Replace a video's audio track without re-encoding the video
+
+    The video stream is copied bit-for-bit and only the new audio is
+    encoded. The video is re-encoded only when ``start`` falls between
+    keyframes, where a copy could not begin; that encode waits for
+    threads from the shared encode scheduler.
+
+    Args:
+        video_path (str): Source video
+        audio_path (str): New audio track
+        output_path (str): Destination MP4
+        start (float): Trim start in seconds
+        end (float): Trim end in seconds (default: end of video)
+        loop_audio (bool): Repeat the audio to fill the video
+        pad_audio (bool): Pad short audio with silence to the video length
+        on_progress (callable): Receives completion (0-1)
+
+    Returns:
+        str: 'copy' if the video stream was copied, 'encode' otherwise
+    """
+    duration = probe_duration(video_path)
+    end = min(end, duration) if end else duration
+    method = 'copy' if not start or is_keyframe(video_path, start) else 'encode'
+
+    args = []
+    if start:
+        args += ['-ss', f'{start:.6f}']
+    args += ['-i', video_path]
+    if loop_audio:
+        args += ['-stream_loop', '-1']
+    args += [
+        '-i', audio_path, '-t', f'{end - start:.6f}',
+        '-map', '0:v:0', '-map', '1:a:0'
+    ]
+    if pad_audio:
+        args += ['-af', 'apad']
+    args += ['-c:a', 'aac', '-movflags', '+faststart']
+
+    if method == 'copy':
+        run_ffmpeg(args + ['-c:v', 'copy', output_path], duration=end - start, on_progress=on_progress)
+    else:
+        with default_scheduler().slot() as encode:
+            run_ffmpeg(args + encode.x264_args() + [output_path], duration=end - start, on_progress=on_progress)
+    return method
@@ -0,0 +1,117 @@
+"""
+File Lock Module
+Exclusive advisory locks on lock files, shared by processes on one host
+The OS drops a lock when its holder exits, so a crashed process never leaves one stale
+"""
+
+import os
+import time
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+POLL_SECONDS = 0.05   # Retry interval of a blocking acquire on Windows
+
+
+class FileLock:
+    """Exclusive lock held through an open lock file (``flock`` / ``msvcrt.locking``)"""
+
+    def __init__(self, path, remove=False):
+        """
+        Initialize file lock
+
+        Args:
+            path (str): Lock file, created on first acquire
+            remove (bool): Delete the lock file on release, for locks
+                named after short-lived work
+        """
+        self.path = path
+        self.remove = remove
+        self._fd = None
+
+    def acquire(self, blocking=True):
+        """
+        Take the lock
+
+        Args:
+            blocking (bool): Wait for the holder to release it
+
+        Returns:
+            bool: True if the lock is now held, False if it is taken and
+                ``blocking`` is False
+        """
+        while True:
+            fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+            try:
+                if not _lock(fd, blocking):
+                    os.close(fd)
+                    return False
+                # A releasing holder may have deleted the file we opened
+                if self.remove and not _same_file(fd, self.path):
+                    _unlock(fd)
+                    os.close(fd)
+                    continue
+            except BaseException:
+                os.close(fd)
+                raise
+            self._fd = fd
+            return True
+
+    def release(self):
+        """Drop the lock (deleting the lock file first when ``remove`` is set)"""
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        if self.remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass  # Gone already, or open elsewhere on Windows
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _lock(fd, blocking):
+    if fcntl:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            return False
+    while True:
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(POLL_SECONDS)
+
+
+def _unlock(fd):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _same_file(fd, path):
+    try:
+        return os.path.samestat(os.fstat(fd), os.stat(path))
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,291 @@
+"""
+File Server Module
+Serves finished media with byte ranges, strong ETags and conditional GET
+Lets clients resume large downloads and skip files they already have
+"""
+
+import io
+import os
+import uuid
+import mimetypes
+import unicodedata
+import logging
+from urllib.parse import quote
+
+from flask import Response, request
+from werkzeug.http import http_date, parse_date, parse_etags
+from werkzeug.wsgi import ClosingIterator, wrap_file
+
+logger = logging.getLogger(__name__)
+
+MAX_RANGES = 16           # More ranges than this are ignored (full 200 response)
+CHUNK_SIZE = 256 * 1024   # Read size when the server cannot sendfile
+
+
+def safe_filename(name):
+    """
+    Check that a requested name is a plain file name inside one folder
+
+    Segment (``*_segment_3.mp4``), dub (``*_dubbed.mp4``, ``*_AIDubbed.mp4``)
+    and other toolkit outputs pass; paths, hidden files and separators of
+    either platform do not.
+
+    Args:
+        name (str): File name from the request
+
+    Returns:
+        bool: True if the name is safe to join onto a folder
+    """
+    if not name or name in ('.', '..') or name.startswith('.'):
+        return False
+    if '/' in name or '\\' in name or '\0' in name:
+        return False
+    return os.path.basename(name) == name
+
+
+def resolve_file(folder, name):
+    """
+    Map a requested file name to a path inside ``folder``
+
+    Args:
+        folder (str): Directory files are served from
+        name (str): File name from the request
+
+    Returns:
+        str: Existing file path, or None if invalid or missing
+    """
+    if not safe_filename(name):
+        return None
+    root = os.path.realpath(folder)
+    path = os.path.realpath(os.path.join(root, name))
+    # Symlinks must not lead out of the folder
+    if os.path.dirname(path) != root or not os.path.isfile(path):
+        return None
+    return path
+
+
+def file_etag(st):
+    """
+    Strong ETag from file identity: device, inode, size and mtime
+
+    Args:
+        st (os.stat_result): Result of ``os.stat``
+
+    Returns:
+        str: Quoted entity tag
+    """
+    return f'"{st.st_dev:x}-{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_ranges(header, size):
+    """
+    Parse a ``Range: bytes=...`` header against a file size
+
+    Overlapping and adjacent ranges are merged, as RFC 9110 allows.
+
+    Args:
+        header (str): Raw Range header
+        size (int): File size in bytes
+
+    Returns:
+        list: Sorted inclusive ``(start, end)`` pairs; empty if none is
+        satisfiable, None if the header is malformed (serve everything)
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        first, sep, last = part.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and end < start:
+                    return None
+            else:
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _not_modified(st, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # Weak comparison is the rule for If-None-Match
+        return parse_etags(if_none_match).contains_weak(etag.strip('"'))
+    since = parse_date(request.headers.get('If-Modified-Since'))
+    return since is not None and int(st.st_mtime) <= since.timestamp()
+
+
+def _if_range_matches(st, etag):
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"'):
+        return value == etag  # Strong comparison only
+    date = parse_date(value)
+    return date is not None and int(st.st_mtime) == int(date.timestamp())
+
+
+def _content_disposition(download_name):
+    try:
+        download_name.encode('ascii')
+        return {'filename': download_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='')}"}
+
+
+class _ClosingFile(io.BufferedReader):
+    """Binary file running a callback once closed; still a real fd for sendfile"""
+
+    def __init__(self, path, on_close):
+        super().__init__(io.FileIO(path, 'rb'))
+        self._on_close = on_close
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            callback, self._on_close = self._on_close, None
+            if callback:
+                callback()
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def send_media_file(path, download_name=None, as_attachment=True, on_close=None):
+    """
+    Build a GET/HEAD response for a file with range and cache validators
+
+    Handles If-None-Match / If-Modified-Since (304), If-Range, single
+    ranges (206), multiple ranges (206 multipart/byteranges) and
+    unsatisfiable ranges (416). Bodies that run to the end of the file go
+    through ``wsgi.file_wrapper`` so servers such as gunicorn can use
+    ``os.sendfile`` instead of copying through Python.
+
+    Args:
+        path (str): File to serve
+        download_name (str): Name offered to the browser (default: basename)
+        as_attachment (bool): Send ``Content-Disposition: attachment``
+        on_close (callable): Called once the body is done with the file
+            (sent, aborted, or never needed). ``call_on_close`` cannot be
+            used for this: passthrough bodies skip it
+
+    Returns:
+        Response: Flask response
+    """
+    st = os.stat(path)
+    size = st.st_size
+    etag = file_etag(st)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'private, no-cache'
+    }
+
+    if _not_modified(st, etag):
+        _call(on_close)
+        return Response(status=304, headers=headers)
+
+    ranges = None
+    if request.headers.get('Range') and _if_range_matches(st, etag):
+        ranges = parse_ranges(request.headers['Range'], size)
+        if ranges == []:
+            _call(on_close)
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+
+    if not ranges:
+        status, body_start, body_end = 200, 0, size - 1
+    elif len(ranges) == 1:
+        status, (body_start, body_end) = 206, ranges[0]
+        headers['Content-Range'] = f'bytes {body_start}-{body_end}/{size}'
+    else:
+        response = _multipart_response(path, ranges, size, mimetype, headers, on_close)
+        return _finish(response, path, download_name, as_attachment)
+
+    length = body_end - body_start + 1 if size else 0
+    if request.method == 'HEAD':
+        _call(on_close)
+        body = ()
+    elif body_end == size - 1:
+        # Runs to EOF: hand the open file to the server (sendfile if supported)
+        f = _ClosingFile(path, on_close) if on_close else open(path, 'rb')
+        f.seek(body_start)
+        body = wrap_file(request.environ, f, CHUNK_SIZE)
+    else:
+        body = _read_range(path, body_start, body_end)
+        if on_close:
+            body = ClosingIterator(body, on_close)
+
+    response = Response(body, status=status, mimetype=mimetype, headers=headers, direct_passthrough=True)
+    response.content_length = length
+    return _finish(response, path, download_name, as_attachment)
+
+
+def _call(callback):
+    if callback:
+        callback()
+
+
+def _multipart_response(path, ranges, size, mimetype, headers, on_close=None):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for start, end in ranges:
+        head = (f'--{boundary}\r\nContent-Type: {mimetype}\r\n'
+                f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode('ascii')
+        parts.append((head, start, end))
+    tail = f'--{boundary}--\r\n'.encode('ascii')
+    length = sum(len(head) + end - start + 1 + 2 for head, start, end in parts) + len(tail)
+
+    def body():
+        for head, start, end in parts:
+            yield head
+            yield from _read_range(path, start, end)
+            yield b'\r\n'
+        yield tail
+
+    response = Response(ClosingIterator(body(), on_close) if on_close else body(), status=206, headers=headers, direct_passthrough=True,
+                        content_type=f'multipart/byteranges; boundary={boundary}')
+    response.content_length = length
+    return response
+
+
+def _finish(response, path, download_name, as_attachment):
+    name = download_name or os.path.basename(path)
+    response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline',
+                         **_content_disposition(name))
+    return response
@@ -0,0 +1,306 @@
+"""
+Job Manager Module
+Runs long media pipelines on a fixed worker pool
+Publishes live progress events for Server-Sent Events streaming
+"""
+
+import json
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """State and progress event log of one submitted pipeline run"""
+
+    def __init__(self, job_id):
+        """
+        Initialize job
+
+        Args:
+            job_id (str): Unique job identifier
+        """
+        self.id = job_id
+        self.status = 'queued'  # queued -> running -> done | error
+        self.stage = 'queued'
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.events = []
+        self.artifacts = []  # (path, download_name, workspace) kept server-side
+        self._stage_range = (0.0, 100.0)
+        self._cond = threading.Condition()
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'error')
+
+    def to_dict(self):
+        """
+        Public job state
+
+        Returns:
+            dict: JSON-serialisable job snapshot
+        """
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 1),
+            'result': self.result,
+            'error': self.error
+        }
+
+    def _publish(self, message=None):
+        event = self.to_dict()
+        event['message'] = message
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def set_stage(self, stage, start, end, message=None):
+        """
+        Enter a pipeline stage occupying a slice of the progress bar
+
+        Args:
+            stage (str): Stage name (e.g. 'download', 'encode')
+            start (float): Overall progress when the stage begins
+            end (float): Overall progress when the stage completes
+            message (str): Optional log line for the client
+        """
+        self.stage = stage
+        self._stage_range = (start, end)
+        self.progress = max(self.progress, start)
+        self._publish(message)
+
+    def update(self, fraction, message=None):
+        """
+        Report progress within the current stage
+
+        Args:
+            fraction (float): Stage completion between 0 and 1
+            message (str): Optional log line for the client
+        """
+        start, end = self._stage_range
+        fraction = min(max(fraction, 0.0), 1.0)
+        progress = start + (end - start) * fraction
+        # Skip sub-percent updates so chatty hooks do not flood clients
+        if message is None and progress - self.progress < 1.0:
+            return
+        self.progress = max(self.progress, progress)
+        self._publish(message)
+
+    def ytdlp_hook(self, d):
+        """
+        yt-dlp progress hook feeding the current stage
+
+        Args:
+            d (dict): Progress information from yt-dlp
+        """
+        if d['status'] == 'downloading':
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            if total:
+                self.update(d.get('downloaded_bytes', 0) / total)
+        elif d['status'] == 'finished':
+            self.update(1.0, 'Download finished, processing...')
+
+    def add_artifact(self, path, download_name, workspace=None):
+        """
+        Register an output file that clients fetch through the job
+
+        Args:
+            path (str): Server-side file path (never sent to clients)
+            download_name (str): Filename offered to the browser
+            workspace (Workspace): Holder of the file; the job owns one
+                reference to it until the job expires
+
+        Returns:
+            str: Relative URL serving the file
+        """
+        with self._cond:
+            self.artifacts.append((path, download_name, workspace))
+            index = len(self.artifacts) - 1
+        return f"/api/jobs/{self.id}/file?item={index}"
+
+    def finish(self, result=None, error=None):
+        """
+        Mark the job finished and wake all event listeners
+
+        Args:
+            result (dict): Pipeline result on success
+            error (str): Error message on failure
+        """
+        self.result = result
+        self.error = error
+        self.status = 'error' if error else 'done'
+        self.stage = self.status
+        self.finished = time.time()
+        if not error:
+            self.progress = 100.0
+        self._publish(error)
+
+    def close(self):
+        """Release the workspaces holding this job's files"""
+        with self._cond:
+            workspaces = [w for _, _, w in self.artifacts if w]
+        for workspace in workspaces:
+            workspace.release()
+
+    def wait_events(self, cursor, timeout):
+        """
+        Block until events past ``cursor`` exist or the timeout expires
+
+        Args:
+            cursor (int): Number of events already consumed
+            timeout (float): Seconds to wait
+
+        Returns:
+            list: New events (possibly empty)
+        """
+        with self._cond:
+            if len(self.events) <= cursor and not self.is_finished:
+                self._cond.wait(timeout)
+            return self.events[cursor:]
+
+
+class JobManager:
+    """Fixed-size worker pool executing jobs in the background"""
+
+    def __init__(self, max_workers=2, retention=3600):
+        """
+        Initialize job manager
+
+        Args:
+            max_workers (int): Concurrent pipeline runs
+            retention (int): Seconds to keep finished jobs queryable
+        """
+        self.max_workers = max_workers
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._active = {}  # Request key -> unfinished job, for attaching duplicates
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue a pipeline function
+
+        The function is called as ``fn(*args, job=job, **kwargs)`` and its
+        return value becomes the job result; exceptions fail the job.
+
+        Args:
+            fn (callable): Pipeline function
+
+        Returns:
+            Job: The queued job
+        """
+        return self._submit(None, fn, args, kwargs)[0]
+
+    def submit_unique(self, key, fn, *args, **kwargs):
+        """
+        Queue a pipeline function unless an identical request is unfinished
+
+        Args:
+            key (str): Identity of the request (same key, same work)
+            fn (callable): Pipeline function, as for ``submit``
+
+        Returns:
+            tuple: (job, attached) where attached is True if an existing
+                queued or running job was returned instead of a new one
+        """
+        return self._submit(key, self._forget_after(key, fn), args, kwargs)
+
+    def _submit(self, key, fn, args, kwargs):
+        # Looking up and reserving the key under one lock, so identical
+        # concurrent submits cannot both start a job
+        with self._lock:
+            current = self._active.get(key) if key is not None else None
+            if current is not None and not current.is_finished:
+                return current, True
+            expired = self._prune()
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active[key] = job
+        # Deleting expired files can be slow, so it happens outside the lock
+        for old in expired:
+            old.close()
+        job._publish('Queued')
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job, False
+
+    def _forget_after(self, key, fn):
+        """Wrap ``fn`` so the key stops pointing at its job once it returns"""
+        def run(*args, job=None, **kwargs):
+            try:
+                return fn(*args, job=job, **kwargs)
+            finally:
+                with self._lock:
+                    if self._active.get(key) is job:
+                        del self._active[key]
+        return run
+
+    def get(self, job_id):
+        """
+        Look up a job
+
+        Args:
+            job_id (str): Job identifier
+
+        Returns:
+            Job: The job, or None if unknown or expired
+        """
+        # Lookups prune too, so expired jobs' files go even when nothing new is submitted
+        with self._lock:
+            expired = self._prune()
+            job = self._jobs.get(job_id)
+        for old in expired:
+            old.close()
+        return job
+
+    def stream(self, job, heartbeat=15):
+        """
+        Generate Server-Sent Events for a job until it finishes
+
+        Args:
+            job (Job): Job to follow
+            heartbeat (int): Seconds between keep-alive comments
+
+        Yields:
+            str: SSE-formatted chunks
+        """
+        cursor = 0
+        while True:
+            events = job.wait_events(cursor, heartbeat)
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            for event in events:
+                yield f"data: {json.dumps(event)}\n\n"
+            cursor += len(events)
+            if job.is_finished and cursor >= len(job.events):
+                return
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = 'running'
+        try:
+            result = fn(*args, job=job, **kwargs)
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            job.finish(error=str(e))
+            return
+        if isinstance(result, dict) and result.get('success') is False:
+            job.finish(error=result.get('error', 'Job failed'))
+        else:
+            job.finish(result=result)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        expired = [jid for jid, j in self._jobs.items() if j.finished and j.finished < cutoff]
+        return [self._jobs.pop(jid) for jid in expired]
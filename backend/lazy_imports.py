@@ -0,0 +1,66 @@
+"""
+Lazy Import Module
+Registry of heavy dependencies that are imported on first use, then cached
+Keeps cold starts (serverless, /health, /) free of yt-dlp and friends
+"""
+
+import time
+import threading
+import importlib
+
+_registry = {}
+_import_seconds = {}
+_lock = threading.RLock()
+
+
+class LazyModule:
+    """Module stand-in that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    _import_seconds[self._name] = time.perf_counter() - started
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<lazy module {self._name!r} ({state})>'
+
+
+def lazy_import(name):
+    """
+    Get the shared lazy handle for a module
+
+    Args:
+        name (str): Dotted module name (e.g. 'yt_dlp', 'moviepy.editor')
+
+    Returns:
+        LazyModule: Proxy importing ``name`` the first time it is used
+    """
+    with _lock:
+        module = _registry.get(name)
+        if module is None:
+            module = _registry[name] = LazyModule(name)
+        return module
+
+
+def import_times():
+    """
+    Seconds spent importing each lazily loaded module so far
+
+    Returns:
+        dict: Module name -> import seconds
+    """
+    with _lock:
+        return dict(_import_seconds)
@@ -0,0 +1,239 @@
+"""
+Media Analysis Module
+Streams audio loudness and scene-change scores out of ffmpeg pipes
+Fixed-size NumPy blocks keep memory flat and analysis far faster than real time
+"""
+
+import queue
+import subprocess
+import threading
+import logging
+from collections import deque
+
+import numpy as np
+
+from ffmpeg_utils import get_ffmpeg_exe, probe_streams, FFmpegError
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 0.1            # Seconds per analysis window (one score per window)
+BLOCK_WINDOWS = 100     # Windows per NumPy block read from a pipe
+SAMPLE_RATE = 16000     # Mono analysis rate; loudness needs no more
+FRAME_SIZE = (64, 36)   # Grayscale thumbnail compared for scene changes
+
+SILENT_DB = -50.0       # At or below: full silence score
+LOUD_DB = -20.0         # At or above: no silence score
+SCENE_DIFF = 0.2        # Mean frame difference (0-1) scored as a full scene cut
+
+
+def _reader(cmd, frame_bytes, convert, blocks, stop):
+    """Run ffmpeg and push per-window score blocks until EOF or ``stop``"""
+    block_bytes = frame_bytes * BLOCK_WINDOWS
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    buffer = bytearray(block_bytes)
+    view = memoryview(buffer)
+    try:
+        while not stop.is_set():
+            filled = 0
+            while filled < block_bytes:
+                n = proc.stdout.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+            windows = filled // frame_bytes
+            if windows:
+                blocks.put(convert(np.frombuffer(buffer, dtype=np.uint8, count=windows * frame_bytes)
+                                   .reshape(windows, frame_bytes)))
+            if filled < block_bytes:
+                break
+    except Exception as e:
+        logger.error(f"Analysis reader failed: {str(e)}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+        blocks.put(None)
+
+
+class _AudioScores:
+    """Silence score per window from RMS loudness"""
+
+    frame_bytes = int(SAMPLE_RATE * WINDOW) * 2  # s16le mono
+
+    def command(self, path):
+        return [get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-loglevel', 'error', '-i', path,
+                '-map', '0:a:0', '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', 'pipe:1']
+
+    def __call__(self, raw):
+        samples = raw.view('<i2').astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        db = 20 * np.log10(rms + 1e-10)
+        return np.clip((LOUD_DB - db) / (LOUD_DB - SILENT_DB), 0.0, 1.0)
+
+
+class _SceneScores:
+    """Scene-change score per window from thumbnail differences"""
+
+    frame_bytes = FRAME_SIZE[0] * FRAME_SIZE[1]  # gray8
+
+    def __init__(self):
+        self._previous = None
+
+    def command(self, path):
+        width, height = FRAME_SIZE
+        # Thumbnails do not need deblocked, bit-exact frames; skipping it speeds up decoding
+        return [get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-loglevel', 'error',
+                '-skip_loop_filter', 'all', '-flags2', '+fast', '-i', path,
+                '-map', '0:v:0', '-an', '-sn',
+                '-vf', f'fps={1 / WINDOW:g},scale={width}:{height}:flags=fast_bilinear,format=gray',
+                '-f', 'rawvideo', 'pipe:1']
+
+    def __call__(self, frames):
+        frames = frames.astype(np.int16)
+        previous = frames[:1] if self._previous is None else self._previous
+        # Each frame against the one before it, the block's first against the last block's end
+        shifted = np.concatenate([previous, frames[:-1]])
+        self._previous = frames[-1:]
+        diff = np.abs(frames - shifted).mean(axis=1) / 255.0
+        return np.clip(diff / SCENE_DIFF, 0.0, 1.0)
+
+
+def stream_scores(path, audio_weight=0.5, scene_weight=0.5):
+    """
+    Generate a cut-quality score for every analysis window
+
+    Audio and video are decoded by two ffmpeg processes whose output is
+    read in blocks of ``BLOCK_WINDOWS`` windows; bounded queues between
+    the readers and this generator keep memory constant however long the
+    input is. A missing audio or video stream scores zero.
+
+    Args:
+        path (str): Media file path
+        audio_weight (float): Weight of the silence score
+        scene_weight (float): Weight of the scene-change score
+
+    Yields:
+        tuple: ``(time, score)`` with time in seconds and score in 0-1
+    """
+    streams = probe_streams(path)
+    sources = []
+    if 'audio' in streams and audio_weight:
+        sources.append((_AudioScores(), audio_weight))
+    if 'video' in streams and scene_weight:
+        sources.append((_SceneScores(), scene_weight))
+    if not sources:
+        raise FFmpegError('No audio or video stream to analyse')
+
+    stop = threading.Event()
+    readers = []
+    for scorer, weight in sources:
+        blocks = queue.Queue(maxsize=4)
+        thread = threading.Thread(
+            target=_reader, args=(scorer.command(path), scorer.frame_bytes, scorer, blocks, stop), daemon=True
+        )
+        thread.start()
+        readers.append((blocks, weight, thread))
+
+    total = sum(weight for _, weight, _ in readers)
+    pending = [deque() for _ in readers]
+    finished = [False] * len(readers)
+    index = 0
+    try:
+        while True:
+            # Refill each source until every live one has a block queued up
+            for i, (blocks, _, _) in enumerate(readers):
+                if not pending[i] and not finished[i]:
+                    block = blocks.get()
+                    if block is None:
+                        finished[i] = True
+                    else:
+                        pending[i].append(block)
+            live = [i for i in range(len(readers)) if pending[i]]
+            if not live:
+                return
+            # Score the windows every live source has; a source that ended
+            # early (e.g. shorter audio) contributes nothing from there on
+            count = min(len(pending[i][0]) for i in live)
+            score = np.zeros(count, dtype=np.float32)
+            for i in live:
+                block = pending[i][0]
+                score += readers[i][1] * block[:count]
+                if count < len(block):
+                    pending[i][0] = block[count:]
+                else:
+                    pending[i].popleft()
+            score /= total
+            for k in range(count):
+                yield round((index + k) * WINDOW, 3), float(score[k])
+            index += count
+    finally:
+        stop.set()
+        for blocks, _, thread in readers:
+            # Unblock a reader waiting on a full queue so it can exit
+            while thread.is_alive():
+                try:
+                    blocks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+
+def plan_cuts(scores, target, min_length, max_length, max_segments=None, distance_weight=0.3):
+    """
+    Choose segment boundaries from a stream of window scores
+
+    Works online: only the windows since the last cut (at most
+    ``max_length`` seconds) are kept. Once a segment reaches
+    ``max_length`` the best window in ``[min_length, max_length]`` becomes
+    the cut, trading its score against the distance from ``target``.
+
+    Args:
+        scores (iterable): ``(time, score)`` pairs in time order
+        target (float): Preferred segment length in seconds
+        min_length (float): Shortest segment allowed
+        max_length (float): Longest segment allowed
+        max_segments (int): Stop after this many segments (None: no cap)
+        distance_weight (float): Score lost per ``max_length - min_length``
+            seconds away from ``target``
+
+    Returns:
+        list: (start, end) tuples in seconds
+    """
+    span = max(max_length - min_length, WINDOW)
+    cuts = []
+    start = 0.0
+    recent = deque()
+    end = 0.0
+
+    def best_cut():
+        eligible = [(score - distance_weight * abs(t - start - target) / span, t)
+                    for t, score in recent if t - start >= min_length]
+        return max(eligible)[1] if eligible else start + max_length
+
+    for t, score in scores:
+        end = round(t + WINDOW, 3)
+        recent.append((t, score))
+        if t - start < max_length:
+            continue
+        cut = best_cut()
+        cuts.append((start, cut))
+        if max_segments and len(cuts) >= max_segments:
+            return cuts
+        start = cut
+        while recent and recent[0][0] <= cut:
+            recent.popleft()
+
+    # Tail: split once more if it is still too long, merge it if too short
+    while end - start > max_length:
+        cut = best_cut()
+        cuts.append((start, cut))
+        start = cut
+        while recent and recent[0][0] <= cut:
+            recent.popleft()
+    if end - start > WINDOW / 2:
+        if cuts and end - start < min_length and end - cuts[-1][0] <= max_length:
+            start = cuts.pop()[0]
+        cuts.append((start, end))
+    if max_segments:
+        cuts = cuts[:max_segments]
+    return cuts
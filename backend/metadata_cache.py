@@ -0,0 +1,228 @@
+"""
+Metadata Cache Module
+In-process TTL cache for yt-dlp extractions with in-flight coalescing
+One raw extraction per URL serves video-info, processing and downloads
+"""
+
+import os
+import copy
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+from singleflight import SingleFlight
+from lazy_imports import lazy_import
+
+yt_dlp = lazy_import('yt_dlp')
+
+logger = logging.getLogger(__name__)
+
+# Options that shape the raw extraction; callers add their own
+# format/processing options on top when resolving
+EXTRACT_OPTS = {
+    'nocheckcertificate': True,
+    'quiet': True,
+    'no_warnings': True,
+    'extractor_args': {
+        'youtube': {
+            'player_client': ['android', 'ios', 'web']
+        }
+    },
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
+    'source_address': '0.0.0.0',
+    'retries': 10,
+    'socket_timeout': 30
+}
+
+# Caller options that change what the extractor fetches or sees; they
+# (with their EXTRACT_OPTS defaults) form part of the raw extraction key
+EXTRACTION_OPTS = frozenset({
+    'http_headers', 'user_agent', 'referer', 'legacy_server_connect', 'nocheckcertificate',
+    'cookiefile', 'cookiesfrombrowser', 'proxy', 'geo_verification_proxy', 'geo_bypass',
+    'geo_bypass_country', 'source_address', 'extractor_args', 'username', 'password',
+    'usenetrc', 'noplaylist', 'allowed_extractors',
+})
+
+# Options that only steer the download and its output files; processing
+# an extraction ignores them, so they stay out of the resolve key
+OUTPUT_OPTS = frozenset({
+    'outtmpl', 'paths', 'progress_hooks', 'postprocessor_hooks', 'postprocessors', 'logger',
+    'quiet', 'no_warnings', 'noprogress', 'ffmpeg_location', 'buffersize', 'http_chunk_size',
+    'fragment_retries', 'nopart', 'continuedl', 'overwrites', 'keepvideo',
+})
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries expire after a TTL"""
+
+    def __init__(self, ttl, max_entries):
+        """
+        Initialize cache
+
+        Args:
+            ttl (float): Seconds an entry stays valid
+            max_entries (int): Entry bound, least recently used dropped first
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.expired = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.expired += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MetadataCache:
+    """Caches raw extractor results and resolves them per caller"""
+
+    def __init__(self, ttl=600, max_entries=512):
+        """
+        Initialize metadata cache
+
+        Args:
+            ttl (float): Seconds before an extraction is refreshed
+            max_entries (int): Maximum cached URLs
+        """
+        self._cache = TTLCache(ttl, max_entries)
+        self._resolved = TTLCache(ttl, max_entries)
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        # Extraction-level counters, then resolve-level ones (a resolve miss
+        # goes on to an extraction, which counts its own hit or miss)
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'resolve_hits': 0, 'resolve_misses': 0}
+
+    def extract(self, url, ydl_opts=None):
+        """
+        Raw (unprocessed) extraction for a URL, cached
+
+        Identical concurrent lookups share one extraction. Caller options
+        that change the extraction (``EXTRACTION_OPTS``, e.g. headers) are
+        applied and kept in the key; the others are ignored here.
+
+        Args:
+            url (str): Media URL
+            ydl_opts (dict): Caller yt-dlp options
+
+        Returns:
+            dict: Private copy of the raw info dict
+        """
+        opts = dict(EXTRACT_OPTS)
+        opts.update({k: v for k, v in (ydl_opts or {}).items() if k in EXTRACTION_OPTS})
+        key = (url, _opts_key({k: v for k, v in opts.items() if k in EXTRACTION_OPTS}))
+        raw = self._cache.get(key)
+        if raw is not None:
+            self._count('hits')
+            return copy.deepcopy(raw)
+
+        def load():
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                info = ydl.extract_info(url, download=False, process=False)
+            if not info:
+                raise ValueError('Failed to fetch info')
+            # Playlist entries may be lazy; pin them so the result can be shared
+            if info.get('entries') is not None:
+                info['entries'] = list(info['entries'])
+            self._cache.set(key, info)
+            return info
+
+        raw, shared = self._flight.do(key, load)
+        self._count('coalesced' if shared else 'misses')
+        return copy.deepcopy(raw)
+
+    def resolve(self, url, ydl_opts=None):
+        """
+        Process a cached extraction with caller options (format
+        selection, playlist flattening) without downloading
+
+        Args:
+            url (str): Media URL
+            ydl_opts (dict): Caller yt-dlp options
+
+        Returns:
+            dict: Processed info dict, as from ``extract_info(download=False)``
+        """
+        opts = dict(EXTRACT_OPTS)
+        opts.update(ydl_opts or {})
+        # Building a YoutubeDL costs tens of ms, so processed results are
+        # cached too, per option set
+        key = (url, _opts_key(opts))
+        resolved = self._resolved.get(key)
+        if resolved is not None:
+            self._count('resolve_hits')
+            return copy.deepcopy(resolved)
+        self._count('resolve_misses')
+        raw = self.extract(url, ydl_opts)
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            resolved = ydl.process_ie_result(raw, download=False)
+        self._resolved.set(key, copy.deepcopy(resolved))
+        return resolved
+
+    def snapshot(self):
+        """
+        Counters for monitoring
+
+        Returns:
+            dict: Extraction hit/miss/coalesced/expired counters, resolve
+                hit/miss counters and entry count
+        """
+        with self._lock:
+            return dict(self.stats, expired=self._cache.expired, entries=len(self._cache))
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+
+def _opts_key(opts):
+    """Stable key for the option set, ignoring output-only options (``OUTPUT_OPTS``)"""
+    stable = {k: v for k, v in opts.items() if k not in OUTPUT_OPTS}
+    return json.dumps(stable, sort_keys=True, default=repr)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_metadata_cache():
+    """
+    Process-wide metadata cache configured from the environment
+
+    ``METADATA_CACHE_TTL`` and ``METADATA_CACHE_SIZE`` override the defaults.
+
+    Returns:
+        MetadataCache: Shared cache instance
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = MetadataCache(
+                float(os.environ.get('METADATA_CACHE_TTL', 600)),
+                int(os.environ.get('METADATA_CACHE_SIZE', 512))
+            )
+        return _default_cache
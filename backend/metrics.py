@@ -0,0 +1,240 @@
+"""
+Metrics Module
+Stage timing spans, counters and histograms for the media pipeline
+Rendered in Prometheus text format at /metrics, no client library needed
+"""
+
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; media stages range from cache hits to multi-minute encodes
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Per-request timing breakdown, set by ``trace()``
+_trace = contextvars.ContextVar('media_trace', default=None)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base for labelled metrics; children are keyed by label values"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f'{self.name} expects labels {self.labels}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines += self._render_items(items)
+        return lines
+
+    def _render_items(self, items):
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}' for key, value in items]
+
+
+class Counter(_Metric):
+    """Monotonic total"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in progress"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts plus sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_items(self, items):
+        lines = []
+        for key, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, [("le", _format_value(float(bound)))])} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {counts[-1]}')
+        return lines
+
+
+class Registry:
+    """Ordered collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Prometheus text exposition (format 0.0.4)
+
+        Returns:
+            str: All metrics, newline terminated
+        """
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+stage_seconds = REGISTRY.register(Histogram(
+    'media_stage_duration_seconds', 'Wall time spent in each pipeline stage', ['stage']))
+stage_errors = REGISTRY.register(Counter(
+    'media_stage_errors_total', 'Failed pipeline stages', ['stage']))
+download_bytes = REGISTRY.register(Counter(
+    'media_download_bytes_total', 'Media bytes fetched from the network (cache misses)'))
+written_bytes = REGISTRY.register(Counter(
+    'media_written_bytes_total', 'Output bytes written to disk', ['stage']))
+jobs_in_flight = REGISTRY.register(Gauge(
+    'media_jobs_in_flight', 'Pipeline runs currently executing'))
+encode_wait_seconds = REGISTRY.register(Histogram(
+    'media_encode_queue_wait_seconds', 'Time video encodes waited for encoder threads', ['profile']))
+encode_queue_depth = REGISTRY.register(Gauge(
+    'media_encode_queue_depth', 'Video encodes waiting for encoder threads'))
+encode_threads_in_use = REGISTRY.register(Gauge(
+    'media_encode_threads_in_use', 'Encoder threads held by running encodes'))
+
+
+@contextmanager
+def span(stage):
+    """
+    Time a pipeline stage
+
+    The duration goes into the stage histogram and, inside ``trace()``,
+    into the request's timing breakdown. An exception counts as an error
+    for the stage and is re-raised.
+
+    Args:
+        stage (str): Stage name (e.g. 'extract', 'download', 'encode')
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=stage)
+        timings = _trace.get()
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed, 4)
+
+
+def timed(stage):
+    """
+    Decorator form of ``span`` for methods returning result dicts
+
+    A returned ``{'success': False}`` also counts as a stage error.
+
+    Args:
+        stage (str): Stage name
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                result = fn(*args, **kwargs)
+            if isinstance(result, dict) and result.get('success') is False:
+                stage_errors.inc(stage=stage)
+            return result
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def trace():
+    """
+    Collect the spans of the enclosed block into a dict
+
+    Yields:
+        dict: Stage name -> seconds, filled in as spans finish
+    """
+    timings = {}
+    token = _trace.set(timings)
+    try:
+        yield timings
+    finally:
+        _trace.reset(token)
+
+
+def server_timing(timings):
+    """
+    Format a timing breakdown as a ``Server-Timing`` header value
+
+    Args:
+        timings (dict): Stage name -> seconds
+
+    Returns:
+        str: e.g. ``download;dur=1520.3, encode;dur=210.0``
+    """
+    return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in timings.items())
@@ -0,0 +1,290 @@
+"""
+MP4 Index Module
+Reads the sample tables of an MP4's moov box without decoding any media
+Maps times to the file bytes a reader needs, so partial downloads can be cut early
+"""
+
+import os
+import struct
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+READ_AHEAD = 1.0   # Seconds of samples past a cut that must be on disk too
+
+# Boxes that may precede moov in a progressive (faststart) file
+_LEADING_BOXES = (b'ftyp', b'styp', b'free', b'skip', b'wide', b'pdin', b'uuid')
+
+
+class MP4FormatError(ValueError):
+    """Raised when a file is not an MP4, or a partial one cannot be indexed before it finishes"""
+
+
+def _boxes(data, start=0, end=None):
+    """Yield (type, payload start, box end) for the boxes in ``data[start:end]``"""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise MP4FormatError(f'Malformed {kind!r} box')
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def _child(data, start, end, kind):
+    """Payload range of the first ``kind`` box inside a container, or None"""
+    for name, payload, box_end in _boxes(data, start, end):
+        if name == kind:
+            return payload, box_end
+    return None
+
+
+def _table(data, start, fields, dtype):
+    """Full-box table: a uint32 entry count followed by fixed-size big-endian entries"""
+    count = struct.unpack_from('>I', data, start + 4)[0]
+    table = np.frombuffer(data, dtype=dtype, count=count * fields, offset=start + 8)
+    return table.reshape(count, fields)
+
+
+class _Track:
+    """Decode times and byte extents of one track's samples"""
+
+    __slots__ = ('kind', 'times', 'ends', 'keyframes')
+
+    def __init__(self, kind, times, ends, keyframes):
+        self.kind = kind
+        self.times = times          # Decode time of each sample in seconds
+        self.ends = ends            # Running max of sample end offsets
+        self.keyframes = keyframes  # Presentation times of sync samples
+
+
+class MP4Index:
+    """Per-track sample times and byte extents read from an MP4's moov box"""
+
+    def __init__(self, moov):
+        """
+        Parse a moov box
+
+        Args:
+            moov (bytes): Payload of the moov box
+
+        Raises:
+            MP4FormatError: If the file is fragmented or a table is malformed
+        """
+        if _child(moov, 0, len(moov), b'mvex'):
+            raise MP4FormatError('Fragmented MP4 has no sample tables')
+        mvhd = _child(moov, 0, len(moov), b'mvhd')
+        if not mvhd:
+            raise MP4FormatError('No movie header')
+        self.timescale, self.duration = self._header(moov, mvhd[0])
+        self.tracks = []
+        for kind, payload, end in _boxes(moov):
+            if kind == b'trak':
+                track = self._track(moov, payload, end)
+                if track:
+                    self.tracks.append(track)
+        if not self.tracks:
+            raise MP4FormatError('No audio or video tracks')
+
+    @property
+    def has_video(self):
+        return any(track.kind == 'video' for track in self.tracks)
+
+    @property
+    def keyframes(self):
+        """Keyframe presentation times of the first video track, in seconds"""
+        for track in self.tracks:
+            if track.kind == 'video':
+                return track.keyframes
+        return []
+
+    def bytes_needed(self, end_time, read_ahead=READ_AHEAD):
+        """
+        Length of the file prefix holding every sample up to ``end_time``
+
+        Samples up to ``read_ahead`` seconds later are included, since a
+        demuxer stopping at ``end_time`` reads a little past it.
+
+        Args:
+            end_time (float): Time in seconds
+            read_ahead (float): Extra seconds of samples
+
+        Returns:
+            int: Bytes from the start of the file
+        """
+        needed = 0
+        for track in self.tracks:
+            count = int(np.searchsorted(track.times, end_time + read_ahead, side='right'))
+            if count:
+                needed = max(needed, int(track.ends[count - 1]))
+        return needed
+
+    @staticmethod
+    def _header(data, start):
+        """(timescale, duration in seconds) from an mvhd or mdhd payload"""
+        if data[start] == 1:
+            timescale, duration = struct.unpack_from('>IQ', data, start + 20)
+        else:
+            timescale, duration = struct.unpack_from('>II', data, start + 12)
+        if not timescale:
+            raise MP4FormatError('Zero timescale')
+        return timescale, duration / timescale
+
+    def _track(self, moov, start, end):
+        mdia = _child(moov, start, end, b'mdia')
+        hdlr = mdia and _child(moov, *mdia, b'hdlr')
+        mdhd = mdia and _child(moov, *mdia, b'mdhd')
+        if not (hdlr and mdhd):
+            return None
+        kind = {b'vide': 'video', b'soun': 'audio'}.get(bytes(moov[hdlr[0] + 8:hdlr[0] + 12]))
+        if kind is None:
+            return None  # Subtitles, timecodes, hint tracks
+        timescale, _ = self._header(moov, mdhd[0])
+        minf = _child(moov, *mdia, b'minf')
+        stbl = minf and _child(moov, *minf, b'stbl')
+        if not stbl:
+            raise MP4FormatError('Track without sample tables')
+        tables = {name: payload for name, payload, _ in _boxes(moov, *stbl)}
+
+        sizes = self._sample_sizes(moov, tables)
+        count = len(sizes)
+        if not count:
+            return None
+        offsets = self._sample_offsets(moov, tables, sizes)
+
+        stts = _table(moov, tables[b'stts'], 2, '>u4')
+        dts = np.concatenate(([0], np.cumsum(np.repeat(stts[:, 1].astype(np.int64), stts[:, 0]))))[:count]
+        pts = dts
+        if b'ctts' in tables:
+            ctts = _table(moov, tables[b'ctts'], 2, '>i4')
+            shifts = np.repeat(ctts[:, 1].astype(np.int64), ctts[:, 0].astype(np.int64))[:count]
+            pts = dts + np.pad(shifts, (0, count - len(shifts)))
+        # Edit lists move media time (e.g. B-frame delay) to presentation time 0
+        origin = self._edit_origin(moov, start, end, timescale)
+
+        if b'stss' in tables:
+            sync = _table(moov, tables[b'stss'], 1, '>u4')[:, 0].astype(np.int64) - 1
+            sync = sync[sync < count]
+        else:
+            sync = np.arange(count)
+        return _Track(
+            kind,
+            (dts - origin) / timescale,
+            np.maximum.accumulate(offsets + sizes),
+            sorted(set(np.round((pts[sync] - origin) / timescale, 6).tolist())) if kind == 'video' else []
+        )
+
+    def _sample_sizes(self, moov, tables):
+        if b'stsz' in tables:
+            start = tables[b'stsz']
+            fixed, count = struct.unpack_from('>II', moov, start + 4)
+            if fixed:
+                return np.full(count, fixed, dtype=np.int64)
+            return np.frombuffer(moov, dtype='>u4', count=count, offset=start + 12).astype(np.int64)
+        if b'stz2' in tables:
+            start = tables[b'stz2']
+            field, count = struct.unpack_from('>xxxBI', moov, start + 4)
+            if field == 16:
+                return np.frombuffer(moov, dtype='>u2', count=count, offset=start + 12).astype(np.int64)
+            if field == 8:
+                return np.frombuffer(moov, dtype=np.uint8, count=count, offset=start + 12).astype(np.int64)
+            packed = np.frombuffer(moov, dtype=np.uint8, count=(count + 1) // 2, offset=start + 12)
+            return np.stack((packed >> 4, packed & 0xF), axis=1).reshape(-1)[:count].astype(np.int64)
+        raise MP4FormatError('No sample size table')
+
+    def _sample_offsets(self, moov, tables, sizes):
+        """File offset of every sample from the chunk offset and sample-to-chunk tables"""
+        if b'stco' in tables:
+            chunks = _table(moov, tables[b'stco'], 1, '>u4')[:, 0].astype(np.int64)
+        elif b'co64' in tables:
+            chunks = _table(moov, tables[b'co64'], 1, '>u8')[:, 0].astype(np.int64)
+        else:
+            raise MP4FormatError('No chunk offset table')
+        stsc = _table(moov, tables[b'stsc'], 3, '>u4').astype(np.int64)
+        # Runs of chunks sharing a samples-per-chunk value (first_chunk is 1-based)
+        run_ends = np.append(stsc[1:, 0], len(chunks) + 1)
+        per_chunk = np.repeat(stsc[:, 1], np.maximum(run_ends - stsc[:, 0], 0))[:len(chunks)]
+        count = len(sizes)
+        if per_chunk.sum() < count:
+            raise MP4FormatError('Sample-to-chunk table is shorter than the sample table')
+        chunk_of = np.repeat(np.arange(len(per_chunk)), per_chunk)[:count]
+        chunk_first = np.concatenate(([0], np.cumsum(per_chunk)[:-1]))
+        before = np.concatenate(([0], np.cumsum(sizes)))
+        return chunks[chunk_of] + before[:count] - before[chunk_first[chunk_of]]
+
+    def _edit_origin(self, moov, start, end, timescale):
+        """Media time shown at presentation time 0, in media timescale units"""
+        edts = _child(moov, start, end, b'edts')
+        elst = edts and _child(moov, *edts, b'elst')
+        if not elst:
+            return 0
+        version = moov[elst[0]]
+        count = struct.unpack_from('>I', moov, elst[0] + 4)[0]
+        empty = 0
+        for i in range(count):
+            if version == 1:
+                length, media_time = struct.unpack_from('>Qq', moov, elst[0] + 8 + i * 20)
+            else:
+                length, media_time = struct.unpack_from('>Ii', moov, elst[0] + 8 + i * 12)
+            if media_time == -1:
+                empty += length  # Leading empty edit delays the track
+                continue
+            return media_time - int(round(empty / self.timescale * timescale))
+        return 0
+
+
+def load_index(path, available=None):
+    """
+    Read the sample index of a (possibly still downloading) MP4
+
+    Only the top-level box headers up to moov and the moov box itself
+    are read. A partial file (``available`` given) must have moov before
+    its media data; a finished one may have it anywhere.
+
+    Args:
+        path (str): MP4 file path
+        available (int): Bytes of the file already written, for a file
+            still being downloaded (default: the whole file)
+
+    Returns:
+        MP4Index: The index, or None while moov is not fully written yet
+
+    Raises:
+        MP4FormatError: If the file is not an MP4, or a partial file's
+            media data comes before moov (nothing is readable until the
+            download finishes)
+    """
+    partial = available is not None
+    with open(path, 'rb') as f:
+        size = available if partial else os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset + 16 <= size:
+            f.seek(offset)
+            header = f.read(16)
+            box_size, kind = struct.unpack_from('>I4s', header)
+            header_size = 8
+            if box_size == 1:
+                box_size = struct.unpack_from('>Q', header, 8)[0]
+                header_size = 16
+            if kind == b'moov':
+                if box_size < header_size:
+                    raise MP4FormatError('Malformed moov box')
+                if offset + box_size > size:
+                    return None
+                f.seek(offset + header_size)
+                return MP4Index(f.read(box_size - header_size))
+            if box_size < header_size or (offset == 0 and kind not in _LEADING_BOXES):
+                raise MP4FormatError(f'Not an MP4 file ({kind!r} box first)')
+            if partial and kind not in _LEADING_BOXES:
+                raise MP4FormatError(f'{kind!r} box before moov; the index is not at the front')
+            offset += box_size
+    return None
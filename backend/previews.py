@@ -0,0 +1,242 @@
+"""
+Previews Module
+Builds seek-sprite sheets with a WebVTT index and per-segment thumbnails
+Decodes keyframes only, and caches results next to the media they describe
+"""
+
+import os
+import re
+import json
+import math
+import time
+import uuid
+import subprocess
+import logging
+
+from ffmpeg_utils import get_ffmpeg_exe, run_ffmpeg, probe_duration, probe_video_size, FFmpegError
+
+logger = logging.getLogger(__name__)
+
+TILE_WIDTH = 160          # Sprite tile width in pixels (height keeps the aspect ratio)
+THUMB_WIDTH = 320         # Segment thumbnail width
+COLUMNS = 10              # Tiles per sprite row
+ROWS = 10                 # Rows per sprite sheet (more tiles start a new sheet)
+MAX_TILES = 100           # Tile spacing grows with duration to stay under this
+MIN_INTERVAL = 2.0        # Closest spacing between tiles, in seconds
+JPEG_QUALITY = 5          # ffmpeg -q:v (2 best - 31 worst)
+THUMBS_PER_RUN = 16       # Seeking inputs per ffmpeg run
+
+_PTS_TIME_RE = re.compile(r'pts_time:\s*(-?\d+(?:\.\d+)?)')
+
+
+def _vtt_time(seconds):
+    hours, rest = divmod(max(seconds, 0.0), 3600)
+    minutes, rest = divmod(rest, 60)
+    return f'{int(hours):02d}:{int(minutes):02d}:{rest:06.3f}'
+
+
+def _keyframe_input(path, start=None):
+    """Input options that demux and decode keyframes only"""
+    args = ['-discard', 'nokey', '-skip_frame', 'nokey']
+    if start is not None:
+        # Nearest keyframe at or before start, not the first frame after it
+        args += ['-noaccurate_seek', '-ss', f'{start:.3f}']
+    return args + ['-i', path]
+
+
+class PreviewGenerator:
+    """Keyframe-only sprite sheets, WebVTT seek index and segment thumbnails"""
+
+    def __init__(self, tile_width=TILE_WIDTH, thumb_width=THUMB_WIDTH, columns=COLUMNS, rows=ROWS,
+                 max_tiles=MAX_TILES, min_interval=MIN_INTERVAL):
+        """
+        Initialize preview generator
+
+        Args:
+            tile_width (int): Sprite tile width in pixels
+            thumb_width (int): Segment thumbnail width in pixels
+            columns (int): Tiles per sprite row
+            rows (int): Rows per sprite sheet
+            max_tiles (int): Upper bound on tiles for long inputs
+            min_interval (float): Closest spacing between tiles in seconds
+        """
+        self.tile_width = tile_width
+        self.thumb_width = thumb_width
+        self.columns = columns
+        self.rows = rows
+        self.max_tiles = max_tiles
+        self.min_interval = min_interval
+
+    def generate(self, input_path, output_dir, prefix, cuts=None, sprite_url='{name}'):
+        """
+        Write previews for a video into ``output_dir``
+
+        Files are ``{prefix}_sprite_N.jpg``, ``{prefix}_sprite.vtt`` and
+        ``{prefix}_segment_N.jpg`` (one per cut, named like the segment
+        files). A ``{prefix}_preview.json`` manifest records the source's
+        size and mtime with the settings; when they still match, the
+        existing files are returned without running ffmpeg.
+
+        Only keyframes are demuxed and decoded. Sprite tiles are the
+        keyframes at least ``interval`` seconds apart, and a segment's
+        thumbnail is the keyframe at or before its start.
+
+        Args:
+            input_path (str): Source video
+            output_dir (str): Folder for the preview files
+            prefix (str): File name prefix (e.g. the session id)
+            cuts (list): Segment (start, end) tuples in seconds
+            sprite_url (str): How the WebVTT file refers to a sprite
+                sheet, formatted with ``name`` (default: the bare file name)
+
+        Returns:
+            dict: Result with success status, 'sprites', 'vtt', 'thumbnails'
+                (file names in ``output_dir``), 'tiles', 'interval' and 'cached'
+        """
+        try:
+            started = time.perf_counter()
+            st = os.stat(input_path)
+            settings = {
+                'source': {'size': st.st_size, 'mtime_ns': st.st_mtime_ns},
+                'tile_width': self.tile_width, 'thumb_width': self.thumb_width,
+                'columns': self.columns, 'rows': self.rows,
+                'max_tiles': self.max_tiles, 'min_interval': self.min_interval,
+                'cuts': [[round(a, 3), round(b, 3)] for a, b in (cuts or [])],
+                'sprite_url': sprite_url
+            }
+            manifest_path = os.path.join(output_dir, f'{prefix}_preview.json')
+            cached = self._load_manifest(manifest_path, settings, output_dir)
+            if cached:
+                logger.info(f"Previews for {prefix} are up to date")
+                return dict(cached, cached=True)
+
+            width, height = probe_video_size(input_path)
+            duration = probe_duration(input_path)
+            interval = max(self.min_interval, duration / self.max_tiles)
+            tile = (self.tile_width, self._scaled_height(width, height, self.tile_width))
+            thumb = (self.thumb_width, self._scaled_height(width, height, self.thumb_width))
+
+            sprites, times, rows = self._sprites(input_path, output_dir, prefix, tile, interval, duration)
+            vtt = f'{prefix}_sprite.vtt'
+            self._write_vtt(os.path.join(output_dir, vtt), prefix, times, duration, tile, rows, sprite_url)
+            thumbnails = self._thumbnails(input_path, output_dir, prefix, cuts or [], thumb)
+
+            result = {
+                'success': True,
+                'sprites': sprites,
+                'vtt': vtt,
+                'thumbnails': thumbnails,
+                'tiles': len(times),
+                'interval': round(interval, 3),
+                'tile_size': list(tile)
+            }
+            self._save_manifest(manifest_path, dict(settings, result=result))
+            logger.info(f"Built {len(times)} sprite tiles and {len(thumbnails)} thumbnails "
+                        f"in {time.perf_counter() - started:.2f}s")
+            return dict(result, cached=False)
+
+        except Exception as e:
+            logger.error(f"Preview error: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    @staticmethod
+    def _scaled_height(width, height, target_width):
+        # Even heights keep the JPEG encoder's chroma subsampling happy
+        return max(2, int(round(height * target_width / width / 2)) * 2)
+
+    def _sprites(self, input_path, output_dir, prefix, tile, interval, duration):
+        """
+        Tile spaced keyframes into sprite sheets in a single ffmpeg pass
+
+        ``showinfo`` logs the time of every selected keyframe, which is
+        what the WebVTT cues need.
+
+        Returns:
+            tuple: (sprite file names, tile times in seconds, rows per sheet)
+        """
+        expected = int(duration // interval) + 1
+        rows = max(1, min(self.rows, math.ceil(expected / self.columns)))
+        pattern = os.path.join(output_dir, f'{prefix}_sprite_%d.jpg')
+        for name in os.listdir(output_dir):
+            if name.startswith(f'{prefix}_sprite_') and name.endswith('.jpg'):
+                os.remove(os.path.join(output_dir, name))  # Stale sheets of an earlier run
+
+        cmd = [get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-y'] + _keyframe_input(input_path) + [
+            '-map', '0:v:0',
+            '-vf', (f"select='isnan(prev_selected_t)+gte(t-prev_selected_t,{interval:.3f})',"
+                    f"scale={tile[0]}:{tile[1]},showinfo,tile={self.columns}x{rows}"),
+            '-fps_mode', 'passthrough', '-q:v', str(JPEG_QUALITY), pattern
+        ]
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stderr = proc.stderr.decode('utf-8', 'replace')
+        if proc.returncode != 0:
+            raise FFmpegError(stderr.strip())
+        times = [float(t) for t in _PTS_TIME_RE.findall(stderr)]
+        sheets = -(-len(times) // (self.columns * rows))
+        return [f'{prefix}_sprite_{i + 1}.jpg' for i in range(sheets)], times, rows
+
+    def _write_vtt(self, path, prefix, times, duration, tile, rows, sprite_url):
+        """WebVTT cues mapping each tile's time span to its sprite region"""
+        columns = self.columns
+        per_sheet = columns * rows
+        lines = ['WEBVTT', '']
+        for i, start in enumerate(times):
+            end = times[i + 1] if i + 1 < len(times) else max(duration, start)
+            start = 0.0 if i == 0 else start  # The first tile stands for the opening too
+            index = i % per_sheet
+            x, y = (index % columns) * tile[0], (index // columns) * tile[1]
+            url = sprite_url.format(name=f'{prefix}_sprite_{i // per_sheet + 1}.jpg')
+            lines += [f'{_vtt_time(start)} --> {_vtt_time(end)}', f'{url}#xywh={x},{y},{tile[0]},{tile[1]}', '']
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+        os.replace(tmp_path, path)
+
+    def _thumbnails(self, input_path, output_dir, prefix, cuts, thumb):
+        """
+        One thumbnail per segment, several seeks per ffmpeg run
+
+        Each segment start is its own input, seeked to the nearest
+        keyframe at or before it, so every thumbnail costs one keyframe
+        decode.
+
+        Returns:
+            list: Thumbnail file names in segment order
+        """
+        names = [f'{prefix}_segment_{i + 1}.jpg' for i in range(len(cuts))]
+        for batch in range(0, len(cuts), THUMBS_PER_RUN):
+            starts = [start for start, _ in cuts[batch:batch + THUMBS_PER_RUN]]
+            args = []
+            for start in starts:
+                args += _keyframe_input(input_path, start)
+            for i, name in enumerate(names[batch:batch + len(starts)]):
+                args += ['-map', f'{i}:v:0', '-frames:v', '1', '-vf', f'scale={thumb[0]}:{thumb[1]}',
+                         '-q:v', str(JPEG_QUALITY), os.path.join(output_dir, name)]
+            run_ffmpeg(args)
+        return names
+
+    @staticmethod
+    def _load_manifest(manifest_path, settings, output_dir):
+        """Stored result if the manifest matches the source and settings"""
+        try:
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        result = manifest.pop('result', None)
+        if manifest != settings or not result:
+            return None
+        names = result['sprites'] + result['thumbnails'] + [result['vtt']]
+        if not all(os.path.exists(os.path.join(output_dir, name)) for name in names):
+            return None
+        return result
+
+    @staticmethod
+    def _save_manifest(manifest_path, manifest):
+        tmp_path = f'{manifest_path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
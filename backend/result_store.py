@@ -0,0 +1,320 @@
+"""
+Result Store Module
+SQLite-indexed store of finished pipeline outputs keyed by a canonical spec hash
+Identical requests reuse one run; tool upgrades invalidate, LRU eviction over a byte budget
+"""
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import subprocess
+import logging
+from importlib import metadata
+
+from singleflight import SingleFlight
+from ffmpeg_utils import get_ffmpeg_exe
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join(tempfile.gettempdir(), 'media_toolkit_results')
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3  # 4 GB
+
+# Libraries whose upgrades can change pipeline output
+VERSIONED_PACKAGES = ('yt-dlp', 'moviepy', 'gTTS', 'numpy')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    spec TEXT NOT NULL,
+    versions TEXT NOT NULL,
+    file TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    meta TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access);
+"""
+
+
+def canonical_json(value):
+    """Stable JSON text: sorted keys, no whitespace, UTF-8 kept"""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def tool_versions():
+    """
+    Versions of the tools that produce pipeline outputs
+
+    Package versions come from installed metadata, so nothing heavy is
+    imported; ffmpeg reports its own.
+
+    Returns:
+        dict: Tool name to version string
+    """
+    versions = {}
+    for package in VERSIONED_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        out = subprocess.run([get_ffmpeg_exe(), '-version'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+        versions['ffmpeg'] = out.decode('utf-8', 'replace').split('\n', 1)[0].split(' ')[2]
+    except (OSError, IndexError):
+        versions['ffmpeg'] = None
+    return versions
+
+
+class ResultStore:
+    """Finished outputs indexed in SQLite, files kept next to the database"""
+
+    def __init__(self, store_dir, max_bytes=DEFAULT_MAX_BYTES, versions=None):
+        """
+        Initialize result store
+
+        Args:
+            store_dir (str): Directory holding ``results.db`` and ``files/``
+            max_bytes (int): Total output size before LRU eviction
+            versions (dict): Tool versions mixed into every key (default:
+                ``tool_versions()``, read on first use)
+        """
+        self.store_dir = store_dir
+        self.files_dir = os.path.join(store_dir, 'files')
+        self.db_path = os.path.join(store_dir, 'results.db')
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0, 'evicted_bytes': 0, 'invalidated': 0}
+        self._versions = versions
+        self._lock = threading.RLock()
+        self._flight = SingleFlight()
+        # Opened on first use, so constructing (and importing the app) touches no disk
+        self._db = None
+
+    @property
+    def versions(self):
+        with self._lock:
+            if self._versions is None:
+                self._versions = tool_versions()
+            return self._versions
+
+    def key_for(self, spec):
+        """
+        Hash of a pipeline spec together with the current tool versions
+
+        Args:
+            spec (dict): JSON-serialisable description of everything that
+                shapes the output (source identity, format, options, script)
+
+        Returns:
+            str: Hex key
+        """
+        raw = canonical_json({'spec': spec, 'versions': self.versions})
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        """
+        Find a stored output and mark it recently used
+
+        Args:
+            key (str): Result key
+
+        Returns:
+            dict: 'key', 'path', 'size' and 'meta', or None on a miss
+        """
+        with self._lock:
+            db = self._connect()
+            row = db.execute('SELECT file, size, meta FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            path = os.path.join(self.files_dir, row[0])
+            if not os.path.exists(path):
+                db.execute('DELETE FROM results WHERE key = ?', (key,))
+                return None
+            db.execute('UPDATE results SET last_access = ?, hits = hits + 1 WHERE key = ?', (time.time(), key))
+            return {'key': key, 'path': path, 'size': row[1], 'meta': json.loads(row[2])}
+
+    def fetch(self, key, spec, producer):
+        """
+        Return the stored output for ``key``, producing it on a miss
+
+        Concurrent misses for one key run ``producer`` once and the other
+        callers share its stored output. A producer may mark its result
+        ``'store': False`` in the metadata (e.g. a degraded output); it
+        is then returned to that caller only, and waiters produce their own.
+
+        Args:
+            key (str): Result key from ``key_for``
+            spec (dict): The spec behind the key (kept for inspection)
+            producer (callable): ``producer()`` writes the output and
+                returns ``(path, meta)``; the file is moved into the store
+
+        Returns:
+            tuple: (entry dict as from ``lookup``, status) where status is
+                'hit', 'miss' or 'coalesced'
+        """
+        while True:
+            entry = self.lookup(key)
+            if entry:
+                self._count('hits')
+                return entry, 'hit'
+
+            def produce():
+                # Another caller (or process) may have finished in the meantime
+                existing = self.lookup(key)
+                if existing:
+                    return existing, 'hit'
+                path, meta = producer()
+                meta = dict(meta or {})
+                if meta.pop('store', True) is False:
+                    return {'key': key, 'path': path, 'size': os.path.getsize(path), 'meta': meta,
+                            'stored': False}, 'miss'
+                return self._store(key, spec, path, meta), 'miss'
+
+            (entry, status), shared = self._flight.do(key, produce)
+            if shared and entry.get('stored') is False:
+                continue  # Not shareable; run our own
+            status = 'coalesced' if shared else status
+            self._count({'hit': 'hits', 'miss': 'misses', 'coalesced': 'coalesced'}[status])
+            return entry, status
+
+    def materialize(self, entry, dest):
+        """
+        Hard-link a stored output to ``dest`` (copy across filesystems)
+
+        Args:
+            entry (dict): Entry from ``lookup`` or ``fetch``
+            dest (str): Destination path
+
+        Raises:
+            FileNotFoundError: If the output was evicted meanwhile
+        """
+        if os.path.exists(dest):
+            os.remove(dest)
+        try:
+            os.link(entry['path'], dest)
+        except OSError:
+            shutil.copyfile(entry['path'], dest)
+
+    def in_flight(self, key):
+        """
+        Check whether an output for ``key`` is being produced in this process
+
+        Args:
+            key (str): Result key
+
+        Returns:
+            bool: True while a producer runs
+        """
+        return self._flight.in_flight(key)
+
+    def snapshot(self):
+        """
+        Counters and usage for monitoring
+
+        Returns:
+            dict: Hit/miss/coalesced/eviction counters plus entry count and bytes
+        """
+        with self._lock:
+            entries, total = 0, 0
+            if self._db is not None or os.path.exists(self.db_path):
+                entries, total = self._connect().execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+            return dict(self.stats, entries=entries, bytes=total, max_bytes=self.max_bytes)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _connect(self):
+        """Open the database on first use and drop outputs of other tool versions"""
+        if self._db is None:
+            os.makedirs(self.files_dir, exist_ok=True)
+            # One connection shared under the lock; WAL lets other processes read meanwhile
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(_SCHEMA)
+            self._db = db
+            self._invalidate()
+        return self._db
+
+    def _invalidate(self):
+        current = canonical_json(self.versions)
+        stale = self._db.execute('SELECT key, file, size FROM results WHERE versions != ?', (current,)).fetchall()
+        for key, filename, size in stale:
+            self._remove(key, filename)
+            self.stats['invalidated'] += 1
+        if stale:
+            logger.info(f"Dropped {len(stale)} stored result(s) made with other tool versions")
+
+    def _store(self, key, spec, produced_path, meta):
+        ext = os.path.splitext(produced_path)[1]
+        filename = f'{key}{ext}'
+        with self._lock:
+            db = self._connect()
+            final_path = os.path.join(self.files_dir, filename)
+            shutil.move(produced_path, final_path + '.tmp')
+            os.replace(final_path + '.tmp', final_path)  # atomic publish
+            size = os.path.getsize(final_path)
+            now = time.time()
+            db.execute(
+                'INSERT OR REPLACE INTO results (key, spec, versions, file, size, meta, created, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, canonical_json(spec), canonical_json(self.versions), filename, size,
+                 canonical_json(meta), now, now)
+            )
+            self._evict(keep=key)
+        logger.info(f"Stored result {filename} ({size} bytes)")
+        return {'key': key, 'path': final_path, 'size': size, 'meta': meta}
+
+    def _evict(self, keep=None):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute('SELECT key, file, size FROM results ORDER BY last_access').fetchall()
+        for key, filename, size in rows:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._remove(key, filename)
+            total -= size
+            self.stats['evictions'] += 1
+            self.stats['evicted_bytes'] += size
+            logger.info(f"Evicted stored result {filename}")
+
+    def _remove(self, key, filename):
+        self._db.execute('DELETE FROM results WHERE key = ?', (key,))
+        try:
+            os.remove(os.path.join(self.files_dir, filename))
+        except FileNotFoundError:
+            pass
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_result_store():
+    """
+    Process-wide result store configured from the environment
+
+    ``RESULT_STORE_DIR`` and ``RESULT_STORE_MAX_BYTES`` override the
+    defaults; a budget of 0 disables the store.
+
+    Returns:
+        ResultStore: Shared store, or None when disabled
+    """
+    global _default_store
+    with _default_lock:
+        max_bytes = int(os.environ.get('RESULT_STORE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        if max_bytes <= 0:
+            return None
+        if _default_store is None:
+            _default_store = ResultStore(os.environ.get('RESULT_STORE_DIR', DEFAULT_STORE_DIR), max_bytes)
+        return _default_store
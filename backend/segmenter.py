@@ -5,26 +5,98 @@ Uses MoviePy for video processing
 """
 
 import os
-from moviepy.editor import VideoFileClip, AudioFileClip
+import csv
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from moviepy.editor import VideoFileClip
+from ffmpeg_utils import run_ffmpeg, probe_duration, probe_keyframes, probe_streams, probe_video_size, copy_range
+from metrics import timed, written_bytes
+from encode_scheduler import default_scheduler, PROFILES
+from media_analysis import stream_scores, plan_cuts
+from mp3_frames import MP3File, MP3FormatError
+from previews import PreviewGenerator
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Video cutting modes
+#   exact    - decode and re-encode every frame (frame-accurate, slowest)
+#   keyframe - stream copy in one demux pass, cuts snap to the next keyframe
+#   smart    - stream copy, re-encoding only the partial GOPs at each cut
+SEGMENT_MODES = ('exact', 'keyframe', 'smart')
+
+# Where segments end
+#   fixed   - every segment_duration seconds
+#   content - near silences and scene changes, within min/max length
+CUT_POINTS = ('fixed', 'content')
+
+# What is written
+#   files - one standalone MP4 (or audio file) per segment
+#   hls   - fMP4 HLS renditions of a bitrate ladder plus playlists
+OUTPUTS = ('files', 'hls')
+
+# HLS renditions, tallest first; those taller than the source are skipped
+DEFAULT_LADDER = [
+    {'name': '1080p', 'height': 1080, 'video_bitrate': 5000, 'audio_bitrate': 192},
+    {'name': '720p', 'height': 720, 'video_bitrate': 2800, 'audio_bitrate': 128},
+    {'name': '480p', 'height': 480, 'video_bitrate': 1400, 'audio_bitrate': 128},
+    {'name': '360p', 'height': 360, 'video_bitrate': 800, 'audio_bitrate': 96},
+]
+
+
+def _write_video_segment(input_path, start_time, end_time, segment_path, encode):
+    """
+    Encode one video time range (runs inside a pool worker)
+    
+    Each call opens its own reader so workers never share ffmpeg pipes.
+    
+    Args:
+        input_path (str): Source video path
+        start_time (float): Segment start in seconds
+        end_time (float): Segment end in seconds
+        segment_path (str): Output path
+        encode (dict): Threads and x264 settings granted by the scheduler
+    """
+    video = VideoFileClip(input_path)
+    try:
+        video.subclip(start_time, end_time).write_videofile(
+            segment_path,
+            codec='libx264',
+            audio_codec='aac',
+            logger=None,  # Suppress MoviePy logs
+            **encode
+        )
+    finally:
+        video.close()
+
+
 class MediaSegmenter:
     """Handles video and audio segmentation"""
     
-    def __init__(self, download_folder):
+    def __init__(self, download_folder, workers=None, max_segments=5):
         """
         Initialize segmenter
         
         Args:
             download_folder (str): Path to store segmented files
+            workers (int): Parallel encode processes (default: CPU count)
+            max_segments (int): Cap on segments per file, None for no cap
         """
         self.download_folder = download_folder
         self.segment_duration = 30  # Default: 30 seconds per segment
+        self.workers = workers or os.cpu_count() or 1
+        self.max_segments = max_segments  # 5 keeps demo runs short
+        self.keyframe_tolerance = 0.02  # Seconds a cut may miss a keyframe by
+        self.cut_points = 'fixed'
+        self.min_duration = None  # Content cuts: default half a segment
+        self.max_duration = None  # Content cuts: default one and a half segments
+        self.ladder = DEFAULT_LADDER  # HLS renditions (kbps bitrates)
+        self.previews = PreviewGenerator()  # Keyframe sprites and segment thumbnails
     
-    def segment(self, filename, session_id, segment_duration=None):
+    @timed('segment')
+    def segment(self, filename, session_id, segment_duration=None, mode='exact',
+                cut_points='fixed', min_duration=None, max_duration=None,
+                output='files', ladder=None, previews=True):
         """
         Segment media file into multiple parts
         
@@ -32,14 +104,47 @@ class MediaSegmenter:
             filename (str): Input filename
             session_id (str): Unique session identifier
             segment_duration (int): Duration of each segment in seconds
+                (the preferred length with content cut points)
+            mode (str): Video cutting mode ('exact', 'keyframe' or 'smart')
+            cut_points (str): 'fixed' or 'content' (near silences and scene changes)
+            min_duration (float): Shortest content segment in seconds
+            max_duration (float): Longest content segment in seconds
+            output (str): 'files' or 'hls' (fMP4 bitrate ladder; ``mode`` is ignored)
+            ladder (list): HLS renditions, dicts with 'name', 'height',
+                'video_bitrate' and 'audio_bitrate' (kbps)
+            previews (bool): Also write a seek sprite with its WebVTT index
+                and one thumbnail per segment (video only)
             
         Returns:
             dict: Result with success status and list of segment filenames
+                (paths relative to the download folder for HLS), plus
+                'previews' when they were requested
         """
         try:
             if segment_duration:
                 self.segment_duration = segment_duration
             
+            if mode not in SEGMENT_MODES:
+                return {
+                    'success': False,
+                    'error': f'Unknown segment mode: {mode}'
+                }
+            
+            if cut_points not in CUT_POINTS:
+                return {
+                    'success': False,
+                    'error': f'Unknown cut points: {cut_points}'
+                }
+            
+            if output not in OUTPUTS:
+                return {
+                    'success': False,
+                    'error': f'Unknown output: {output}'
+                }
+            self.cut_points = cut_points
+            self.min_duration = min_duration
+            self.max_duration = max_duration
+            
             input_path = os.path.join(self.download_folder, filename)
             
             if not os.path.exists(input_path):
@@ -53,13 +158,28 @@ class MediaSegmenter:
             # Determine if it's video or audio
             file_ext = os.path.splitext(filename)[1].lower()
             
-            if file_ext in ['.mp4', '.avi', '.mov', '.mkv']:
-                return self._segment_video(input_path, session_id)
+            if output == 'hls':
+                result = self._segment_hls(input_path, session_id, ladder or self.ladder)
             elif file_ext in ['.mp3', '.wav', '.m4a', '.aac']:
-                return self._segment_audio(input_path, session_id)
+                result = self._segment_audio(input_path, session_id)
+            # Video (or unknown, tried as video)
+            elif mode == 'keyframe':
+                result = self._segment_video_keyframe(input_path, session_id)
+            elif mode == 'smart':
+                result = self._segment_video_smart(input_path, session_id)
             else:
-                # Try as video first
-                return self._segment_video(input_path, session_id)
+                result = self._segment_video(input_path, session_id)
+            
+            if result.get('success'):
+                written_bytes.inc(sum(
+                    os.path.getsize(os.path.join(self.download_folder, name)) for name in result['segments']
+                ), stage='segment')
+                if previews and 'video' in probe_streams(input_path):
+                    # Keyframes only, so a small fraction of the segmenting cost
+                    result['previews'] = self.previews.generate(
+                        input_path, self.download_folder, session_id, cuts=result['cuts']
+                    )
+            return result
                 
         except Exception as e:
             logger.error(f"Segmentation error: {str(e)}")
@@ -68,6 +188,125 @@ class MediaSegmenter:
                 'error': str(e)
             }
     
+    def _plan(self, input_path, duration):
+        """
+        Compute segment time ranges using the selected cut points
+        
+        Args:
+            input_path (str): Media path (analysed for content cut points)
+            duration (float): Media duration in seconds
+            
+        Returns:
+            list: (start, end) tuples in seconds
+        """
+        if self.cut_points == 'content':
+            return self._plan_content_segments(input_path, duration)
+        return self.plan_segments(duration)
+    
+    def _plan_content_segments(self, input_path, duration):
+        """
+        Compute segment time ranges that end near silences and scene changes
+        
+        Audio and video are scored in a streaming pass, so memory stays
+        flat on long inputs; with a segment cap, analysis stops as soon as
+        the capped segments are planned.
+        
+        Args:
+            input_path (str): Media path
+            duration (float): Media duration in seconds
+            
+        Returns:
+            list: (start, end) tuples in seconds
+        """
+        target = self.segment_duration
+        min_length = self.min_duration or target * 0.5
+        max_length = max(self.max_duration or target * 1.5, min_length)
+        cuts = plan_cuts(stream_scores(input_path), target, min_length, max_length, self.max_segments)
+        # Windows may overhang the container duration slightly
+        cuts = [(start, min(end, duration)) for start, end in cuts if start < duration]
+        logger.info(f"Content cut points: {[round(end, 2) for _, end in cuts[:-1]]}")
+        return cuts or self.plan_segments(duration)
+    
+    def plan_segments(self, duration):
+        """
+        Compute segment time ranges for a media duration
+        
+        Args:
+            duration (float): Media duration in seconds
+            
+        Returns:
+            list: (start, end) tuples in seconds
+        """
+        # Calculate number of segments
+        num_segments = int(duration / self.segment_duration) + 1
+        
+        # Limit segment count (demo cap) unless disabled
+        if self.max_segments:
+            num_segments = min(num_segments, self.max_segments)
+        
+        cuts = []
+        for i in range(num_segments):
+            start_time = i * self.segment_duration
+            end_time = min((i + 1) * self.segment_duration, duration)
+            
+            if start_time >= duration:
+                break
+            
+            cuts.append((start_time, end_time))
+        
+        return cuts
+    
+    def _encode_segments(self, writer, input_path, session_id, cuts, ext):
+        """
+        Encode independent time ranges, in parallel when possible
+        
+        Ranges are spread over a bounded process pool. Each encode first
+        takes threads and x264 settings from the shared encode scheduler,
+        so concurrent jobs cannot oversubscribe the CPU.
+        
+        Args:
+            writer (callable): Module-level segment writer function
+            input_path (str): Source media path
+            session_id (str): Session identifier
+            cuts (list): (start, end) tuples in seconds
+            ext (str): Output extension including the dot
+            
+        Returns:
+            list: Segment filenames in segment order
+        """
+        segment_files = [f'{session_id}_segment_{i+1}{ext}' for i in range(len(cuts))]
+        segment_paths = [os.path.join(self.download_folder, name) for name in segment_files]
+        
+        pool_size = max(1, min(self.workers, len(cuts)))
+        jobs = [
+            (input_path, start_time, end_time, path)
+            for (start_time, end_time), path in zip(cuts, segment_paths)
+        ]
+        scheduler = default_scheduler()
+        
+        def run(job, executor=None):
+            with scheduler.slot() as encode:
+                args = job + (encode.moviepy_params(),)
+                if executor is None:
+                    writer(*args)
+                else:
+                    executor.submit(writer, *args).result()
+        
+        if pool_size == 1:
+            for job in jobs:
+                run(job)
+        else:
+            logger.info(f"Encoding {len(jobs)} segments on up to {pool_size} workers")
+            with ProcessPoolExecutor(max_workers=pool_size) as executor, \
+                    ThreadPoolExecutor(max_workers=pool_size) as feeders:
+                # map() yields in submission order and re-raises worker errors
+                list(feeders.map(lambda job: run(job, executor), jobs))
+        
+        for i, segment_filename in enumerate(segment_files):
+            logger.info(f"Created segment {i+1}: {segment_filename}")
+        
+        return segment_files
+    
     def _segment_video(self, input_path, session_id):
         """
         Segment video file
@@ -80,63 +319,466 @@ class MediaSegmenter:
             dict: Segmentation result
         """
         try:
-            video = VideoFileClip(input_path)
-            duration = video.duration
+            duration = probe_duration(input_path)
+            
+            logger.info(f"Video duration: {duration} seconds")
+            
+            cuts = self._plan(input_path, duration)
+            segment_files = self._encode_segments(
+                _write_video_segment, input_path, session_id, cuts, '.mp4'
+            )
+            
+            return {
+                'success': True,
+                'segments': segment_files,
+                'count': len(segment_files),
+                'mode': 'exact',
+                'cuts': cuts
+            }
+            
+        except Exception as e:
+            logger.error(f"Video segmentation error: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _segment_video_keyframe(self, input_path, session_id):
+        """
+        Segment video by stream copy in a single demux pass
+        
+        Each cut snaps forward to the next keyframe, so segments are
+        bit-identical to the source but their boundaries are approximate.
+        
+        Args:
+            input_path (str): Path to input video
+            session_id (str): Session identifier
             
+        Returns:
+            dict: Segmentation result
+        """
+        try:
+            duration = probe_duration(input_path)
             logger.info(f"Video duration: {duration} seconds")
             
-            # Calculate number of segments
-            num_segments = int(duration / self.segment_duration) + 1
+            cuts = self._plan(input_path, duration)
+            pattern = os.path.join(self.download_folder, f'{session_id}_segment_%d.mp4')
+            list_path = os.path.join(self.download_folder, f'{session_id}_segments.csv')
             
-            # Limit to 5 segments for demo purposes
-            num_segments = min(num_segments, 5)
+            args = [
+                '-i', input_path, '-t', f'{cuts[-1][1]:.3f}',
+                '-map', '0:v:0?', '-map', '0:a:0?', '-c', 'copy',
+                '-f', 'segment', '-segment_start_number', '1',
+                '-reset_timestamps', '1',
+                '-segment_list', list_path, '-segment_list_type', 'csv'
+            ]
+            if len(cuts) > 1:
+                args += ['-segment_times', ','.join(f'{start:.3f}' for start, _ in cuts[1:])]
+            else:
+                args += ['-segment_time', f'{duration + 1:.3f}']
+            args.append(pattern)
+            run_ffmpeg(args)
             
+            # The segment list records where each cut actually landed
             segment_files = []
+            actual_cuts = []
+            with open(list_path, newline='') as f:
+                for row in csv.reader(f):
+                    if len(row) < 3:
+                        continue
+                    segment_files.append(os.path.basename(row[0]))
+                    actual_cuts.append((float(row[1]), float(row[2])))
+            os.remove(list_path)
             
-            for i in range(num_segments):
-                start_time = i * self.segment_duration
-                end_time = min((i + 1) * self.segment_duration, duration)
-                
-                if start_time >= duration:
-                    break
-                
-                # Create segment
-                segment = video.subclip(start_time, end_time)
-                
-                # Generate output filename
+            # Its times run late by the B-frame reorder delay; move them
+            # back onto the keyframes the segments really start on
+            keyframes = probe_keyframes(input_path)
+            tolerance = self.keyframe_tolerance
+            snap = lambda t: max((k for k in keyframes if k <= t + tolerance), default=0.0)
+            if actual_cuts:
+                starts = [0.0] + [snap(start) for start, _ in actual_cuts[1:]]
+                actual_cuts = list(zip(starts, starts[1:] + [min(actual_cuts[-1][1], duration)]))
+            
+            for i, segment_filename in enumerate(segment_files):
+                logger.info(f"Created segment {i+1}: {segment_filename}")
+            
+            return {
+                'success': True,
+                'segments': segment_files,
+                'count': len(segment_files),
+                'mode': 'keyframe',
+                'cuts': actual_cuts
+            }
+            
+        except Exception as e:
+            logger.error(f"Keyframe segmentation error: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _segment_video_smart(self, input_path, session_id):
+        """
+        Segment video with frame-accurate cuts and minimal re-encoding
+        
+        Only the frames between a cut and the nearest keyframe inside the
+        segment are re-encoded; the whole GOPs between are stream copied
+        and the parts are joined with the concat demuxer.
+        
+        Args:
+            input_path (str): Path to input video
+            session_id (str): Session identifier
+            
+        Returns:
+            dict: Segmentation result
+        """
+        try:
+            duration = probe_duration(input_path)
+            keyframes = probe_keyframes(input_path)
+            logger.info(f"Video duration: {duration} seconds, {len(keyframes)} keyframes")
+            
+            cuts = self._plan(input_path, duration)
+            segment_files = []
+            
+            for i, (start_time, end_time) in enumerate(cuts):
                 segment_filename = f'{session_id}_segment_{i+1}.mp4'
-                segment_path = os.path.join(self.download_folder, segment_filename)
-                
-                # Write segment
-                segment.write_videofile(
-                    segment_path,
-                    codec='libx264',
-                    audio_codec='aac',
-                    logger=None  # Suppress MoviePy logs
-                )
-                
+                self._cut_smart(input_path, start_time, end_time,
+                                os.path.join(self.download_folder, segment_filename), keyframes)
                 segment_files.append(segment_filename)
                 logger.info(f"Created segment {i+1}: {segment_filename}")
             
-            # Close video
-            video.close()
+            return {
+                'success': True,
+                'segments': segment_files,
+                'count': len(segment_files),
+                'mode': 'smart',
+                'cuts': cuts
+            }
+            
+        except Exception as e:
+            logger.error(f"Smart segmentation error: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def _cut_smart(self, input_path, start_time, end_time, segment_path, keyframes):
+        """
+        Write one frame-accurate segment, re-encoding only its partial GOPs
+        
+        Whole GOPs between the first and last keyframe inside the segment
+        are stream copied; the frames before and after them are re-encoded
+        and the parts are joined with the concat demuxer.
+        
+        Args:
+            input_path (str): Source video path
+            start_time (float): Segment start in seconds
+            end_time (float): Segment end in seconds
+            segment_path (str): Output path
+            keyframes (list): Sorted keyframe times of the source
+        """
+        tolerance = self.keyframe_tolerance
+        inside = [k for k in keyframes if start_time - tolerance <= k <= end_time + tolerance]
+        
+        if not inside or inside[-1] - inside[0] <= tolerance:
+            # No whole GOP inside the segment, nothing to copy
+            self._encode_range(input_path, start_time, end_time, segment_path)
+            return
+        
+        first, last = inside[0], inside[-1]
+        base = os.path.splitext(segment_path)[0]
+        head_path, body_path, tail_path = f'{base}_head.mp4', f'{base}_body.mp4', f'{base}_tail.mp4'
+        parts = []
+        try:
+            if first > start_time + tolerance:
+                self._encode_range(input_path, start_time, first, head_path, audio=False)
+                parts.append((head_path, first - start_time))
+            parts.append(self._copy_gops(input_path, first, last, body_path, keyframes))
+            if end_time > last + tolerance:
+                self._encode_range(input_path, last, end_time, tail_path, audio=False)
+                parts.append((tail_path, end_time - last))
+            self._join(parts, input_path, start_time, end_time, segment_path)
+        finally:
+            for part in (head_path, body_path, tail_path):
+                if os.path.exists(part):
+                    os.remove(part)
+    
+    def _copy_gops(self, input_path, first, last, output_path, keyframes):
+        """
+        Stream copy the video from one keyframe up to (not including) another
+        
+        A plain ``-t`` copy ends on decode time and keeps the frames
+        reordered behind the last one, so the segment muxer splits at
+        ``last`` instead. Its split times may be off by the B-frame delay
+        either way, hence a threshold halfway into the GOP before ``last``.
+        
+        Args:
+            input_path (str): Source video path
+            first (float): Keyframe the copy starts on
+            last (float): Keyframe the copy stops before
+            output_path (str): Destination MP4 (video only)
+            keyframes (list): Sorted keyframe times of the source
+        
+        Returns:
+            tuple: (path, duration) part for ``_join``
+        """
+        previous = max((k for k in keyframes if k < last - self.keyframe_tolerance), default=first)
+        split = (last - first + previous - first) / 2
+        pattern = os.path.splitext(output_path)[0] + '_%d.mp4'
+        try:
+            run_ffmpeg([
+                '-ss', f'{first:.6f}', '-i', input_path,
+                # Read just past ``last`` so the muxer sees that keyframe
+                '-t', f'{last - first + 0.5:.6f}',
+                '-map', '0:v:0', '-c', 'copy',
+                '-f', 'segment', '-segment_times', f'{split:.6f}',
+                '-reset_timestamps', '1', pattern
+            ])
+            os.replace(pattern % 0, output_path)
+        finally:
+            for number in (0, 1):
+                if os.path.exists(pattern % number):
+                    os.remove(pattern % number)
+        return output_path, last - first
+    
+    def _join(self, parts, input_path, start_time, end_time, output_path):
+        """
+        Concatenate video parts and add the source audio, without re-encoding
+        
+        Audio is stream copied from the source in one piece, so it has no
+        seams where the video parts meet.
+        
+        Args:
+            parts (list): (path, duration) video-only parts in play order
+            input_path (str): Source media path (audio)
+            start_time (float): Range start in seconds
+            end_time (float): Range end in seconds
+            output_path (str): Destination MP4
+        """
+        list_path = os.path.splitext(output_path)[0] + '_concat.txt'
+        try:
+            with open(list_path, 'w') as f:
+                for path, duration in parts:
+                    escaped = os.path.abspath(path).replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\nduration {duration:.6f}\n")
+            run_ffmpeg([
+                '-f', 'concat', '-safe', '0', '-i', list_path,
+                '-ss', f'{start_time:.6f}', '-t', f'{end_time - start_time:.6f}', '-i', input_path,
+                '-map', '0:v', '-map', '1:a:0?', '-c', 'copy',
+                '-movflags', '+faststart', output_path
+            ])
+        finally:
+            if os.path.exists(list_path):
+                os.remove(list_path)
+    
+    def cut(self, input_path, session_id, number, start_time, end_time, mode='smart', keyframes=None):
+        """
+        Write a single segment, named like the ones ``segment`` writes
+        
+        Lets a caller cut segments one at a time as they become
+        available (see ``StagePipeline``). Only the source up to
+        ``end_time`` is read, so a file still downloading can be cut as
+        soon as that part is on disk.
+        
+        Args:
+            input_path (str): Source media path
+            session_id (str): Session identifier
+            number (int): 1-based segment number
+            start_time (float): Segment start in seconds
+            end_time (float): Segment end in seconds
+            mode (str): Video cutting mode ('exact', 'keyframe' or 'smart')
+            keyframes (list): Sorted keyframe times of the source (default:
+                probed; pass them when cutting many segments)
+            
+        Returns:
+            str: Segment filename in the download folder
+        
+        Raises:
+            ValueError: If the mode is unknown
+            FFmpegError: If ffmpeg fails
+        """
+        if mode not in SEGMENT_MODES:
+            raise ValueError(f'Unknown segment mode: {mode}')
+        ext = os.path.splitext(input_path)[1].lower()
+        audio = ext in ['.mp3', '.wav', '.m4a', '.aac']
+        segment_filename = f'{session_id}_segment_{number}{ext if audio else ".mp4"}'
+        segment_path = os.path.join(self.download_folder, segment_filename)
+        
+        if audio:
+            # Audio frames all start cleanly, so a stream copy is exact enough
+            run_ffmpeg([
+                '-ss', f'{start_time:.6f}', '-i', input_path,
+                '-t', f'{end_time - start_time:.6f}',
+                '-map', '0:a:0', '-c', 'copy', segment_path
+            ])
+        elif mode == 'exact':
+            with default_scheduler().slot() as encode:
+                _write_video_segment(input_path, start_time, end_time, segment_path, encode.moviepy_params())
+        else:
+            if keyframes is None:
+                keyframes = probe_keyframes(input_path)
+            if mode == 'smart':
+                self._cut_smart(input_path, start_time, end_time, segment_path, keyframes)
+            else:
+                # Both ends snap forward to keyframes, as in the single-pass keyframe mode
+                snap = lambda t: next((k for k in keyframes if k >= t - self.keyframe_tolerance), None)
+                start, end = snap(start_time), snap(end_time)
+                if start is None:
+                    start = start_time
+                if end is not None and end > start + self.keyframe_tolerance:
+                    body = self._copy_gops(input_path, start, end, os.path.splitext(segment_path)[0] + '_body.mp4', keyframes)
+                    try:
+                        self._join([body], input_path, start, end, segment_path)
+                    finally:
+                        os.remove(body[0])
+                else:
+                    # No keyframe after the end: copy through to it
+                    copy_range(input_path, start, end_time, segment_path)
+        
+        logger.info(f"Created segment {number}: {segment_filename}")
+        return segment_filename
+    
+    def _segment_hls(self, input_path, session_id, ladder):
+        """
+        Write an fMP4 HLS bitrate ladder in a single ffmpeg pass
+        
+        The source is decoded once; a split filter feeds one scaler and
+        x264 encoder per rendition, so a ladder costs one decode plus N
+        encodes. Keyframes are forced at the planned cut times only (no
+        periodic or scene-cut keyframes), so every rendition starts a
+        segment on exactly the same frames and players can switch
+        renditions at any segment boundary.
+        
+        Args:
+            input_path (str): Path to input video
+            session_id (str): Session identifier
+            ladder (list): Rendition dicts ('name', 'height', 'video_bitrate',
+                'audio_bitrate' in kbps)
+            
+        Returns:
+            dict: Segmentation result with the master playlist path
+        """
+        try:
+            streams = probe_streams(input_path)
+            if 'video' not in streams:
+                return {
+                    'success': False,
+                    'error': 'HLS output needs a video stream'
+                }
+            _, source_height = probe_video_size(input_path)
+            duration = probe_duration(input_path)
+            logger.info(f"Video duration: {duration} seconds, {source_height}p source")
+            
+            # Never upscale; a source below every rung gets the smallest rung at its own size
+            renditions = [r for r in ladder if r['height'] <= source_height]
+            if not renditions:
+                smallest = min(ladder, key=lambda r: r['height'])
+                renditions = [dict(smallest, name=f'{source_height}p', height=source_height)]
+            
+            cuts = self._plan(input_path, duration)
+            hls_name = f'{session_id}_hls'
+            hls_dir = os.path.join(self.download_folder, hls_name)
+            for rendition in renditions:
+                os.makedirs(os.path.join(hls_dir, rendition['name']), exist_ok=True)
+            
+            count = len(renditions)
+            keyframes = ','.join(['0'] + [f'{start:.3f}' for start, _ in cuts[1:]])
+            splits = ''.join(f'[s{i}]' for i in range(count))
+            graph = [f'[0:v:0]split={count}{splits}']
+            graph += [f'[s{i}]scale=-2:{r["height"]}[v{i}]' for i, r in enumerate(renditions)]
+            
+            args = ['-i', input_path, '-t', f'{cuts[-1][1]:.3f}', '-filter_complex', ';'.join(graph)]
+            has_audio = 'audio' in streams
+            stream_map = []
+            for i, rendition in enumerate(renditions):
+                args += ['-map', f'[v{i}]']
+                if has_audio:
+                    # One audio decode feeds every rendition's (cheap) AAC encoder
+                    args += ['-map', '0:a:0']
+                stream_map.append(f'v:{i},a:{i},name:{rendition["name"]}' if has_audio
+                                  else f'v:{i},name:{rendition["name"]}')
+            
+            # One slot sized for the whole ladder, shared out between its encoders
+            scheduler = default_scheduler()
+            with scheduler.slot(threads=count * PROFILES[scheduler.profile]['threads']) as encode:
+                threads = max(1, encode.threads // count)
+                for i, rendition in enumerate(renditions):
+                    rate = rendition['video_bitrate']
+                    args += [
+                        f'-c:v:{i}', 'libx264', f'-b:v:{i}', f'{rate}k',
+                        f'-maxrate:v:{i}', f'{int(rate * 1.07)}k', f'-bufsize:v:{i}', f'{rate * 2}k',
+                        f'-threads:v:{i}', str(threads),
+                        # Keyframes only where segments start, identical in every rendition
+                        f'-force_key_frames:v:{i}', keyframes
+                    ]
+                    if has_audio:
+                        args += [f'-c:a:{i}', 'aac', f'-b:a:{i}', f'{rendition["audio_bitrate"]}k']
+                args += [
+                    '-preset', encode.preset, '-pix_fmt', 'yuv420p',
+                    '-x264-params', 'keyint=infinite:scenecut=0',
+                    '-f', 'hls', '-hls_segment_type', 'fmp4', '-hls_playlist_type', 'vod',
+                    # Shorter than any segment, so each forced keyframe starts a new one
+                    '-hls_time', '0.1',
+                    '-start_number', '1',
+                    '-hls_segment_filename', os.path.join(hls_dir, '%v', 'segment_%d.m4s'),
+                    '-master_pl_name', 'master.m3u8',
+                    '-var_stream_map', ' '.join(stream_map),
+                    os.path.join(hls_dir, '%v', 'index.m3u8')
+                ]
+                run_ffmpeg(args)
+            
+            segment_files = []
+            for rendition in renditions:
+                folder = os.path.join(hls_dir, rendition['name'])
+                names = sorted((n for n in os.listdir(folder) if n.endswith('.m4s')),
+                               key=lambda n: int(n[len('segment_'):-len('.m4s')]))
+                segment_files += [os.path.join(hls_name, rendition['name'], n) for n in names]
+                logger.info(f"Created {rendition['name']} rendition: {len(names)} segments")
             
             return {
                 'success': True,
                 'segments': segment_files,
-                'count': len(segment_files)
+                'count': len(cuts),
+                'mode': 'hls',
+                'playlist': os.path.join(hls_name, 'master.m3u8'),
+                'renditions': [r['name'] for r in renditions],
+                'cuts': cuts
             }
             
         except Exception as e:
-            logger.error(f"Video segmentation error: {str(e)}")
+            logger.error(f"HLS segmentation error: {str(e)}")
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    def _encode_range(self, input_path, start_time, end_time, output_path, audio=True):
+        """
+        Re-encode a time range with frame-accurate seeking
+        
+        Args:
+            input_path (str): Source media path
+            start_time (float): Range start in seconds
+            end_time (float): Range end in seconds
+            output_path (str): Destination path (.mp4 or .mkv)
+            audio (bool): Keep the audio track (off for video-only parts)
+        """
+        streams = ['-map', '0:v:0?', '-map', '0:a:0?', '-c:a', 'aac'] if audio else ['-map', '0:v:0']
+        with default_scheduler().slot() as encode:
+            run_ffmpeg([
+                '-ss', f'{start_time:.6f}', '-i', input_path,
+                '-t', f'{end_time - start_time:.6f}', *streams,
+                # No B-frames keeps DTS monotonic where copied packets follow
+                *encode.x264_args(), '-bf', '0', output_path
+            ])
+    
     def _segment_audio(self, input_path, session_id):
         """
-        Segment audio file
+        Segment audio file without decoding it
+        
+        MP3 is split at frame boundaries by byte range from a memory map;
+        other formats (AAC, M4A, WAV) are stream copied by ffmpeg. Either
+        way the segments hold the source's audio frames unchanged.
         
         Args:
             input_path (str): Path to input audio
@@ -145,50 +787,44 @@ class MediaSegmenter:
         Returns:
             dict: Segmentation result
         """
+        mp3 = None
         try:
-            audio = AudioFileClip(input_path)
-            duration = audio.duration
+            ext = os.path.splitext(input_path)[1].lower()
+            if ext == '.mp3':
+                try:
+                    mp3 = MP3File(input_path)
+                except MP3FormatError as e:
+                    logger.warning(f"MP3 frame split unavailable, remuxing instead: {str(e)}")
             
+            duration = mp3.duration() if mp3 else probe_duration(input_path)
             logger.info(f"Audio duration: {duration} seconds")
             
-            # Calculate number of segments
-            num_segments = int(duration / self.segment_duration) + 1
-            
-            # Limit to 5 segments for demo purposes
-            num_segments = min(num_segments, 5)
+            cuts = self._plan(input_path, duration)
+            segment_files = [f'{session_id}_segment_{i+1}{ext}' for i in range(len(cuts))]
+            segment_paths = [os.path.join(self.download_folder, name) for name in segment_files]
             
-            segment_files = []
+            if mp3:
+                # Boundaries move to the nearest frame start
+                cuts = mp3.split(cuts, segment_paths)
+                method = 'frames'
+            else:
+                for (start_time, end_time), path in zip(cuts, segment_paths):
+                    run_ffmpeg([
+                        '-ss', f'{start_time:.6f}', '-i', input_path,
+                        '-t', f'{end_time - start_time:.6f}',
+                        '-map', '0:a:0', '-c', 'copy', path
+                    ])
+                method = 'remux'
             
-            for i in range(num_segments):
-                start_time = i * self.segment_duration
-                end_time = min((i + 1) * self.segment_duration, duration)
-                
-                if start_time >= duration:
-                    break
-                
-                # Create segment
-                segment = audio.subclip(start_time, end_time)
-                
-                # Generate output filename
-                segment_filename = f'{session_id}_segment_{i+1}.mp3'
-                segment_path = os.path.join(self.download_folder, segment_filename)
-                
-                # Write segment
-                segment.write_audiofile(
-                    segment_path,
-                    logger=None  # Suppress MoviePy logs
-                )
-                
-                segment_files.append(segment_filename)
+            for i, segment_filename in enumerate(segment_files):
                 logger.info(f"Created segment {i+1}: {segment_filename}")
             
-            # Close audio
-            audio.close()
-            
             return {
                 'success': True,
                 'segments': segment_files,
-                'count': len(segment_files)
+                'count': len(segment_files),
+                'method': method,
+                'cuts': cuts
             }
             
         except Exception as e:
@@ -197,3 +833,6 @@ class MediaSegmenter:
                 'success': False,
                 'error': str(e)
             }
+        finally:
+            if mp3:
+                mp3.close()
@@ -0,0 +1,77 @@
+"""
+Single Flight Module
+Coalesces concurrent calls for the same key into one execution
+Later callers wait for and share the first caller's result
+"""
+
+import threading
+
+
+class _Call:
+    """One in-flight execution and its outcome"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Duplicate call suppression keyed by an arbitrary hashable"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run ``fn`` once per key at a time
+
+        Args:
+            key: Hashable identifying the work
+            fn (callable): Zero-argument function producing the result
+
+        Returns:
+            tuple: (result, shared) where shared is True if this caller
+            waited on another caller's execution
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self, key):
+        """
+        Check whether a call for ``key`` is currently running
+
+        Args:
+            key: Hashable identifying the work
+
+        Returns:
+            bool: True while the key is being computed
+        """
+        with self._lock:
+            return key in self._calls
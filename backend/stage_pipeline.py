@@ -0,0 +1,316 @@
+"""
+Stage Pipeline Module
+Overlaps downloading, segmenting and dubbing, handing work on through a bounded queue
+Segments are cut as soon as the downloaded bytes cover them, and dubbed while the next is cut
+"""
+
+import io
+import os
+import time
+import uuid
+import queue
+import threading
+import logging
+
+from dubbing_engine import parse_cues, window_cues
+from ffmpeg_utils import probe_duration, probe_keyframes, probe_streams
+from mp4_index import load_index, MP4FormatError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 2   # Cut segments waiting for the dubber
+POLL_SECONDS = 0.5       # Longest wait between checks of the partial download
+
+
+class PipelineCancelled(Exception):
+    """Raised from the download's progress hook once a later stage has failed"""
+
+
+class _DownloadWatch:
+    """Follows a download's partial file and how much of it is already on disk"""
+
+    def __init__(self):
+        self.changed = threading.Condition()
+        self.partial = None       # File the downloader is writing
+        self.link = None          # Our hard link to it, valid across the final rename
+        self.ready = 0            # Bytes from the start of the file already written
+        self.index = None         # MP4Index of the partial file, once its moov is on disk
+        self.progressive = True   # False once the partial file turns out unreadable
+        self.path = None          # Finished download
+        self.error = None
+        self.cancelled = False
+
+    def hook(self, d):
+        """yt-dlp progress hook: records the partial file and its readable prefix"""
+        if self.cancelled:
+            raise PipelineCancelled('Pipeline stopped')
+        partial = d.get('tmpfilename')
+        if d.get('status') != 'downloading' or not partial:
+            return
+        if 'ready_bytes' in d:
+            ready = d['ready_bytes']
+        else:
+            # Sequential writers: everything but the writer's buffer is in the file
+            ready = (d.get('downloaded_bytes') or 0) - io.DEFAULT_BUFFER_SIZE
+        with self.changed:
+            if partial != self.partial:
+                self._follow(partial)
+            self.ready = max(self.ready, ready)
+            self.changed.notify_all()
+
+    def _follow(self, partial):
+        """Hard-link the partial file, so it stays readable when it is renamed"""
+        first = self.partial is None
+        self.partial = partial
+        self.ready = 0
+        self._unlink()
+        if not first:
+            # A second file (e.g. separate audio to merge): nothing is usable before the end
+            self.progressive = False
+            return
+        base = partial[:-len('.part')] if partial.endswith('.part') else partial
+        root, ext = os.path.splitext(base)
+        link = f'{root}.{uuid.uuid4().hex}.reading{ext}'
+        try:
+            os.link(partial, link)
+            self.link = link
+        except OSError as e:
+            logger.info(f"Cannot follow the partial download ({str(e)}); cutting once it finishes")
+            self.progressive = False
+
+    def wait(self, end_time=None):
+        """
+        Block until the media up to ``end_time`` is readable
+
+        Args:
+            end_time (float): Time in seconds (default: only the index is needed)
+
+        Returns:
+            str: Path to read, the partial file or the finished download
+
+        Raises:
+            Exception: The download's error, if it failed
+        """
+        with self.changed:
+            while True:
+                if self.error:
+                    raise self.error
+                if self.path:
+                    return self.path
+                if self.progressive and self.link:
+                    if self.index is None:
+                        try:
+                            self.index = load_index(self.link, self.ready)
+                        except (MP4FormatError, OSError) as e:
+                            logger.info(f"Partial download is not readable ({str(e)}); cutting once it finishes")
+                            self.progressive = False
+                            self._unlink()
+                            continue
+                    if self.index and (end_time is None or self.ready >= self.index.bytes_needed(end_time)):
+                        return self.link
+                self.changed.wait(POLL_SECONDS)
+
+    def finish(self, path):
+        with self.changed:
+            self.path = path
+            self.changed.notify_all()
+
+    def fail(self, error):
+        with self.changed:
+            self.error = error
+            self.changed.notify_all()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def close(self):
+        with self.changed:
+            self._unlink()
+
+    def _unlink(self):
+        if self.link:
+            try:
+                os.remove(self.link)
+            except FileNotFoundError:
+                pass
+            self.link = None
+
+
+class StagePipeline:
+    """Download, segment and dub with the stages running at the same time"""
+
+    def __init__(self, downloader, segmenter, dubber=None, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        Initialize stage pipeline
+
+        Args:
+            downloader (MediaDownloader): Download stage
+            segmenter (MediaSegmenter): Cut stage
+            dubber (NeuralDubber): Dub stage (None: segments are not dubbed)
+            queue_size (int): Cut segments allowed to wait for the dubber
+
+        Raises:
+            ValueError: If the dubber does not read from the segmenter's folder
+        """
+        if dubber and os.path.abspath(dubber.download_folder) != os.path.abspath(segmenter.download_folder):
+            raise ValueError('Segmenter and dubber must share a download folder')
+        self.downloader = downloader
+        self.segmenter = segmenter
+        self.dubber = dubber
+        self.queue_size = max(1, queue_size)
+
+    def run(self, url, session_id, text=None, segment_duration=None, mode='smart', language='en',
+            keep_segments=False, on_segment=None):
+        """
+        Download a video, cut it into segments and dub each one, overlapped
+
+        The download runs on its own thread. Once the file's moov box is on
+        disk, its sample index says which bytes each segment needs, so
+        segment k is cut as soon as the download has written them; files
+        whose index is not at the front are cut after the download. Cut
+        segments go through a queue of ``queue_size`` to the dubber, which
+        dubs segment k while segment k+1 is being cut. A full queue stops
+        the cutter, so at most ``queue_size`` + 2 undubbed segments are on
+        disk at once; each is deleted once dubbed unless ``keep_segments``.
+        Cuts use fixed intervals (content cut points need the whole file).
+
+        Args:
+            url (str): Media URL
+            session_id (str): Unique session identifier
+            text (str): Script or SRT cues; SRT cues go to the segment their
+                start falls in, a plain script is spoken over every segment
+                (default: the dubber's demo text)
+            segment_duration (int): Seconds per segment
+            mode (str): Cutting mode ('exact', 'keyframe' or 'smart')
+            language (str): Language code for TTS
+            keep_segments (bool): Keep the undubbed segments too
+            on_segment (callable): Called with each finished segment's dict
+
+        Returns:
+            dict: Result with success status, 'original', 'segments' (dicts
+                with 'number', 'start', 'end', 'filename', 'dubbed') and
+                'timings' in seconds
+        """
+        if segment_duration:
+            self.segmenter.segment_duration = segment_duration
+        cues = parse_cues(text) if text else None
+        watch = _DownloadWatch()
+        handoff = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors, segments = [], []
+        started = time.perf_counter()
+        timings = {'download': None, 'cut': 0.0, 'dub': 0.0, 'first_segment': None, 'wall': None}
+        downloaded = {}
+
+        def fail(error):
+            errors.append(error)
+            stop.set()
+            watch.cancel()
+
+        def download():
+            try:
+                result = self.downloader.download(url, session_id, on_progress=watch.hook)
+                if not result.get('success'):
+                    raise RuntimeError(result.get('error'))
+                timings['download'] = round(time.perf_counter() - started, 3)
+                downloaded.update(result)
+                watch.finish(os.path.join(self.downloader.download_folder, result['filename']))
+            except Exception as e:
+                watch.fail(e)
+
+        def dub():
+            while True:
+                item = handoff.get()
+                if item is None:
+                    return
+                number, start, end, name, early = item
+                segment_path = os.path.join(self.segmenter.download_folder, name)
+                if stop.is_set():
+                    if not keep_segments:
+                        os.remove(segment_path)
+                    continue
+                try:
+                    segment = {'number': number, 'start': start, 'end': end, 'filename': name,
+                               'dubbed': False, 'cut_while_downloading': early}
+                    window = window_cues(cues, start, end) if cues is not None else None
+                    if self.dubber and window != []:
+                        dub_started = time.perf_counter()
+                        result = self.dubber.dub(name, os.path.splitext(name)[0], text=window, language=language)
+                        timings['dub'] += time.perf_counter() - dub_started
+                        if not result.get('success'):
+                            raise RuntimeError(result.get('error'))
+                        segment.update(filename=result['filename'], dubbed=True)
+                        if keep_segments:
+                            segment['segment'] = name
+                        else:
+                            os.remove(segment_path)
+                    if timings['first_segment'] is None:
+                        timings['first_segment'] = round(time.perf_counter() - started, 3)
+                    segments.append(segment)
+                    if on_segment:
+                        on_segment(segment)
+                except Exception as e:
+                    fail(e)
+
+        threads = [threading.Thread(target=download, daemon=True), threading.Thread(target=dub, daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            self._cut(watch, handoff, stop, session_id, mode, timings)
+        except Exception as e:
+            fail(e)
+        finally:
+            handoff.put(None)
+            for thread in threads:
+                thread.join()
+            watch.close()
+
+        if errors:
+            logger.error(f"Stage pipeline error: {str(errors[0])}")
+            return {
+                'success': False,
+                'error': str(errors[0])
+            }
+        timings.update(cut=round(timings['cut'], 3), dub=round(timings['dub'], 3),
+                       wall=round(time.perf_counter() - started, 3))
+        logger.info(f"Pipelined {len(segments)} segments in {timings['wall']:.2f}s "
+                    f"(download {timings['download']:.2f}s, cut {timings['cut']:.2f}s, dub {timings['dub']:.2f}s)")
+        return {
+            'success': True,
+            'original': downloaded.get('filename'),
+            'title': downloaded.get('title'),
+            'segments': segments,
+            'count': len(segments),
+            'mode': mode,
+            'timings': timings
+        }
+
+    def _cut(self, watch, handoff, stop, session_id, mode, timings):
+        """Plan the cuts from the index, then cut each once its bytes are on disk"""
+        source = watch.wait()
+        index = watch.index
+        if index is None:
+            # Finished before it was readable: index it whole, or probe it
+            try:
+                index = load_index(source)
+            except MP4FormatError:
+                index = None
+        if index:
+            duration = index.duration
+            keyframes = index.keyframes if index.has_video else None
+        else:
+            duration = probe_duration(source)
+            keyframes = probe_keyframes(source) if mode != 'exact' and 'video' in probe_streams(source) else None
+        cuts = self.segmenter.plan_segments(duration)
+        logger.info(f"Cutting {len(cuts)} segments from a {duration:.1f}s source as it downloads")
+
+        for number, (start, end) in enumerate(cuts, 1):
+            if stop.is_set():
+                return
+            source = watch.wait(end)
+            early = source != watch.path
+            cut_started = time.perf_counter()
+            name = self.segmenter.cut(source, session_id, number, start, end, mode, keyframes)
+            timings['cut'] += time.perf_counter() - cut_started
+            # Blocks while the dubber is queue_size segments behind
+            handoff.put((number, start, end, name, early))
@@ -35,47 +35,85 @@ function App() {
         finally { setIsLoading(false); }
     };
 
-    const startDownload = async () => {
-        setScreen('processing'); setProgress(10);
-        setLogs(["[SYSTEM] Initializing secure connection...", "[INFO] Bypassing DNS bottlenecks...", "[INFO] Forcing IPv4 layer..."]);
-
-        const timer = setInterval(() => {
-            setProgress(p => (p >= 90 ? p : p + 2));
-            const tasks = ["Resolving host...", "Fetching media manifest...", "Merging streams...", "Applying AI Dubbing...", "Optimizing buffer..."];
-            if (Math.random() > 0.7) {
-                setLogs(l => [...l, `[PROCESS] ${tasks[Math.floor(Math.random() * tasks.length)]}`]);
-            }
-        }, 600);
+    // Background jobs with live progress; serverless deployments process in the request instead
+    const runJob = async (body) => {
+        setLogs(["[SYSTEM] Submitting job to processing queue..."]);
+        const res = await fetch(`${API_Base}/jobs`, {
+            method: 'POST', body, headers: { 'Content-Type': 'application/json' }
+        });
+        const submitted = await res.json();
+        if (!submitted.success) throw new Error(submitted.error);
+        setLogs(l => [...l, `[INFO] Job ${submitted.job_id.slice(0, 8)} queued`]);
 
+        // Live progress from the server (download hooks + encoder progress)
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(submitted.events_url);
+            let lastStage = null;
+            source.onmessage = (msg) => {
+                const ev = JSON.parse(msg.data);
+                setProgress(Math.floor(ev.progress));
+                if (ev.stage !== lastStage) {
+                    lastStage = ev.stage;
+                    setLogs(l => [...l, `[${ev.stage.toUpperCase()}] ${ev.message || ''}`]);
+                } else if (ev.message) {
+                    setLogs(l => [...l, `[PROCESS] ${ev.message}`]);
+                }
+                if (ev.status === 'done') { source.close(); resolve(ev.result); }
+                if (ev.status === 'error') { source.close(); reject(new Error(ev.error)); }
+            };
+            source.onerror = () => { source.close(); reject(new Error('Lost connection to job stream')); };
+        });
+    };
+
+    const runInRequest = async (body) => {
+        setLogs(["[SYSTEM] Processing on the server, this can take a minute..."]);
+        // No progress events without a job; creep towards 90% while the request runs
+        const timer = setInterval(() => setProgress(p => (p >= 90 ? p : p + 2)), 600);
         try {
             const res = await fetch(`${API_Base}/process`, {
-                method: 'POST', body: JSON.stringify({
-                    url, format: selectedFormat,
-                    enable_segmenter: options.segmenter, enable_dubber: options.dubber
-                }), headers: { 'Content-Type': 'application/json' }
+                method: 'POST', body, headers: { 'Content-Type': 'application/json' }
             });
-            clearInterval(timer);
-
             const contentType = res.headers.get("content-type");
             if (contentType && contentType.includes("application/json")) {
                 const result = await res.json();
                 if (!result.success) throw new Error(result.error);
-                setProgress(100); setFiles(result.files);
-                setTimeout(() => setScreen('results'), 800);
-            } else {
-                const blob = await res.blob();
-                const downloadUrl = window.URL.createObjectURL(blob);
+                return result;
+            }
+            if (!res.ok) throw new Error(`Server returned ${res.status}`);
+            const name = /filename="([^"]+)"/.exec(res.headers.get("content-disposition") || '');
+            return {
+                vercel: true,
+                download_url: window.URL.createObjectURL(await res.blob()),
+                download_name: name ? name[1] : null
+            };
+        } finally { clearInterval(timer); }
+    };
+
+    const startDownload = async () => {
+        setScreen('processing'); setProgress(0);
+        const body = JSON.stringify({
+            url, format: selectedFormat,
+            enable_segmenter: options.segmenter, enable_dubber: options.dubber
+        });
+
+        try {
+            const result = await (window.BACKGROUND_JOBS === false ? runInRequest(body) : runJob(body));
+
+            if (result.vercel) {
                 const a = document.createElement('a');
-                a.href = downloadUrl;
-                a.download = "Media_Toolkit_Video.mp4";
+                a.href = result.download_url;
+                a.download = result.download_name || "Media_Toolkit_Video.mp4";
                 document.body.appendChild(a);
                 a.click();
                 a.remove();
                 setProgress(100);
                 setFiles({ vercel: true });
                 setTimeout(() => setScreen('results'), 800);
+            } else {
+                setProgress(100); setFiles(result.files);
+                setTimeout(() => setScreen('results'), 800);
             }
-        } catch (err) { clearInterval(timer); setError(err.message); setScreen('preview'); }
+        } catch (err) { setError(err.message); setScreen('preview'); }
     };
 
     const reset = () => {
@@ -210,7 +248,12 @@ function App() {
                         <>
                             <h2 style={{ color: '#10b981' }}>Saved to Desktop!</h2>
                             <div className="file-list">
-                                {files.map((f, i) => <div className="file-item" key={i}>📄 {f.filename}</div>)}
+                                {files.map((f, i) => (
+                                    <div className="file-item" key={i}>
+                                        {f.thumbnail && <img src={`${API_Base}/download_file?file=${encodeURIComponent(f.thumbnail)}`} className="file-thumb" />}
+                                        📄 {f.filename}
+                                    </div>
+                                ))}
                             </div>
                         </>
                     )}
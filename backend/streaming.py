@@ -0,0 +1,201 @@
+"""
+Media Streaming Module
+Pipes source media through ffmpeg into fragmented MP4 on stdout
+Lets the web layer send the first bytes before the source is fully fetched
+"""
+
+import sys
+import subprocess
+import threading
+import logging
+from collections import deque
+
+from ffmpeg_utils import get_ffmpeg_exe, probe_duration, FFmpegError
+from metadata_cache import EXTRACT_OPTS
+
+logger = logging.getLogger(__name__)
+
+# Fragmented MP4 can be written to a non-seekable pipe
+FMP4_FLAGS = 'frag_keyframe+empty_moov+default_base_moof'
+
+
+def ytdlp_cli_args(opts=EXTRACT_OPTS):
+    """
+    Command line equivalent of the network options the app gives yt-dlp
+
+    Args:
+        opts (dict): yt-dlp options (player clients, user agent, retries, ...)
+
+    Returns:
+        list: yt-dlp command line arguments
+    """
+    args = []
+    for extractor, params in (opts.get('extractor_args') or {}).items():
+        values = ';'.join(f"{k}={','.join(v)}" for k, v in params.items())
+        args += ['--extractor-args', f'{extractor}:{values}']
+    if opts.get('user_agent'):
+        args += ['--user-agent', opts['user_agent']]
+    if opts.get('source_address'):
+        args += ['--source-address', opts['source_address']]
+    if opts.get('retries') is not None:
+        args += ['--retries', str(opts['retries'])]
+    if opts.get('socket_timeout') is not None:
+        args += ['--socket-timeout', str(opts['socket_timeout'])]
+    if opts.get('nocheckcertificate'):
+        args.append('--no-check-certificates')
+    return args
+
+
+class MediaStreamer:
+    """Builds download -> ffmpeg -> HTTP streaming pipelines"""
+
+    def __init__(self, metadata_cache, chunk_size=64 * 1024):
+        """
+        Initialize streamer
+
+        Args:
+            metadata_cache (MetadataCache): Resolves formats and direct URLs
+            chunk_size (int): Bytes per yielded response chunk
+        """
+        self.metadata_cache = metadata_cache
+        self.chunk_size = chunk_size
+
+    def stream(self, url, fmt_str, end=None, dub_audio_path=None, on_close=None):
+        """
+        Generate fragmented MP4 bytes for a URL
+
+        Direct HTTP formats are read by ffmpeg itself (ranged, seekable);
+        anything else (HLS, DASH manifests, ...) is fetched by a yt-dlp
+        subprocess writing to ffmpeg's stdin. Video is always stream
+        copied; audio is copied unless a dub track replaces it.
+
+        Args:
+            url (str): Media page URL
+            fmt_str (str): yt-dlp format selector
+            end (float): Stop after this many seconds (trim)
+            dub_audio_path (str): Replacement audio track, padded with silence
+            on_close (callable): Called once the stream ends or is aborted
+
+        Returns:
+            generator: Output chunks; the first is read before returning,
+            so a source or ffmpeg that fails at once raises FFmpegError here
+            rather than after the response status is sent
+
+        Raises:
+            FFmpegError: ffmpeg produced no output and failed
+        """
+        source = None
+        try:
+            info = self.metadata_cache.resolve(url, {'format': fmt_str})
+            formats = info.get('requested_formats') or [info]
+            direct = all(f.get('url') and f.get('protocol', 'https') in ('http', 'https') for f in formats)
+
+            cmd = [get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-loglevel', 'error']
+            if direct:
+                for f in formats:
+                    headers = f.get('http_headers') or {}
+                    if headers:
+                        cmd += ['-headers', ''.join(f'{k}: {v}\r\n' for k, v in headers.items())]
+                    cmd += ['-i', f['url']]
+                media_inputs = len(formats)
+            else:
+                # Pin the already-resolved format so yt-dlp picks the same one,
+                # fetched with the same clients and headers it was resolved with
+                source = subprocess.Popen(
+                    [sys.executable, '-m', 'yt_dlp', '-q', '--no-part', '--no-warnings',
+                     '--ffmpeg-location', get_ffmpeg_exe(), *ytdlp_cli_args(),
+                     '-f', info.get('format_id') or fmt_str, '-o', '-', url],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+                )
+                cmd += ['-i', 'pipe:0']
+                media_inputs = 1
+
+            limit = end
+            if dub_audio_path:
+                cmd += ['-i', dub_audio_path]
+                cmd += ['-map', '0:v:0', '-map', f'{media_inputs}:a:0', '-c:a', 'aac']
+                # apad never ends on its own, so padding needs a known length;
+                # -shortest does not stop a padded track against copied video
+                limit = end or info.get('duration')
+                if not limit and direct:
+                    limit = self._probe(formats[0])
+                cmd += ['-af', 'apad'] if limit else ['-shortest']
+            else:
+                cmd += ['-map', '0:v:0', '-map', f'{media_inputs - 1}:a:0?', '-c:a', 'copy']
+            cmd += ['-c:v', 'copy']
+            if limit:
+                cmd += ['-t', f'{limit:.3f}']
+            cmd += ['-movflags', FMP4_FLAGS, '-f', 'mp4', 'pipe:1']
+        except BaseException:
+            # Until _pump owns them, the source and the caller's resources are ours to release
+            self._close(None, source, on_close)
+            raise
+
+        return self._pump(cmd, source, on_close)
+
+    @staticmethod
+    def _probe(fmt):
+        # Generic extractors often omit the duration; ask ffmpeg instead
+        try:
+            return probe_duration(fmt['url'])
+        except FFmpegError:
+            return None
+
+    def _pump(self, cmd, source, on_close):
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                stdin=source.stdout if source else subprocess.DEVNULL,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+        except BaseException:
+            self._close(None, source, on_close)
+            raise
+        if source:
+            source.stdout.close()  # ffmpeg owns the read end now
+
+        errors = deque(maxlen=20)
+        drain = threading.Thread(target=lambda: errors.extend(proc.stderr), daemon=True)
+        drain.start()
+
+        try:
+            first = proc.stdout.read(self.chunk_size)
+            if not first:
+                self._check(proc, drain, errors)
+        except BaseException:
+            self._close(proc, source, on_close)
+            raise
+        return self._chunks(first, proc, source, drain, errors, on_close)
+
+    def _chunks(self, chunk, proc, source, drain, errors, on_close):
+        try:
+            while chunk:
+                yield chunk
+                chunk = proc.stdout.read(self.chunk_size)
+            # Raising mid-response aborts the chunked body, so the client
+            # sees a broken transfer instead of a short file ending cleanly
+            self._check(proc, drain, errors)
+        finally:
+            # Client disconnects land here too: stop both processes
+            self._close(proc, source, on_close)
+
+    @staticmethod
+    def _check(proc, drain, errors):
+        if proc.wait() != 0:
+            drain.join(timeout=1)
+            message = b''.join(errors).decode('utf-8', 'replace').strip()
+            logger.error(f"Streaming ffmpeg failed: {message}")
+            raise FFmpegError(message or f'ffmpeg exited with status {proc.returncode}')
+
+    @staticmethod
+    def _close(proc, source, on_close):
+        for p in (proc, source):
+            if p and p.poll() is None:
+                p.kill()
+            if p:
+                p.wait()
+        for pipe in (proc and proc.stdout, source and source.stdout):
+            if pipe:
+                pipe.close()
+        if on_close:
+            on_close()
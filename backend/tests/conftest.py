@@ -0,0 +1,195 @@
+"""
+Test Fixtures
+Synthetic media generated with the bundled ffmpeg, shared by the backend tests
+Everything runs offline: inputs are made once per test session, URLs point at localhost
+"""
+
+import os
+import re
+import sys
+import socket
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path: sys.path.insert(0, BACKEND_DIR)
+
+from ffmpeg_utils import run_ffmpeg
+
+FRAME_RATE = 25
+SEND_BUFFER = 64 * 1024   # Bytes the test server's kernel may queue per connection
+
+
+@pytest.fixture(scope='session')
+def make_video(tmp_path_factory):
+    """
+    Factory for synthetic H.264 + AAC clips (testsrc2 pattern, 440 Hz tone)
+
+    ``make_video(seconds, gop=50, bitrate=None)`` returns the path of a
+    faststart MP4 with a keyframe exactly every ``gop`` frames (``bitrate``
+    such as '3M' pads it to a realistic size); identical requests share
+    one file.
+    """
+    root = tmp_path_factory.mktemp('media')
+    made = {}
+
+    def make(seconds, gop=50, size='320x240', bitrate=None):
+        key = (seconds, gop, size, bitrate)
+        if key not in made:
+            path = str(root / f'clip_{seconds}s_gop{gop}_{size}_{bitrate or "crf"}.mp4')
+            run_ffmpeg([
+                '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate={FRAME_RATE}:duration={seconds}',
+                '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+                '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+                '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0',
+                *(['-b:v', bitrate, '-maxrate', bitrate, '-bufsize', bitrate] if bitrate else []),
+                '-c:a', 'aac', '-movflags', '+faststart', path
+            ])
+            made[key] = path
+        return made[key]
+
+    return make
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Keep-alive static files with single byte ranges (like a CDN); counts body bytes sent"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Small socket buffers, so bytes sent track what the client actually reads
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        self._remaining = None  # Keep-alive connections reuse the handler
+        match = re.match(r'bytes=(\d*)-(\d*)$', self.headers.get('Range', ''))
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        first, last = match.groups()
+        start = int(first) if first else max(size - int(last or 0), 0)
+        end = min(int(last), size - 1) if first and last else size - 1
+        if start >= size:
+            self.send_error(416)
+            return None
+        f = open(path, 'rb')
+        f.seek(start)
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Last-Modified', self.date_time_string(int(os.path.getmtime(path))))
+        self.end_headers()
+        self._remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = self._remaining if self._remaining is not None else float('inf')
+        while remaining > 0:
+            chunk = source.read(int(min(64 * 1024, remaining)))
+            if not chunk:
+                break
+            self.send_chunk(outputfile, chunk)
+            remaining -= len(chunk)
+
+    def send_chunk(self, outputfile, chunk):
+        """Write part of a body; subclasses throttle or drop here"""
+        outputfile.write(chunk)
+        with self.server.lock:
+            self.server.bytes_sent += len(chunk)
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Clients (ffmpeg) hang up mid-body once they have their range; not an error"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def serve_directory(directory, handler=RangeHandler):
+    """
+    Serve a directory on a free localhost port in a daemon thread
+
+    Also used by ``benchmark.py`` for its download stage.
+
+    Args:
+        directory (str): Folder to serve
+        handler (type): Request handler class (a ``RangeHandler``)
+
+    Returns:
+        QuietHTTPServer: The running server; ``server.url`` is its base
+        URL and ``server.bytes_sent`` counts response body bytes
+    """
+    server = QuietHTTPServer(('127.0.0.1', 0), partial(handler, directory=str(directory)))
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    server.bytes_sent = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def http_server():
+    """
+    Factory serving a directory on a free localhost port
+
+    ``http_server(directory, handler=RangeHandler)`` returns the running
+    server (see ``serve_directory``). Servers stop at the end of the test.
+    """
+    servers = []
+
+    def serve(directory, handler=RangeHandler):
+        server = serve_directory(directory, handler)
+        servers.append(server)
+        return server
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def private_app(tmp_path, monkeypatch):
+    """
+    Factory for the web app module with every folder and cache under ``tmp_path``
+
+    ``private_app(vercel=False, fast_root=None)`` returns the ``app``
+    module with its workspaces, caches and result store replaced (and TTS
+    stubbed); the originals come back after the test.
+    """
+    # VERCEL=1 points the module defaults at /tmp; all of them are replaced below
+    monkeypatch.setenv('VERCEL', '1')
+    import app as web
+    from download_cache import DownloadCache
+    from result_store import ResultStore
+    from tts_backends import StubBackend
+    from tts_cache import TTSCache
+    from workspace import WorkspaceManager
+
+    def make(vercel=False, fast_root=None):
+        temp_dir = str(tmp_path / 'temp')
+        monkeypatch.setattr(web, 'IS_VERCEL', vercel)
+        monkeypatch.setattr(web, 'BACKGROUND_JOBS', not vercel)
+        monkeypatch.setattr(web, 'TEMP_DIR', temp_dir)
+        monkeypatch.setattr(web, 'DOWNLOAD_FOLDER', str(tmp_path / 'downloads'))
+        monkeypatch.setattr(web, 'workspaces', WorkspaceManager(temp_dir, fast_root=fast_root, fast_reserve=0))
+        monkeypatch.setattr(web, 'download_cache', DownloadCache(str(tmp_path / 'cache')))
+        monkeypatch.setattr(web, 'tts_cache', TTSCache(str(tmp_path / 'tts')))
+        monkeypatch.setattr(web, 'tts_backend', StubBackend())
+        monkeypatch.setattr(web, 'result_store', ResultStore(str(tmp_path / 'results')))
+        return web
+
+    return make
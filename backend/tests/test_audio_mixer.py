@@ -0,0 +1,111 @@
+"""
+Audio Mixer Tests
+A 220 Hz voice mixed over a 1 kHz original: ducking depth, recovery, memory and speed
+Also the remux path, which copies the video and writes the mix straight into ffmpeg
+"""
+
+import shutil
+import tracemalloc
+import wave
+
+import numpy as np
+import pytest
+
+import audio_mixer
+from audio_mixer import DUCK_DB, DubMixer
+from ffmpeg_utils import probe_duration, probe_video_size, run_ffmpeg
+
+SECONDS = (30, 300)         # Original lengths; memory must not grow with them
+VOICE = (2.0, 5.0)          # Voice tone from / to (seconds)
+VOICE_RATE = 24000
+MIN_REALTIME = 10           # Required mixing speed, in multiples of real time
+
+
+@pytest.fixture(scope='module')
+def voice(tmp_path_factory):
+    """WAV of silence, then a 220 Hz tone from ``VOICE[0]`` to ``VOICE[1]``"""
+    path = str(tmp_path_factory.mktemp('voice') / 'voice.wav')
+    t = np.arange(int(VOICE[1] * VOICE_RATE)) / VOICE_RATE
+    tone = np.where(t >= VOICE[0], 0.3 * np.sin(2 * np.pi * 220 * t), 0.0)
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(VOICE_RATE)
+        f.writeframes((tone * 32767).astype('<i2').tobytes())
+    return path
+
+
+@pytest.fixture(scope='module')
+def originals(tmp_path_factory):
+    """1 kHz MP3s of every length in ``SECONDS``"""
+    root = tmp_path_factory.mktemp('originals')
+    paths = {}
+    for seconds in SECONDS:
+        paths[seconds] = str(root / f'tone_{seconds}s.mp3')
+        run_ffmpeg(['-f', 'lavfi', '-i', f'sine=frequency=1000:duration={seconds}:sample_rate=48000',
+                    '-c:a', 'libmp3lame', '-b:a', '128k', paths[seconds]])
+    return paths
+
+
+def _tone_level(samples, rate, frequency, start, end):
+    """Amplitude (dB) of one frequency in a stretch of mono samples"""
+    chunk = samples[int(start * rate):int(end * rate)]
+    window = np.hanning(len(chunk))
+    spectrum = np.abs(np.fft.rfft(chunk * window)) * 2 / window.sum()
+    return 20 * np.log10(spectrum[int(round(frequency * len(chunk) / rate))] + 1e-12)
+
+
+def test_original_is_ducked_under_the_voice_and_recovers(originals, voice, tmp_path):
+    output = str(tmp_path / 'mixed.wav')
+    DubMixer().mix_to_wav(originals[SECONDS[0]], voice, output)
+
+    with wave.open(output, 'rb') as f:
+        rate = f.getframerate()
+        mixed = np.frombuffer(f.readframes(int(10 * rate)), dtype='<i2')
+    mono = mixed.reshape(-1, 2).mean(axis=1) / 32768
+    before = _tone_level(mono, rate, 1000, 0.5, 1.5)
+    under = _tone_level(mono, rate, 1000, VOICE[0] + 0.5, VOICE[1] - 0.5)
+    after = _tone_level(mono, rate, 1000, VOICE[1] + 2.0, VOICE[1] + 3.0)
+
+    assert under - before == pytest.approx(DUCK_DB, abs=1.5)
+    assert after - before == pytest.approx(0, abs=0.5)
+    assert _tone_level(mono, rate, 220, VOICE[0] + 0.5, VOICE[1] - 0.5) > before - 20
+
+
+def test_memory_stays_flat_and_mixing_outruns_real_time(originals, voice, tmp_path):
+    peaks = []
+    for seconds in SECONDS:
+        tracemalloc.start()
+        try:
+            result = DubMixer().mix_to_wav(originals[seconds], voice, str(tmp_path / f'mixed_{seconds}.wav'))
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024 ** 2)
+        finally:
+            tracemalloc.stop()
+        assert result['realtime_factor'] >= MIN_REALTIME
+
+    assert peaks[-1] <= peaks[0] * 1.5 + 1
+
+
+def test_mix_into_video_copies_the_video_and_reports_progress(make_video, voice, tmp_path):
+    video = str(tmp_path / 'clip.mp4')
+    shutil.copy(make_video(8), video)
+    output = str(tmp_path / 'dubbed.mp4')
+    progress = []
+
+    DubMixer().mix_into_video(video, voice, output, end=6, on_progress=progress.append)
+
+    assert probe_duration(output) == pytest.approx(6, abs=0.1)
+    assert progress == sorted(progress) and progress[-1] == 1.0
+    assert probe_video_size(output) == probe_video_size(video)
+
+
+def test_mix_into_video_without_a_duration_skips_progress(make_video, voice, tmp_path, monkeypatch):
+    video = str(tmp_path / 'clip.mp4')
+    shutil.copy(make_video(8), video)
+    monkeypatch.setattr(audio_mixer, 'probe_duration', lambda path: 0.0)
+    progress = []
+
+    result = DubMixer().mix_into_video(video, voice, str(tmp_path / 'dubbed.mp4'), on_progress=progress.append)
+
+    assert result['seconds'] == 0
+    assert progress == []
@@ -0,0 +1,77 @@
+"""
+Audio Split Tests
+Decode-free segmenting of CBR/VBR MP3 (whole frames) and AAC (stream copy)
+Segments must match the requested boundaries and keep the source frames intact
+"""
+
+import os
+import shutil
+
+import pytest
+
+from ffmpeg_utils import probe_duration, run_ffmpeg
+from mp3_frames import MP3File
+from segmenter import MediaSegmenter
+
+SECONDS = 65
+SEGMENT = 20
+EXPECTED = [20, 20, 20, 5]
+
+# (file name, ffmpeg encoder args)
+INPUTS = [
+    ('cbr.mp3', ['-c:a', 'libmp3lame', '-b:a', '128k', '-metadata', 'title=test']),
+    ('vbr.mp3', ['-c:a', 'libmp3lame', '-q:a', '4']),
+    ('aac.m4a', ['-c:a', 'aac']),
+]
+
+
+@pytest.fixture(scope='module')
+def sources(tmp_path_factory):
+    """Tone plus noise in every input format, made once for the module"""
+    root = tmp_path_factory.mktemp('audio')
+    paths = {}
+    for name, codec in INPUTS:
+        paths[name] = str(root / name)
+        run_ffmpeg(['-f', 'lavfi', '-i', f'sine=frequency=440:duration={SECONDS}',
+                    '-f', 'lavfi', '-i', f'anoisesrc=duration={SECONDS}:amplitude=0.1',
+                    '-filter_complex', 'amix', *codec, paths[name]])
+    return paths
+
+
+def _split(sources, tmp_path, name):
+    shutil.copyfile(sources[name], tmp_path / name)
+    result = MediaSegmenter(str(tmp_path), max_segments=None).segment(
+        name, name.replace('.', '_'), segment_duration=SEGMENT)
+    assert result['success'], result.get('error')
+    return result, [str(tmp_path / segment) for segment in result['segments']]
+
+
+def _frames(path):
+    """Concatenated MPEG frames of an MP3 (tags and Xing header left out)"""
+    with MP3File(path) as mp3:
+        return b''.join(mp3.data[offset:offset + header.length] for offset, header in mp3.frames())
+
+
+@pytest.mark.parametrize('name', ['cbr.mp3', 'vbr.mp3'])
+def test_mp3_segments_are_whole_source_frames(sources, tmp_path, name):
+    result, paths = _split(sources, tmp_path, name)
+
+    assert result['method'] == 'frames'
+    assert b''.join(_frames(path) for path in paths) == _frames(sources[name])
+
+    with MP3File(sources[name]) as mp3:
+        frame = max(header.seconds for _, header in mp3.frames())
+    durations = []
+    for path in paths:
+        with MP3File(path) as segment:
+            durations.append(segment.duration())
+    # Encoder padding lengthens the last segment by up to two frames
+    assert durations == pytest.approx(EXPECTED, abs=2 * frame)
+
+
+def test_aac_segments_are_stream_copied_to_length(sources, tmp_path):
+    result, paths = _split(sources, tmp_path, 'aac.m4a')
+
+    assert result['method'] == 'remux'
+    assert [probe_duration(path) for path in paths] == pytest.approx(EXPECTED, abs=0.05)
+    assert all(os.path.getsize(path) for path in paths)
@@ -0,0 +1,106 @@
+"""
+Batch Tests
+Playlist expansion, the per-batch item cap and the job stages a batch reports
+Metadata comes from an in-memory stand-in, so nothing is fetched
+"""
+
+import pytest
+
+from batch import BatchProcessor
+
+PLAYLIST = 'https://example.com/playlist'
+
+
+class FakeMetadata:
+    """``resolve`` answers for one playlist of five videos (one listed twice)"""
+
+    def __init__(self, events=None):
+        self.events = events if events is not None else []
+
+    def resolve(self, url, options=None):
+        self.events.append(('resolve', url))
+        if url == PLAYLIST:
+            ids = ['a', 'b', 'a', 'c', 'd', 'e']
+            return {'_type': 'playlist', 'entries': [
+                {'id': i, 'ie_key': 'Fake', 'url': f'https://example.com/{i}', 'title': i.upper()} for i in ids]}
+        return {'id': url.rsplit('/', 1)[1], 'extractor_key': 'Fake', 'webpage_url': url}
+
+
+class RecordingJob:
+    """Job stand-in keeping the stages and updates it was given, in order"""
+
+    def __init__(self, events=None):
+        self.events = events if events is not None else []
+
+    def set_stage(self, stage, start, end, message=None):
+        self.events.append(('stage', stage))
+
+    def update(self, fraction, message=None):
+        self.events.append(('update', fraction))
+
+
+def _processor(events, max_items=50):
+    def process(url):
+        events.append(('process', url))
+        return {'url': url}
+    return BatchProcessor(process, FakeMetadata(), max_workers=1, rate=1000, burst=1000, max_items=max_items)
+
+
+def test_expansion_dedupes_caps_and_reports_before_processing():
+    events = []
+    manifest = _processor(events, max_items=3).run(
+        [PLAYLIST, 'https://example.com/a'],
+        on_expanded=lambda total, duplicates: events.append(('expanded', total, duplicates)))
+
+    assert events[0] == ('expanded', 3, 1)
+    assert [url for _, url in events[1:]] == [f'https://example.com/{i}' for i in 'abc']
+    assert (manifest['total'], manifest['succeeded'], manifest['duplicates']) == (3, 3, 1)
+
+
+@pytest.fixture
+def web(private_app, monkeypatch):
+    """The app with BatchProcessor replaced by one recording its cap and metadata lookups"""
+    web = private_app()
+    caps = []
+    events = []
+
+    class Recorder(BatchProcessor):
+        def __init__(self, process_fn, metadata_cache, **options):
+            caps.append(options['max_items'])
+            super().__init__(process_fn, FakeMetadata(events), **dict(options, rate=1000, burst=1000))
+
+    monkeypatch.setattr(web, 'BatchProcessor', Recorder)
+    monkeypatch.setattr(web, 'run_pipeline', lambda data: {'success': True, 'url': data['url']})
+    monkeypatch.setattr(web, '_publish_result', lambda result, job: result)
+    monkeypatch.setenv('BATCH_MAX_ITEMS', '4')
+    web.caps, web.events = caps, events
+    return web
+
+
+@pytest.mark.parametrize('limit, cap', [(None, 4), (2, 2), (1000, 4)])
+def test_request_limit_only_lowers_the_server_cap(web, limit, cap):
+    data = {'urls': [PLAYLIST]}
+    if limit:
+        data['limit'] = limit
+    manifest = web._process_batch(data, RecordingJob())
+
+    assert web.caps == [cap]
+    assert manifest['total'] == min(cap, 5)
+
+
+def test_batch_stage_starts_after_expansion(web):
+    web._process_batch({'urls': [PLAYLIST]}, RecordingJob(web.events))
+
+    kinds = [event[0] for event in web.events]
+    assert web.events[0] == ('stage', 'expand')
+    assert kinds[1] == 'resolve'
+    assert web.events[2] == ('stage', 'batch')
+    assert set(kinds[3:]) == {'update'}
+
+
+@pytest.mark.parametrize('limit', [0, -3, 'ten', 2.5, True])
+def test_invalid_limit_is_rejected(web, limit):
+    response = web.app.test_client().post('/api/batch', json={'urls': [PLAYLIST], 'limit': limit})
+
+    assert response.status_code == 400
+    assert 'limit' in response.get_json()['error']
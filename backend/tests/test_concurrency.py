@@ -0,0 +1,47 @@
+"""
+Concurrency Tests
+Simultaneous pipeline runs through the app, each in its own workspace
+Outputs must be distinct and complete, and nothing may outlive its release
+"""
+
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ffmpeg_utils import probe_duration
+
+JOBS = 8
+CLIP_SECONDS = 40   # Longer than one segment
+VARIANTS = [{}, {'enable_dubber': True}, {'enable_segmenter': True},
+            {'enable_dubber': True, 'enable_segmenter': True}]
+
+
+@pytest.fixture
+def url(tmp_path, make_video, http_server):
+    served = tmp_path / 'served'
+    served.mkdir()
+    shutil.copy(make_video(CLIP_SECONDS), served / 'clip.mp4')
+    return f'{http_server(served).url}/clip.mp4'
+
+
+def test_concurrent_runs_stay_isolated(private_app, url, tmp_path):
+    # Vercel-style delivery keeps each output in its workspace until released
+    web = private_app(vercel=True, fast_root=str(tmp_path / 'fast'))
+    requests = [dict(VARIANTS[i % len(VARIANTS)], url=url, format='best') for i in range(JOBS)]
+
+    with ThreadPoolExecutor(max_workers=JOBS) as pool:
+        results = list(pool.map(web.run_pipeline, requests))
+
+    paths = [result['path'] for result in results]
+    assert len(set(paths)) == JOBS
+    for data, result in zip(requests, results):
+        expected = web.SEGMENT_SECONDS if data.get('enable_segmenter') else CLIP_SECONDS
+        assert probe_duration(result['path']) == pytest.approx(expected, abs=1.0), sorted(data)
+        result['workspace'].release()
+        assert not os.path.exists(result['path'])
+
+    assert web.workspaces.snapshot()['active'] == 0
+    for root in (web.workspaces.root, web.workspaces.fast_root):
+        assert not os.path.isdir(root) or os.listdir(root) == []
@@ -0,0 +1,127 @@
+"""
+Download Cache Tests
+Partial (time window) downloads against a local range-capable HTTP server,
+and the index shared by worker processes using one cache directory
+"""
+
+import os
+import shutil
+
+import pytest
+
+import download_cache
+from download_cache import KEYFRAME_PADDING, DownloadCache, _download_section, section_window
+from ffmpeg_utils import probe_duration
+
+CLIP_SECONDS = 60
+CLIP_BITRATE = '3M'   # About 10 MB, so socket buffers are noise next to a window
+GOP_SECONDS = 2      # Stream copies start on the keyframe before the window
+
+
+@pytest.fixture
+def source(tmp_path, make_video, http_server):
+    """Info dict of a direct HTTP format served from localhost, and its server"""
+    served = tmp_path / 'served'
+    served.mkdir()
+    shutil.copy(make_video(CLIP_SECONDS, bitrate=CLIP_BITRATE), served / 'clip.mp4')
+    server = http_server(served)
+    info = {
+        'id': 'clip', 'ext': 'mp4', 'protocol': 'http', 'duration': CLIP_SECONDS,
+        'url': f'{server.url}/clip.mp4', 'filesize': os.path.getsize(served / 'clip.mp4'),
+    }
+    return info, server
+
+
+@pytest.fixture(autouse=True)
+def bundled_ffmpeg(monkeypatch):
+    # Always take the ffmpeg-on-URL path, whatever is on PATH
+    external = download_cache.lazy_import('yt_dlp.downloader.external')
+    monkeypatch.setattr(external.FFmpegFD, 'available', classmethod(lambda cls, path=None: False))
+
+
+def _fetch(source, tmp_path, start, end):
+    """Download a window; returns (bytes transferred, output duration)"""
+    info, server = source
+    window = section_window(info, start, end)
+    server.bytes_sent = 0
+    path = _download_section(info, {}, str(tmp_path / f'section_{start}_{end}'), *window)
+    return server.bytes_sent, probe_duration(path)
+
+
+def test_section_window_pads_and_clamps():
+    info = {'duration': CLIP_SECONDS}
+
+    assert section_window(info, None, None) is None
+    assert section_window(info, 20, 25) == (20 - KEYFRAME_PADDING, 25 + KEYFRAME_PADDING)
+    assert section_window(info, 2, 25) == (0, 25 + KEYFRAME_PADDING)
+    # Reaching the end of the media: no end limit
+    assert section_window(info, 20, CLIP_SECONDS - 1) == (20 - KEYFRAME_PADDING, None)
+    assert section_window(info, 0, CLIP_SECONDS) is None
+    assert section_window({}, 20, None) == (20 - KEYFRAME_PADDING, None)
+
+
+def test_bytes_transferred_scale_with_the_window(source, tmp_path):
+    info, _ = source
+    size = info['filesize']
+
+    short_bytes, short_duration = _fetch(source, tmp_path, 20, 25)      # 15 s fetched
+    long_bytes, long_duration = _fetch(source, tmp_path, 10, 45)        # 45 s fetched
+
+    assert short_duration == pytest.approx(15, abs=GOP_SECONDS)
+    assert long_duration == pytest.approx(45, abs=GOP_SECONDS)
+    # A quarter of the file, plus the index and read-ahead of the first request
+    assert short_bytes < 0.5 * size
+    assert long_bytes < size
+    # 30 s more is half the file more; the fixed overhead cancels out
+    assert (long_bytes - short_bytes) / size == pytest.approx(0.5, abs=0.15)
+
+
+def test_window_at_the_start_reads_only_a_prefix(source, tmp_path):
+    info, _ = source
+
+    sent, duration = _fetch(source, tmp_path, 0, 5)     # 10 s fetched
+
+    assert duration == pytest.approx(10, abs=GOP_SECONDS)
+    assert sent < 0.3 * info['filesize']
+
+
+def _producer(size):
+    def produce(partial_base):
+        with open(partial_base + '.mp4', 'wb') as f:
+            f.write(os.urandom(size))
+        return partial_base + '.mp4'
+    return produce
+
+
+def test_workers_sharing_a_directory_keep_each_others_entries(tmp_path):
+    # One instance per worker process, all loaded before anything is stored
+    first, second = DownloadCache(str(tmp_path)), DownloadCache(str(tmp_path))
+    first.fetch('a', _producer(100))
+    second.fetch('b', _producer(100))
+
+    assert second.lookup('a')
+    assert set(DownloadCache(str(tmp_path))._index) == {'a', 'b'}
+
+
+def test_budget_counts_entries_of_every_worker(tmp_path):
+    first, second = DownloadCache(str(tmp_path), max_bytes=250), DownloadCache(str(tmp_path), max_bytes=250)
+    first.fetch('a', _producer(100))
+    second.fetch('b', _producer(100))
+    first.fetch('c', _producer(100))
+
+    assert set(DownloadCache(str(tmp_path))._index) == {'b', 'c'}
+    assert not second.lookup('a')
+
+
+def test_hits_do_not_rewrite_the_index_each_time(tmp_path, monkeypatch):
+    cache = DownloadCache(str(tmp_path))
+    cache.fetch('a', _producer(100))
+    written = os.stat(cache.index_path).st_ino
+
+    for _ in range(5):
+        assert cache.lookup('a')
+    assert os.stat(cache.index_path).st_ino == written
+
+    monkeypatch.setattr(download_cache, 'INDEX_FLUSH_SECONDS', 0)
+    cache.lookup('a')
+    assert os.stat(cache.index_path).st_ino != written
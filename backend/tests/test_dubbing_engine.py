@@ -0,0 +1,119 @@
+"""
+Dubbing Engine Tests
+Sentence splitting, SRT parsing and windowing, and timelines rendered with the stub backend
+The stub sleeps like a network TTS service, so synthesis must run concurrently
+"""
+
+import wave
+
+import numpy as np
+import pytest
+
+from dubbing_engine import (MAX_SENTENCE_CHARS, SENTENCE_GAP, Cue, DubbingEngine, parse_cues, parse_srt,
+                            split_sentences, window_cues)
+from tts_backends import StubBackend
+from tts_cache import TTSCache
+
+LATENCY = 0.3               # Stub seconds per request
+PER_CHAR = 0.005            # Stub seconds per character
+ONSET_TOLERANCE = 0.005
+
+SRT = """1
+00:00:01,000 --> 00:00:03,000
+Welcome back.
+
+2
+00:00:04,500 --> 00:00:06,000
+<i>This line starts at four and a half seconds.</i> A second sentence follows it.
+
+3
+00:00:12,250 --> 00:00:14,000
+And the last one.
+"""
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return DubbingEngine(StubBackend(LATENCY, PER_CHAR), TTSCache(str(tmp_path / 'tts')))
+
+
+def _samples(path):
+    with wave.open(path, 'rb') as f:
+        return f.getframerate(), np.frombuffer(f.readframes(f.getnframes()), dtype='<i2')
+
+
+def test_split_sentences_keeps_sentences_and_splits_long_ones():
+    assert split_sentences('  One.  Two?\nThree! "Four." Five') == ['One.', 'Two?', 'Three!', '"Four."', 'Five']
+
+    clause = 'word ' * 30
+    long = f'{clause.strip()}, {clause.strip()}; {clause.strip()}.'
+    parts = split_sentences(long)
+    assert len(parts) > 1
+    assert all(len(part) <= MAX_SENTENCE_CHARS for part in parts)
+    assert ' '.join(parts) == long
+
+
+def test_parse_srt_times_the_first_sentence_of_each_cue():
+    cues = parse_srt(SRT.replace('\n', '\r\n'))
+
+    assert cues == [
+        Cue(1.0, 3.0, 'Welcome back.'),
+        Cue(4.5, 6.0, 'This line starts at four and a half seconds.'),
+        Cue(None, None, 'A second sentence follows it.'),
+        Cue(12.25, 14.0, 'And the last one.'),
+    ]
+    assert parse_cues(SRT) == parse_srt(SRT)
+    assert parse_cues('Just a script. Untimed.') == [Cue(None, None, 'Just a script.'), Cue(None, None, 'Untimed.')]
+
+
+def test_window_cues_retimes_the_cues_starting_inside():
+    cues = parse_srt(SRT)
+
+    assert window_cues(cues, 0, 4) == [Cue(1.0, 3.0, 'Welcome back.')]
+    # Untimed sentences go with the timed cue before them
+    assert window_cues(cues, 4, 10) == [Cue(0.5, 2.0, 'This line starts at four and a half seconds.'),
+                                        Cue(None, None, 'A second sentence follows it.')]
+    assert window_cues(cues, 10, 20) == [Cue(2.25, 4.0, 'And the last one.')]
+    script = parse_cues('Spoken everywhere.')
+    assert window_cues(script, 10, 20) == script
+
+
+def test_script_sentences_are_synthesized_concurrently(engine, tmp_path):
+    cues = parse_cues(' '.join(f'Sentence number {i} of the script, '
+                               f'which runs {"a little " * (i % 5)}longer each time.' for i in range(24)))
+    serial = sum(LATENCY + PER_CHAR * len(cue.text) for cue in cues)
+
+    result = engine.render(cues, str(tmp_path / 'script.wav'))
+
+    assert result['synth_seconds'] < serial / 2
+    # Untimed sentences follow each other a gap apart
+    for (_, end, _), (start, _, _) in zip(result['placements'], result['placements'][1:]):
+        assert start == pytest.approx(end + SENTENCE_GAP, abs=0.001)
+
+
+def test_srt_sentences_start_at_their_cue_times(engine, tmp_path):
+    cues = parse_srt(SRT)
+    path = str(tmp_path / 'srt.wav')
+
+    result = engine.render(cues, path, duration=15.0)
+
+    rate, samples = _samples(path)
+    assert len(samples) / rate == pytest.approx(15.0, abs=0.001)
+    for cue, (start, _, _) in zip(cues, result['placements']):
+        if cue.start is None:
+            continue
+        onset = np.flatnonzero(samples[int(start * rate):])[0]
+        assert start + onset / rate == pytest.approx(cue.start, abs=ONSET_TOLERANCE)
+
+
+def test_overlapping_cues_are_pushed_back_and_the_timeline_truncated(engine, tmp_path):
+    cues = [Cue(0.0, 1.0, 'A fairly long first sentence to speak.'), Cue(0.5, 1.0, 'Second.')]
+    path = str(tmp_path / 'overlap.wav')
+
+    result = engine.render(cues, path, duration=2.0)
+
+    (_, first_end, _), (second_start, _, wanted) = result['placements']
+    assert wanted == 0.5
+    assert second_start == first_end
+    rate, samples = _samples(path)
+    assert len(samples) == 2 * rate
@@ -0,0 +1,174 @@
+"""
+File Server Tests
+Range, conditional GET and If-Range handling of send_media_file
+Served through a minimal Flask app with the test client
+"""
+
+import os
+
+import pytest
+from flask import Flask
+from werkzeug.http import http_date
+
+from file_server import send_media_file
+
+SIZE = 100_000
+
+
+@pytest.fixture
+def media(tmp_path):
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(os.urandom(SIZE))
+    return str(path)
+
+
+@pytest.fixture
+def served(media):
+    """Test client for a ``/file`` route serving ``media``, and its close count"""
+    app = Flask(__name__)
+    closed = []
+
+    @app.route('/file', methods=['GET', 'HEAD'])
+    def serve():
+        return send_media_file(media, on_close=lambda: closed.append(True))
+
+    return app.test_client(), closed
+
+
+@pytest.fixture
+def data(media):
+    with open(media, 'rb') as f:
+        return f.read()
+
+
+def test_full_get_advertises_ranges_and_validators(served, data):
+    client, closed = served
+    response = client.get('/file')
+
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['Content-Length'] == str(SIZE)
+    assert response.headers['ETag'].startswith('"')
+    assert 'attachment' in response.headers['Content-Disposition']
+    response.close()
+    assert closed == [True]
+
+
+@pytest.mark.parametrize('header, start, end', [
+    ('bytes=0-99', 0, 99),
+    ('bytes=500-', 500, SIZE - 1),
+    ('bytes=-1000', SIZE - 1000, SIZE - 1),
+    ('bytes=99000-200000', 99000, SIZE - 1),
+])
+def test_single_range_is_206_with_content_range(served, data, header, start, end):
+    client, closed = served
+    response = client.get('/file', headers={'Range': header})
+
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes {start}-{end}/{SIZE}'
+    assert response.headers['Content-Length'] == str(end - start + 1)
+    assert response.data == data[start:end + 1]
+    response.close()
+    assert closed == [True]
+
+
+def test_multiple_ranges_are_a_multipart_206(served, data):
+    client, closed = served
+    # The last two overlap and are merged into one part
+    response = client.get('/file', headers={'Range': 'bytes=0-9,1000-1999,1500-2499'})
+
+    assert response.status_code == 206
+    assert response.mimetype == 'multipart/byteranges'
+    boundary = response.mimetype_params['boundary'].encode('ascii')
+    body = response.data
+    assert response.headers['Content-Length'] == str(len(body))
+
+    parts = body.split(b'--' + boundary)
+    assert parts[0] == b'' and parts[-1] == b'--\r\n'
+    payloads = []
+    for part in parts[1:-1]:
+        head, _, payload = part.partition(b'\r\n\r\n')
+        payloads.append((head, payload[:-2]))   # Each part ends with CRLF
+    assert len(payloads) == 2
+    assert f'Content-Range: bytes 0-9/{SIZE}'.encode('ascii') in payloads[0][0]
+    assert f'Content-Range: bytes 1000-2499/{SIZE}'.encode('ascii') in payloads[1][0]
+    assert [payload for _, payload in payloads] == [data[0:10], data[1000:2500]]
+    response.close()
+    assert closed == [True]
+
+
+def test_unsatisfiable_range_is_416(served):
+    client, closed = served
+    response = client.get('/file', headers={'Range': f'bytes={SIZE}-'})
+
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{SIZE}'
+    assert closed == [True]
+
+
+def test_malformed_range_serves_the_whole_file(served, data):
+    client, _ = served
+    response = client.get('/file', headers={'Range': 'bytes=oops'})
+
+    assert response.status_code == 200
+    assert response.data == data
+
+
+def test_if_range_with_current_etag_keeps_the_range(served, data):
+    client, _ = served
+    etag = client.head('/file').headers['ETag']
+    response = client.get('/file', headers={'Range': 'bytes=0-99', 'If-Range': etag})
+
+    assert response.status_code == 206
+    assert response.data == data[:100]
+
+
+def test_if_range_mismatch_sends_the_whole_file(served, media, data):
+    client, _ = served
+    stale = client.head('/file').headers['ETag']
+    st = os.stat(media)
+    os.utime(media, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))   # File changed underneath
+
+    response = client.get('/file', headers={'Range': 'bytes=0-99', 'If-Range': stale})
+    assert response.status_code == 200
+    assert response.data == data
+    assert response.headers['ETag'] != stale
+
+    old_date = http_date(st.st_mtime)
+    response = client.get('/file', headers={'Range': 'bytes=0-99', 'If-Range': old_date})
+    assert response.status_code == 200
+
+
+def test_if_none_match_is_304(served):
+    client, closed = served
+    etag = client.head('/file').headers['ETag']
+    response = client.get('/file', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    # A different tag and a weak match of ours
+    assert client.get('/file', headers={'If-None-Match': '"other"'}).status_code == 200
+    assert client.get('/file', headers={'If-None-Match': f'"other", W/{etag}'}).status_code == 304
+    assert len(closed) == 4
+
+
+def test_if_modified_since_is_304_until_the_file_changes(served, media):
+    client, _ = served
+    last_modified = client.head('/file').headers['Last-Modified']
+
+    assert client.get('/file', headers={'If-Modified-Since': last_modified}).status_code == 304
+    st = os.stat(media)
+    os.utime(media, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert client.get('/file', headers={'If-Modified-Since': last_modified}).status_code == 200
+
+
+def test_head_has_length_but_no_body(served):
+    client, closed = served
+    response = client.head('/file', headers={'Range': 'bytes=10-19'})
+
+    assert response.status_code == 206
+    assert response.headers['Content-Length'] == '10'
+    assert response.data == b''
+    assert closed == [True]
@@ -0,0 +1,74 @@
+"""
+Job Manager Tests
+Identical requests share one job, however they race
+Expired jobs release their files on lookups as well as on submits
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from jobs import JobManager
+
+SUBMITTERS = 16
+
+
+class Released:
+    """Workspace stand-in counting its releases"""
+
+    def __init__(self):
+        self.releases = 0
+
+    def release(self):
+        self.releases += 1
+
+
+def _wait(job, timeout=5):
+    deadline = time.time() + timeout
+    while not job.is_finished and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.is_finished
+
+
+def test_racing_identical_submits_share_one_job():
+    manager = JobManager(max_workers=2)
+    start = threading.Barrier(SUBMITTERS)
+    done = threading.Event()
+    calls = []
+
+    def work(job):
+        calls.append(job.id)
+        done.wait(5)
+        return {'success': True}
+
+    def submit(_):
+        start.wait()
+        return manager.submit_unique('same', work)
+
+    with ThreadPoolExecutor(max_workers=SUBMITTERS) as pool:
+        results = list(pool.map(submit, range(SUBMITTERS)))
+    done.set()
+
+    assert len({job.id for job, _ in results}) == 1
+    assert sorted(attached for _, attached in results) == [False] + [True] * (SUBMITTERS - 1)
+    _wait(results[0][0])
+    assert len(calls) == 1
+    # A finished key starts fresh work
+    assert manager.submit_unique('same', work)[1] is False
+
+
+def test_lookup_prunes_expired_jobs():
+    manager = JobManager(max_workers=1, retention=0)
+    workspace = Released()
+
+    def work(job):
+        job.add_artifact('/nowhere', 'out.mp4', workspace)
+        return {'success': True}
+
+    job = manager.submit(work)
+    _wait(job)
+    time.sleep(0.01)
+
+    assert manager.get('unknown') is None
+    assert manager.get(job.id) is None
+    assert workspace.releases == 1
@@ -0,0 +1,78 @@
+"""
+Metadata Cache Tests
+Resolved results are shared by callers whose options differ only in output
+Extractions are keyed by the options that shape them; a recording stand-in replaces the network
+"""
+
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+import metadata_cache
+from metadata_cache import MetadataCache
+
+URL = 'https://example.com/watch/clip'
+RAW = {
+    'id': 'clip', 'title': 'Clip', 'extractor': 'generic', 'extractor_key': 'Generic',
+    'webpage_url': URL, 'formats': [
+        {'format_id': 'low', 'url': 'https://example.com/low.mp4', 'ext': 'mp4', 'height': 240},
+        {'format_id': 'high', 'url': 'https://example.com/high.mp4', 'ext': 'mp4', 'height': 720},
+    ],
+}
+
+
+@pytest.fixture
+def extractions(monkeypatch):
+    """Options of every extraction run, with yt-dlp's extractor replaced by ``RAW``"""
+    yt_dlp = pytest.importorskip('yt_dlp')
+    calls = []
+
+    class RecordingYoutubeDL(yt_dlp.YoutubeDL):
+        def extract_info(self, url, download=True, process=True, **kwargs):
+            calls.append(self.params)
+            return copy.deepcopy(RAW)
+
+    monkeypatch.setattr(metadata_cache, 'yt_dlp', SimpleNamespace(YoutubeDL=RecordingYoutubeDL))
+    return calls
+
+
+@pytest.fixture
+def cache(extractions):
+    return MetadataCache()
+
+
+def test_output_options_share_one_resolved_result(cache, extractions):
+    for session in ('a', 'b'):
+        info = cache.resolve(URL, {'format': 'best', 'outtmpl': f'/tmp/{session}/%(id)s.%(ext)s',
+                                   'progress_hooks': [lambda d: None], 'paths': {'home': f'/tmp/{session}'}})
+        assert info['format_id'] == 'high'
+
+    assert len(cache._resolved) == 1
+    assert len(extractions) == 1
+
+
+def test_format_options_are_resolved_separately_from_one_extraction(cache, extractions):
+    assert cache.resolve(URL, {'format': 'best'})['format_id'] == 'high'
+    assert cache.resolve(URL, {'format': 'worst'})['format_id'] == 'low'
+
+    assert len(cache._resolved) == 2
+    assert len(extractions) == 1
+
+
+def test_extraction_options_reach_and_key_the_extraction(cache, extractions):
+    cache.resolve(URL, {'format': 'best'})
+    cache.resolve(URL, {'format': 'best', 'legacy_server_connect': True})
+    cache.resolve(URL, {'format': 'worst', 'legacy_server_connect': True, 'retries': 3})
+
+    assert [params.get('legacy_server_connect') for params in extractions] == [None, True]
+
+
+def test_resolve_and_extract_are_counted_separately(cache):
+    cache.resolve(URL, {'format': 'best'})
+    cache.resolve(URL, {'format': 'best'})
+    cache.resolve(URL, {'format': 'worst'})
+
+    stats = cache.snapshot()
+    assert (stats['resolve_hits'], stats['resolve_misses']) == (1, 2)
+    assert (stats['hits'], stats['misses']) == (1, 1)
@@ -0,0 +1,95 @@
+"""
+Preview Tests
+Keyframe sprites, their WebVTT index and per-segment thumbnails of a synthetic clip
+Checks coverage, sprite bounds, caching, and the cost against decoding every frame
+"""
+
+import os
+import shutil
+import time
+
+import pytest
+
+from ffmpeg_utils import probe_duration, probe_video_size, run_ffmpeg
+from previews import PreviewGenerator
+
+CLIP_SECONDS = 120
+CLIP_SIZE = '640x360'
+SEGMENT = 10
+MAX_FRACTION = 0.25         # Preview cost allowed relative to a full video decode
+
+
+def _vtt_cues(path):
+    """(start, end, target) per WebVTT cue"""
+    def seconds(stamp):
+        h, m, s = stamp.split(':')
+        return int(h) * 3600 + int(m) * 60 + float(s)
+
+    with open(path) as f:
+        blocks = f.read().strip().split('\n\n')[1:]
+    cues = []
+    for block in blocks:
+        timing, target = block.split('\n')[:2]
+        start, end = timing.split(' --> ')
+        cues.append((seconds(start), seconds(end), target))
+    return cues
+
+
+@pytest.fixture
+def clip(tmp_path, make_video):
+    """The clip, its duration and one cut per ``SEGMENT`` seconds"""
+    path = str(tmp_path / 'clip.mp4')
+    shutil.copy(make_video(CLIP_SECONDS, size=CLIP_SIZE), path)
+    duration = probe_duration(path)
+    cuts = [(t, min(t + SEGMENT, duration)) for t in range(0, int(duration), SEGMENT)]
+    return path, duration, cuts
+
+
+def test_sprite_index_covers_the_clip_inside_its_sheets(clip, tmp_path):
+    path, duration, cuts = clip
+    result = PreviewGenerator().generate(path, str(tmp_path), 'clip', cuts=cuts)
+
+    assert result['success'], result.get('error')
+    cues = _vtt_cues(str(tmp_path / result['vtt']))
+    assert cues[0][0] == 0
+    assert cues[-1][1] == pytest.approx(duration, abs=0.05)
+    assert all(a[1] == b[0] for a, b in zip(cues, cues[1:]))
+    sheets = {sprite: probe_video_size(str(tmp_path / sprite)) for sprite in result['sprites']}
+    for _, _, target in cues:
+        sprite, _, region = target.partition('#xywh=')
+        x, y, w, h = (int(v) for v in region.split(','))
+        assert sprite in sheets
+        assert x + w <= sheets[sprite][0] and y + h <= sheets[sprite][1]
+
+
+def test_every_segment_gets_a_thumbnail(clip, tmp_path):
+    path, _, cuts = clip
+    generator = PreviewGenerator()
+    result = generator.generate(path, str(tmp_path), 'clip', cuts=cuts)
+
+    assert result['thumbnails'] == [f'clip_segment_{i}.jpg' for i in range(1, len(cuts) + 1)]
+    for thumbnail in result['thumbnails']:
+        assert probe_video_size(str(tmp_path / thumbnail))[0] == generator.thumb_width
+
+
+def test_cache_follows_the_source(clip, tmp_path):
+    path, _, cuts = clip
+    generator = PreviewGenerator()
+    assert not generator.generate(path, str(tmp_path), 'clip', cuts=cuts)['cached']
+
+    assert generator.generate(path, str(tmp_path), 'clip', cuts=cuts)['cached']
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000_000))
+    assert not generator.generate(path, str(tmp_path), 'clip', cuts=cuts)['cached']
+
+
+def test_previews_cost_a_fraction_of_a_full_decode(clip, tmp_path):
+    path, _, cuts = clip
+    started = time.perf_counter()
+    result = PreviewGenerator().generate(path, str(tmp_path), 'clip', cuts=cuts)
+    wall = time.perf_counter() - started
+    started = time.perf_counter()
+    run_ffmpeg(['-i', path, '-map', '0:v:0', '-f', 'null', '-'])
+    decode = time.perf_counter() - started
+
+    assert result['success'], result.get('error')
+    assert wall <= decode * MAX_FRACTION
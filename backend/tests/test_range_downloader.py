@@ -0,0 +1,101 @@
+"""
+Range Downloader Tests
+Parallel keep-alive range downloads from a throttled server that drops connections
+Output must be bit-identical, connections reused, and interrupted downloads resumed
+"""
+
+import hashlib
+import os
+import time
+
+import pytest
+
+from conftest import RangeHandler
+from range_downloader import RangeDownloader
+
+FILE_BYTES = 8 * 1024 ** 2
+CHUNK_BYTES = FILE_BYTES // 24
+RATE = 4 * 1024 ** 2        # Bytes per second per connection
+DROP_EVERY = 5              # Every Nth range response is cut off half way
+CONNECTIONS = 4
+MIN_SPEEDUP = 2.0
+
+
+class FlakyRangeHandler(RangeHandler):
+    """Throttles each connection and drops every ``DROP_EVERY``-th range response"""
+
+    def copyfile(self, source, outputfile):
+        self._cutoff = -1
+        if self._remaining is not None:
+            with self.server.lock:
+                self.server.responses += 1
+                if self.server.responses % DROP_EVERY == 0:
+                    self._cutoff = self._remaining // 2
+        super().copyfile(source, outputfile)
+
+    def send_chunk(self, outputfile, chunk):
+        if self._cutoff >= 0 and self._remaining is not None:
+            self._remaining -= len(chunk)
+            if self._remaining <= self._cutoff:
+                with self.server.lock:
+                    self.server.drops += 1
+                self.close_connection = True
+                raise ConnectionAbortedError('dropped by the test server')
+        super().send_chunk(outputfile, chunk)
+        time.sleep(len(chunk) / RATE)
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@pytest.fixture
+def served(tmp_path, http_server):
+    """URL of a random file on the flaky server, its digest and the server"""
+    root = tmp_path / 'served'
+    root.mkdir()
+    (root / 'source.bin').write_bytes(os.urandom(FILE_BYTES))
+    server = http_server(root, FlakyRangeHandler)
+    server.responses = server.drops = 0
+    return f'{server.url}/source.bin', _sha256(root / 'source.bin'), server
+
+
+def test_parallel_download_survives_drops_and_reuses_connections(served, tmp_path):
+    url, digest, server = served
+    seconds = {}
+    for connections in (1, CONNECTIONS):
+        server.drops = 0
+        output = str(tmp_path / f'out_{connections}.bin')
+        result = RangeDownloader(connections, CHUNK_BYTES).download(url, output)
+
+        assert _sha256(output) == digest
+        assert result['size'] == FILE_BYTES
+        assert server.drops > 0
+        # Keep-alive: a new connection only to replace a dropped one
+        assert result['connections_opened'] <= connections + server.drops
+        seconds[connections] = result['seconds']
+
+    assert seconds[1] / seconds[CONNECTIONS] >= MIN_SPEEDUP
+
+
+def test_interrupted_download_resumes_with_the_missing_ranges(served, tmp_path):
+    url, digest, _ = served
+    output = str(tmp_path / 'resumed.bin')
+    downloader = RangeDownloader(CONNECTIONS, CHUNK_BYTES)
+
+    class Interrupted(Exception):
+        pass
+
+    def interrupt(done, total):
+        if done > total // 2:
+            raise Interrupted
+
+    with pytest.raises(Interrupted):
+        downloader.download(url, output, on_progress=interrupt)
+    result = downloader.download(url, output)
+
+    assert result['resumed_bytes'] >= FILE_BYTES // 3
+    assert result['resumed_bytes'] + result['fetched_bytes'] <= FILE_BYTES
+    assert _sha256(output) == digest
+    assert not os.path.exists(output + '.part.json')
@@ -0,0 +1,108 @@
+"""
+Result Store Tests
+Repeated, simultaneous and resubmitted identical pipeline requests against a local server
+Hits must return identical bytes quickly; tool upgrades invalidate, a small budget evicts
+"""
+
+import hashlib
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from jobs import JobManager
+from result_store import ResultStore
+
+CLIP_SECONDS = 40
+MAX_HIT_FRACTION = 0.25     # A hit may take at most this fraction of the run that stored it
+CONCURRENT = 4
+
+
+@pytest.fixture
+def web(private_app, make_video, http_server, tmp_path):
+    """Serverless-mode app with ``web.url`` pointing at a clip on a local server"""
+    web = private_app(vercel=True)
+    served = tmp_path / 'served'
+    served.mkdir()
+    shutil.copy(make_video(CLIP_SECONDS), served / 'clip.mp4')
+    web.url = f'{http_server(served).url}/clip.mp4'
+    return web
+
+
+def _run(web, **options):
+    """Run the pipeline once; returns (store status, output digest)"""
+    result = web.run_pipeline(dict(options, url=web.url, format='best'))
+    try:
+        with open(result['path'], 'rb') as f:
+            return result['result_cache'], hashlib.sha256(f.read()).hexdigest()
+    finally:
+        result['workspace'].release()
+
+
+def _wait(job):
+    while not job.is_finished:
+        time.sleep(0.05)
+    job.close()
+
+
+def test_repeat_is_a_fast_hit_with_identical_bytes(web):
+    runs = []
+    for _ in range(2):
+        started = time.perf_counter()
+        runs.append((*_run(web, enable_segmenter=True, enable_dubber=True), time.perf_counter() - started))
+
+    (first, first_digest, stored), (second, second_digest, served) = runs
+    assert (first, second) == ('miss', 'hit')
+    assert first_digest == second_digest
+    assert served <= stored * MAX_HIT_FRACTION
+
+
+def test_simultaneous_identical_requests_run_once(web):
+    with ThreadPoolExecutor(max_workers=CONCURRENT) as pool:
+        runs = list(pool.map(lambda _: _run(web, enable_segmenter=True), range(CONCURRENT)))
+
+    assert sorted(status for status, _ in runs).count('miss') == 1
+    assert len({digest for _, digest in runs}) == 1
+
+
+def test_identical_job_attaches_until_the_first_finishes(web, monkeypatch):
+    monkeypatch.setattr(web, 'BACKGROUND_JOBS', True)
+    monkeypatch.setattr(web, 'jobs', JobManager(max_workers=2))
+    client = web.app.test_client()
+    dub = {'url': web.url, 'format': 'best', 'enable_dubber': True}
+
+    first = client.post('/api/jobs', json=dub).get_json()
+    second = client.post('/api/jobs', json=dub).get_json()
+    assert second['job_id'] == first['job_id'] and second['attached']
+    _wait(web.jobs.get(first['job_id']))
+
+    third = client.post('/api/jobs', json=dub).get_json()
+    later = web.jobs.get(third['job_id'])
+    _wait(later)
+    assert not third['attached']
+    assert later.result['result_cache'] == 'hit'
+
+
+def test_version_change_invalidates_and_budget_evicts(web):
+    _run(web, enable_segmenter=True)
+    _run(web, enable_dubber=True)
+    store = web.result_store
+
+    web.result_store = ResultStore(store.store_dir, versions=dict(store.versions, ffmpeg='upgraded'))
+    assert _run(web, enable_segmenter=True)[0] == 'miss'
+    assert web.result_store.snapshot()['invalidated'] == 2
+
+    size = web.result_store.snapshot()['bytes']
+    web.result_store = ResultStore(store.store_dir, max_bytes=size, versions=web.result_store.versions)
+    _run(web, enable_dubber=True)
+    snapshot = web.result_store.snapshot()
+    # The new entry is kept even when it alone is over the budget
+    assert snapshot['evictions'] == 1
+    assert snapshot['entries'] == 1
+
+
+def test_plain_downloads_are_left_to_the_download_cache(web):
+    assert _run(web)[0] is None
+    assert _run(web)[0] is None
+    assert web.result_store.snapshot()['entries'] == 0
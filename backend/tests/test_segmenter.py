@@ -0,0 +1,157 @@
+"""
+Segmenter Tests
+Segment durations and cut accuracy of the exact, keyframe and smart modes, and HLS ladders
+Cuts at 3 s steps fall mid-GOP in a clip with a keyframe every 2 s
+"""
+
+import os
+import re
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from conftest import FRAME_RATE
+from ffmpeg_utils import get_ffmpeg_exe, probe_duration, probe_keyframes, probe_video_size
+from segmenter import MediaSegmenter
+
+CLIP_SECONDS = 12
+SEGMENT = 3
+PLANNED = [(0, 3), (3, 6), (6, 9), (9, 12)]
+DURATION_TOLERANCE = 0.1   # Container duration vs the cut (AAC frames overhang)
+
+# Rungs at and below the 240p clip, so every one is used
+LADDER = [
+    {'name': '240p', 'height': 240, 'video_bitrate': 400, 'audio_bitrate': 64},
+    {'name': '144p', 'height': 144, 'video_bitrate': 200, 'audio_bitrate': 48},
+]
+
+
+def _frame_count(path):
+    """Number of decoded video frames"""
+    proc = subprocess.run([get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-i', path,
+                           '-map', '0:v:0', '-f', 'null', '-'], stderr=subprocess.PIPE)
+    return int(re.findall(r'frame=\s*(\d+)', proc.stderr.decode('utf-8', 'replace'))[-1])
+
+
+def _frame(path, time):
+    """Small grayscale picture of the frame shown at ``time`` (accurate seek)"""
+    proc = subprocess.run([get_ffmpeg_exe(), '-hide_banner', '-nostdin', '-loglevel', 'error',
+                           '-ss', f'{time:.3f}', '-i', path, '-frames:v', '1',
+                           '-vf', 'scale=64:48,format=gray', '-f', 'rawvideo', '-'],
+                          stdout=subprocess.PIPE, check=True)
+    return np.frombuffer(proc.stdout, dtype=np.uint8).astype(np.float32)
+
+
+def _first_frame_offset(source, segment, start):
+    """Which source frame (in frames from ``start``) a segment opens with"""
+    first = _frame(segment, 0)
+    offsets = [k for k in range(-2, 3) if start + k / FRAME_RATE >= 0]
+    errors = [np.abs(first - _frame(source, start + k / FRAME_RATE)).mean() for k in offsets]
+    return offsets[int(np.argmin(errors))]
+
+
+@pytest.fixture
+def clip(tmp_path, make_video):
+    shutil.copy(make_video(CLIP_SECONDS), tmp_path / 'clip.mp4')
+    return str(tmp_path / 'clip.mp4')
+
+
+@pytest.fixture
+def segmenter(tmp_path):
+    return MediaSegmenter(str(tmp_path), workers=1, max_segments=None)
+
+
+@pytest.mark.parametrize('mode', ['exact', 'smart'])
+def test_frame_accurate_modes_cut_on_the_planned_frame(segmenter, clip, tmp_path, mode):
+    result = segmenter.segment('clip.mp4', 'test', segment_duration=SEGMENT, mode=mode, previews=False)
+
+    assert result['success'], result.get('error')
+    assert result['mode'] == mode
+    assert [tuple(cut) for cut in result['cuts']] == PLANNED
+    for name, (start, end) in zip(result['segments'], result['cuts']):
+        path = str(tmp_path / name)
+        assert abs(probe_duration(path) - (end - start)) <= DURATION_TOLERANCE
+        assert _frame_count(path) == (end - start) * FRAME_RATE
+        assert _first_frame_offset(clip, path, start) == 0
+
+
+def test_keyframe_mode_snaps_cuts_forward_to_keyframes(segmenter, clip, tmp_path):
+    keyframes = probe_keyframes(clip)
+    result = segmenter.segment('clip.mp4', 'test', segment_duration=SEGMENT, mode='keyframe', previews=False)
+
+    assert result['success'], result.get('error')
+    starts = [start for start, _ in result['cuts']]
+    # 3 and 9 are mid-GOP and move to the next keyframe; 6 already is one
+    assert starts == pytest.approx([0, 4, 6, 10], abs=0.02)
+    for start in starts:
+        assert min(abs(start - k) for k in keyframes) <= segmenter.keyframe_tolerance
+    for name, (start, end) in zip(result['segments'], result['cuts']):
+        path = str(tmp_path / name)
+        assert abs(probe_duration(path) - (end - start)) <= DURATION_TOLERANCE
+        assert _first_frame_offset(clip, path, start) == 0
+    # Stream copy: every source frame lands in exactly one segment
+    total = sum(_frame_count(str(tmp_path / name)) for name in result['segments'])
+    assert total == CLIP_SECONDS * FRAME_RATE
+
+
+@pytest.mark.parametrize('mode, frames', [('smart', 3 * FRAME_RATE), ('keyframe', 2 * FRAME_RATE)])
+def test_single_cut_matches_its_mode(segmenter, clip, tmp_path, mode, frames):
+    # (3, 6) is re-encoded up to 4 in smart mode and snaps to (4, 6) in keyframe mode
+    name = segmenter.cut(clip, 'test', 2, 3, 6, mode=mode)
+
+    assert name == 'test_segment_2.mp4'
+    assert _frame_count(str(tmp_path / name)) == frames
+    assert _first_frame_offset(clip, str(tmp_path / name), 3 if mode == 'smart' else 4) == 0
+
+
+def test_unknown_mode_is_rejected(segmenter, clip):
+    result = segmenter.segment('clip.mp4', 'test', segment_duration=SEGMENT, mode='fast', previews=False)
+
+    assert not result['success']
+    assert 'Unknown segment mode' in result['error']
+
+
+def _playlist(path):
+    """(init segment, [(duration, segment)]) of an HLS media playlist"""
+    with open(path) as f:
+        lines = f.read().splitlines()
+    init = re.search(r'#EXT-X-MAP:URI="([^"]+)"', '\n'.join(lines)).group(1)
+    entries = [(float(line.split(':', 1)[1].rstrip(',')), lines[i + 1])
+               for i, line in enumerate(lines) if line.startswith('#EXTINF:')]
+    return init, entries
+
+
+def _joined(folder, init, segments, path):
+    """Init segment plus media segments, as a player would read them"""
+    with open(path, 'wb') as out:
+        for name in [init, *segments]:
+            with open(os.path.join(folder, name), 'rb') as f:
+                out.write(f.read())
+    return path
+
+
+def test_hls_ladder_renditions_share_the_planned_segments(segmenter, clip, tmp_path):
+    result = segmenter.segment('clip.mp4', 'test', segment_duration=SEGMENT, output='hls',
+                               ladder=LADDER, previews=False)
+
+    assert result['success'], result.get('error')
+    assert result['renditions'] == ['240p', '144p']
+    assert [tuple(cut) for cut in result['cuts']] == PLANNED
+    hls_dir = tmp_path / os.path.dirname(result['playlist'])
+    master = (tmp_path / result['playlist']).read_text()
+    for rung in LADDER:
+        assert f"{rung['name']}/index.m3u8" in master
+        folder = str(hls_dir / rung['name'])
+        init, entries = _playlist(os.path.join(folder, 'index.m3u8'))
+        # Boundaries line up across renditions, to within a frame
+        assert [duration for duration, _ in entries] == pytest.approx([end - start for start, end in PLANNED],
+                                                                       abs=1 / FRAME_RATE)
+        for number, (_, name) in enumerate(entries):
+            start, end = PLANNED[number]
+            path = _joined(folder, init, [name], str(tmp_path / f"{rung['name']}_{number}.mp4"))
+            assert _frame_count(path) == (end - start) * FRAME_RATE
+        whole = _joined(folder, init, [name for _, name in entries], str(tmp_path / f"{rung['name']}.mp4"))
+        assert probe_video_size(whole)[1] == rung['height']
+        assert _frame_count(whole) == CLIP_SECONDS * FRAME_RATE
@@ -0,0 +1,131 @@
+"""
+Stage Pipeline Tests
+Download, cut and dub overlapped, from a throttled local server with a slow stub voice
+Segments must be cut before the download ends, match a sequential run, and queue boundedly
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+
+import pytest
+
+from conftest import RangeHandler, serve_directory
+from download_cache import DownloadCache
+from downloader import MediaDownloader
+from dubber import NeuralDubber
+from dubbing_engine import parse_cues, window_cues
+from range_downloader import RangeDownloader
+from segmenter import MediaSegmenter
+from stage_pipeline import StagePipeline
+from tts_backends import StubBackend
+from tts_cache import TTSCache
+
+CLIP_SECONDS = 30
+SEGMENT = 5
+RATE = 48 * 1024            # Bytes per second per connection
+CHUNK = 64 * 1024
+TTS_LATENCY = 0.5           # Dubbing is slower than cutting, so the queue fills
+UNDUBBED = re.compile(r'clip_segment_\d+\.mp4$')
+
+
+class SlowRangeHandler(RangeHandler):
+    """Range handler throttled to ``RATE`` per connection"""
+
+    def send_chunk(self, outputfile, chunk):
+        super().send_chunk(outputfile, chunk)
+        time.sleep(len(chunk) / RATE)
+
+
+def _srt(count):
+    """One cue per segment, one second into it"""
+    stamp = lambda s: f'00:{s // 60:02d}:{s % 60:02d},000'
+    return '\n'.join(f'{i + 1}\n{stamp(i * SEGMENT + 1)} --> {stamp(i * SEGMENT + 3)}\n'
+                     f'Voice over for segment number {i + 1}.\n' for i in range(count))
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _stages(root):
+    downloads = os.path.join(root, 'downloads')
+    cache = DownloadCache(os.path.join(root, 'cache'), range_downloader=RangeDownloader(4, CHUNK))
+    return (downloads, MediaDownloader(downloads, cache=cache),
+            MediaSegmenter(downloads, max_segments=None),
+            NeuralDubber(downloads, tts_cache=TTSCache(os.path.join(root, 'tts')), backend=StubBackend(TTS_LATENCY)))
+
+
+@pytest.fixture(scope='module')
+def runs(tmp_path_factory, make_video):
+    """The same clip dubbed stage after stage and overlapped: (expected digests, result, folder, peak, queue)"""
+    root = tmp_path_factory.mktemp('pipeline')
+    served = root / 'served'
+    served.mkdir()
+    shutil.copy(make_video(CLIP_SECONDS), served / 'clip.mp4')
+    server = serve_directory(served, SlowRangeHandler)
+    url = f'{server.url}/clip.mp4'
+    srt = _srt(CLIP_SECONDS // SEGMENT)
+    try:
+        folder, downloader, segmenter, dubber = _stages(str(root / 'sequential'))
+        download = downloader.download(url, 'clip')
+        segmented = segmenter.segment(download['filename'], 'clip', segment_duration=SEGMENT,
+                                      mode='smart', previews=False)
+        cues = parse_cues(srt)
+        expected = []
+        for name, (start, end) in zip(segmented['segments'], segmented['cuts']):
+            result = dubber.dub(name, os.path.splitext(name)[0], text=window_cues(cues, start, end))
+            expected.append(_sha256(os.path.join(folder, result['filename'])))
+
+        # Overlapped, counting undubbed segments on disk as it runs
+        folder, downloader, segmenter, dubber = _stages(str(root / 'overlapped'))
+        pipeline = StagePipeline(downloader, segmenter, dubber)
+        peak = [0]
+        done = threading.Event()
+
+        def count_undubbed():
+            while not done.is_set():
+                names = os.listdir(folder) if os.path.isdir(folder) else []
+                peak[0] = max(peak[0], sum(1 for name in names if UNDUBBED.match(name)))
+                time.sleep(0.02)
+
+        counter = threading.Thread(target=count_undubbed, daemon=True)
+        counter.start()
+        try:
+            result = pipeline.run(url, 'clip', text=srt, segment_duration=SEGMENT, mode='smart')
+        finally:
+            done.set()
+            counter.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert result['success'], result.get('error')
+    return expected, result, folder, peak[0], pipeline.queue_size
+
+
+def test_segments_are_cut_while_downloading(runs):
+    _, result, _, _, _ = runs
+    timings = result['timings']
+
+    assert any(segment['cut_while_downloading'] for segment in result['segments'])
+    assert timings['first_segment'] < timings['download']
+
+
+def test_overlapped_output_matches_the_sequential_run(runs):
+    expected, result, folder, _, _ = runs
+
+    assert [_sha256(os.path.join(folder, segment['filename'])) for segment in result['segments']] == expected
+    assert not any(name.endswith('.reading.mp4') for _, _, names in os.walk(folder) for name in names)
+
+
+def test_handoff_bounds_the_undubbed_segments(runs):
+    _, result, folder, peak, queue_size = runs
+
+    assert 0 < peak <= queue_size + 2
+    # Dubbed segments replace the cut ones
+    assert not any(UNDUBBED.match(name) for name in os.listdir(folder))
+    assert all(segment['dubbed'] for segment in result['segments'])
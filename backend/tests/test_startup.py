@@ -0,0 +1,64 @@
+"""
+Cold Start Tests
+Importing the app in a fresh interpreter, as a serverless cold start does
+Heavy libraries stay unloaded, nothing is written, the import fits a time budget
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BACKEND_DIR
+
+BUDGET = float(os.environ.get('STARTUP_BUDGET_SECONDS', '1.0'))
+DEFERRED = ('yt_dlp', 'moviepy', 'gtts', 'imageio_ffmpeg')
+RUNS = 3
+
+PROBE = """
+import sys, json, time
+sys.path.insert(0, sys.argv[1])
+started = time.perf_counter()
+from backend.app import app
+seconds = time.perf_counter() - started
+print(json.dumps({'seconds': seconds, 'modules': sorted(m.split('.')[0] for m in sys.modules)}))
+"""
+
+
+def _cold_import(workdir):
+    """Import ``backend.app`` in a fresh interpreter; returns the probe's report"""
+    env = dict(os.environ, MEDIA_CACHE_DIR=str(workdir / 'cache'), TTS_CACHE_DIR=str(workdir / 'tts'))
+    proc = subprocess.run([sys.executable, '-c', PROBE, os.path.dirname(BACKEND_DIR)], cwd=str(workdir),
+                          env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    assert proc.returncode == 0, proc.stderr.decode('utf-8', 'replace')
+    return json.loads(proc.stdout.decode().strip().splitlines()[-1])
+
+
+@pytest.fixture(scope='module')
+def cold_imports(tmp_path_factory):
+    """Reports of ``RUNS`` cold imports, with what each left behind"""
+    reports = []
+    for _ in range(RUNS):
+        workdir = tmp_path_factory.mktemp('startup')
+        before = set(os.listdir(BACKEND_DIR))
+        report = _cold_import(workdir)
+        report['created'] = sorted(set(os.listdir(BACKEND_DIR)) - before - {'__pycache__'}) + sorted(os.listdir(workdir))
+        reports.append(report)
+    return reports
+
+
+def test_import_defers_heavy_libraries(cold_imports):
+    for report in cold_imports:
+        assert not set(DEFERRED) & set(report['modules'])
+
+
+def test_import_creates_no_files(cold_imports):
+    for report in cold_imports:
+        assert report['created'] == []
+
+
+def test_import_fits_the_budget(cold_imports):
+    times = sorted(report['seconds'] for report in cold_imports)
+    assert times[len(times) // 2] <= BUDGET
@@ -0,0 +1,100 @@
+"""
+Streaming Tests
+Fragmented MP4 piped from ffmpeg, fed from a local HTTP server
+Failures must reach the client, as an error status or an aborted body
+"""
+
+import shutil
+import sys
+
+import pytest
+
+from ffmpeg_utils import FFmpegError, probe_duration
+from metadata_cache import EXTRACT_OPTS
+from streaming import MediaStreamer, ytdlp_cli_args
+
+CLIP_SECONDS = 6
+
+
+class DirectMetadata:
+    """``resolve`` answers with one direct HTTP format at ``url``"""
+
+    def __init__(self, url):
+        self.url = url
+
+    def resolve(self, url, options=None):
+        return {'id': 'clip', 'title': 'Clip', 'protocol': 'http', 'url': self.url, 'duration': CLIP_SECONDS}
+
+
+@pytest.fixture
+def served(tmp_path, make_video, http_server):
+    """Base URL of a server holding ``clip.mp4``"""
+    root = tmp_path / 'served'
+    root.mkdir()
+    shutil.copy(make_video(CLIP_SECONDS), root / 'clip.mp4')
+    return http_server(root).url
+
+
+def test_ytdlp_arguments_match_the_app_options():
+    yt_dlp = pytest.importorskip('yt_dlp')
+    opts = yt_dlp.parse_options(ytdlp_cli_args()).ydl_opts
+
+    assert opts['extractor_args'] == EXTRACT_OPTS['extractor_args']
+    assert opts['http_headers']['User-Agent'] == EXTRACT_OPTS['user_agent']
+    assert opts['source_address'] == EXTRACT_OPTS['source_address']
+    assert opts['retries'] == EXTRACT_OPTS['retries']
+
+
+def test_direct_format_streams_a_playable_file(served, tmp_path):
+    closed = []
+    chunks = MediaStreamer(DirectMetadata(f'{served}/clip.mp4')).stream(
+        'https://example.com/clip', 'best', on_close=lambda: closed.append(True))
+    output = tmp_path / 'streamed.mp4'
+    output.write_bytes(b''.join(chunks))
+
+    assert probe_duration(str(output)) == pytest.approx(CLIP_SECONDS, abs=0.1)
+    assert closed == [True]
+
+
+def test_failure_before_output_raises_before_the_response(served):
+    closed = []
+    with pytest.raises(FFmpegError):
+        MediaStreamer(DirectMetadata(f'{served}/missing.mp4')).stream(
+            'https://example.com/clip', 'best', on_close=lambda: closed.append(True))
+
+    assert closed == [True]
+
+
+def test_failed_resolve_still_closes():
+    class FailingMetadata:
+        def resolve(self, url, options=None):
+            raise ValueError('extraction failed')
+
+    closed = []
+    with pytest.raises(ValueError):
+        MediaStreamer(FailingMetadata()).stream('https://example.com/clip', 'best',
+                                                on_close=lambda: closed.append(True))
+
+    assert closed == [True]
+
+
+def test_failure_after_output_aborts_the_body():
+    closed = []
+    script = 'import sys; sys.stdout.write("x" * 10); sys.stdout.flush(); sys.exit(1)'
+    chunks = MediaStreamer(None)._pump([sys.executable, '-c', script], None, lambda: closed.append(True))
+
+    assert next(chunks) == b'x' * 10
+    with pytest.raises(FFmpegError):
+        next(chunks)
+    assert closed == [True]
+
+
+def test_stream_route_reports_a_failed_source(private_app, served, monkeypatch):
+    web = private_app()
+    monkeypatch.setattr(web.streamer, 'metadata_cache', DirectMetadata(f'{served}/missing.mp4'))
+    monkeypatch.setattr(web, 'metadata_cache', DirectMetadata(f'{served}/missing.mp4'))
+
+    response = web.app.test_client().get('/api/stream?url=https://example.com/clip')
+
+    assert response.status_code == 500
+    assert response.get_json()['success'] is False
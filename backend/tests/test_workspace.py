@@ -0,0 +1,58 @@
+"""
+Workspace Tests
+Purging leftovers from earlier processes, fast-root placement and the per-run quota
+Purge must only touch directories the manager itself names
+"""
+
+import os
+
+import pytest
+
+from workspace import QuotaExceeded, WorkspaceManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return WorkspaceManager(str(tmp_path / 'disk'), fast_root=str(tmp_path / 'fast'), quota=1000, fast_reserve=0)
+
+
+def test_purge_removes_only_stale_workspaces(manager):
+    live = manager.create()
+    live_file = live.path('source.mp4', 10)
+    open(live_file, 'wb').close()
+
+    stale = [os.path.join(root, name) for root in (manager.root, manager.fast_root)
+             for name in ('job_0123456789ab', 'stream_fedcba987654')]
+    foreign = [os.path.join(manager.fast_root, name) for name in ('cache', 'job_notaworkspace', 'Job_0123456789ab')]
+    for path in stale + foreign:
+        os.makedirs(path)
+    foreign_file = os.path.join(manager.fast_root, 'job_0123456789ab.mp4')
+    open(foreign_file, 'wb').close()
+
+    manager.purge()
+
+    assert not any(os.path.exists(path) for path in stale)
+    assert all(os.path.isdir(path) for path in foreign)
+    assert os.path.exists(foreign_file)
+    assert os.path.exists(live_file)
+    live.release()
+    assert not os.path.exists(live.disk_dir)
+
+
+def test_quota_refuses_planned_files_and_catches_overshoot(manager):
+    with manager.create() as workspace:
+        with pytest.raises(QuotaExceeded):
+            workspace.path('big.mp4', 2000)
+
+        # An unknown size is written first and caught afterwards
+        with open(workspace.path('unknown.mp4', None), 'wb') as f:
+            f.write(b'\0' * 1500)
+        with pytest.raises(QuotaExceeded):
+            workspace.check_quota()
+
+
+def test_files_of_unknown_size_spill_to_disk(manager):
+    with manager.create() as workspace:
+        assert workspace.path('dub.wav').startswith(workspace.disk_dir)
+        assert workspace.path('source.mp4', 10).startswith(workspace.fast_dir)
+        assert workspace.reserved == 10
@@ -0,0 +1,116 @@
+"""
+TTS Backends Module
+Pluggable speech synthesizers behind one call signature
+gTTS for production, an offline tone generator for tests and benchmarks
+"""
+
+import os
+import time
+import wave
+
+from tts_cache import synthesize_gtts
+
+
+class TTSBackend:
+    """
+    Speech synthesizer interface
+
+    Backends are callables with the ``synthesize_fn`` signature that
+    ``TTSCache.synthesize`` expects, and their ``name`` is part of the
+    cache key so backends never share cached audio.
+    """
+
+    name = None
+
+    def synthesize(self, text, language, tld, speed, output_path):
+        """
+        Write speech for ``text`` to ``output_path``
+
+        Args:
+            text (str): Text to speak
+            language (str): Language code
+            tld (str): Accent / regional domain
+            speed (float): Speaking rate
+            output_path (str): Output path; any ffmpeg-readable format
+        """
+        raise NotImplementedError
+
+    def __call__(self, text, language, tld, speed, output_path):
+        return self.synthesize(text, language, tld, speed, output_path)
+
+
+class GTTSBackend(TTSBackend):
+    """Google TTS over the network (MP3, 24 kHz mono)"""
+
+    name = 'gtts'
+
+    def synthesize(self, text, language, tld, speed, output_path):
+        synthesize_gtts(text, language, tld, speed, output_path)
+
+
+class StubBackend(TTSBackend):
+    """Offline stand-in: a tone lasting about as long as the speech would"""
+
+    name = 'stub'
+
+    def __init__(self, latency=0.0, per_char=0.0, sample_rate=24000):
+        """
+        Initialize stub backend
+
+        Args:
+            latency (float): Seconds every call sleeps, like a network round trip
+            per_char (float): Extra seconds per character, like server-side synthesis
+            sample_rate (int): WAV sample rate
+        """
+        self.latency = latency
+        self.per_char = per_char
+        self.sample_rate = sample_rate
+
+    def synthesize(self, text, language, tld, speed, output_path):
+        import numpy as np
+
+        delay = self.latency + self.per_char * len(text)
+        if delay:
+            time.sleep(delay)
+        seconds = max(0.5, 0.35 * len(text.split()) / (speed or 1.0))
+        t = np.arange(int(seconds * self.sample_rate)) / self.sample_rate
+        tone = (0.3 * 32767 * np.sin(2 * np.pi * 220 * t)).astype('<i2')
+        with wave.open(output_path, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.sample_rate)
+            f.writeframes(tone.tobytes())
+
+
+BACKENDS = {
+    'gtts': GTTSBackend,
+    'stub': StubBackend,
+}
+
+
+def get_backend(name):
+    """
+    Instantiate a backend by name
+
+    Args:
+        name (str): Key of ``BACKENDS``
+
+    Returns:
+        TTSBackend: New backend instance
+
+    Raises:
+        ValueError: If the name is unknown
+    """
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown TTS backend: {name}')
+    return BACKENDS[name]()
+
+
+def default_backend():
+    """
+    Backend selected by ``TTS_BACKEND`` (default: gtts)
+
+    Returns:
+        TTSBackend: New backend instance
+    """
+    return get_backend(os.environ.get('TTS_BACKEND', 'gtts'))
@@ -0,0 +1,232 @@
+"""
+TTS Cache Module
+Persistent cache of synthesized speech, stored as decoded WAV audio
+Disk LRU tier plus a small in-memory tier for the hottest phrases
+"""
+
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+
+from download_cache import DownloadCache
+from ffmpeg_utils import run_ffmpeg
+from lazy_imports import lazy_import
+
+gtts = lazy_import('gtts')
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'media_toolkit_tts')
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2     # 256 MB on disk
+DEFAULT_MEMORY_BYTES = 16 * 1024 ** 2   # 16 MB in memory
+
+
+def synthesize_gtts(text, language, tld, speed, output_path):
+    """
+    Google TTS synthesizer (network)
+
+    Args:
+        text (str): Text to speak
+        language (str): Language code
+        tld (str): Google domain, selects the accent (e.g. 'co.uk')
+        speed (float): Below 1.0 selects gTTS slow mode
+        output_path (str): MP3 output path
+    """
+    tts = gtts.gTTS(text=text, lang=language, tld=tld, slow=speed < 1.0)
+    tts.save(output_path)
+
+
+class TTSCache:
+    """Synthesized-audio cache usable with any TTS backend"""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, memory_bytes=DEFAULT_MEMORY_BYTES):
+        """
+        Initialize TTS cache
+
+        Args:
+            cache_dir (str): Directory for cached WAV files and index
+            max_bytes (int): Disk budget before LRU eviction
+            memory_bytes (int): Budget of the in-memory tier
+        """
+        self.store = DownloadCache(cache_dir, max_bytes)
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+            'synth_seconds': 0.0, 'saved_seconds': 0.0
+        }
+
+    @staticmethod
+    def key_for(text, language, tld, backend, speed):
+        """
+        Cache key for a synthesis request
+
+        Returns:
+            str: Hex key
+        """
+        raw = '\0'.join([backend, language, tld, f'{float(speed):.3f}', text])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def synthesize(self, text, language, output_path, synthesize_fn=synthesize_gtts,
+                   tld='com', backend='gtts', speed=1.0):
+        """
+        Write speech for ``text`` to ``output_path``, synthesizing only on a miss
+
+        Args:
+            text (str): Text to speak
+            language (str): Language code
+            output_path (str): Destination; '.wav' is linked/copied, other
+                extensions are encoded from the cached WAV by ffmpeg
+            synthesize_fn (callable): ``fn(text, language, tld, speed, path)``
+                writing audio in any ffmpeg-readable format
+            tld (str): Accent / regional domain
+            backend (str): Backend name, part of the cache key
+            speed (float): Speaking rate, part of the cache key
+
+        Returns:
+            str: ``output_path``
+        """
+        data, path = self._resolve(text, language, synthesize_fn, tld, backend, speed)
+        return self._write_output(output_path, data=data, path=path)
+
+    def read(self, text, language, synthesize_fn=synthesize_gtts, tld='com', backend='gtts', speed=1.0):
+        """
+        Speech for ``text`` as WAV bytes, synthesizing only on a miss
+
+        Same arguments as ``synthesize``, without an output file.
+
+        Returns:
+            bytes: Complete WAV file
+        """
+        data, path = self._resolve(text, language, synthesize_fn, tld, backend, speed)
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        return data
+
+    def _resolve(self, text, language, synthesize_fn, tld, backend, speed):
+        """WAV bytes from the memory tier, else the cached WAV path"""
+        key = self.key_for(text, language, tld, backend, speed)
+
+        data = self._memory_get(key)
+        if data is not None:
+            self._count('memory_hits', key)
+            return data, None
+
+        cached = self.store.lookup(key)
+        if cached:
+            self._count('disk_hits', key)
+        else:
+            def producer(partial_base):
+                raw_path = partial_base + '.src'
+                wav_path = partial_base + '.wav'
+                started = time.perf_counter()
+                synthesize_fn(text, language, tld, speed, raw_path)
+                elapsed = time.perf_counter() - started
+                # Store decoded PCM so consumers never pay for an MP3 decode
+                run_ffmpeg(['-i', raw_path, '-f', 'wav', wav_path])
+                os.remove(raw_path)
+                return wav_path, {'synth_seconds': elapsed, 'backend': backend}
+
+            cached = self.store.fetch(key, producer)
+            with self._lock:
+                self.stats['misses'] += 1
+                self.stats['synth_seconds'] += self.store.meta(key).get('synth_seconds', 0.0)
+
+        if os.path.getsize(cached) <= self.memory_bytes // 4:
+            with open(cached, 'rb') as f:
+                data = f.read()
+            self._memory_put(key, data)
+            return data, None
+        return None, cached
+
+    def snapshot(self):
+        """
+        Counters for monitoring, including synthesis time saved
+
+        Returns:
+            dict: Tier hit counts, misses, seconds synthesized and saved
+        """
+        with self._lock:
+            result = dict(self.stats, memory_entries=len(self._memory), memory_bytes=self._memory_used)
+        store = self.store.snapshot()
+        result.update(disk_entries=store['entries'], disk_bytes=store['bytes'], evictions=store['evictions'])
+        return result
+
+    def _count(self, name, key):
+        saved = self.store.meta(key).get('synth_seconds', 0.0)
+        with self._lock:
+            self.stats[name] += 1
+            self.stats['saved_seconds'] += saved
+
+    def _memory_get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            return data
+
+    def _memory_put(self, key, data):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = data
+            self._memory_used += len(data)
+            while self._memory_used > self.memory_bytes and self._memory:
+                _, dropped = self._memory.popitem(last=False)
+                self._memory_used -= len(dropped)
+
+    def _write_output(self, output_path, data=None, path=None):
+        if os.path.splitext(output_path)[1].lower() == '.wav':
+            if data is not None:
+                with open(output_path, 'wb') as f:
+                    f.write(data)
+            else:
+                shutil.copyfile(path, output_path)
+            return output_path
+
+        if data is not None:
+            source = output_path + '.cache.wav'
+            with open(source, 'wb') as f:
+                f.write(data)
+        else:
+            source = path
+        try:
+            run_ffmpeg(['-i', source, output_path])
+        finally:
+            if data is not None and os.path.exists(source):
+                os.remove(source)
+        return output_path
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_tts_cache():
+    """
+    Process-wide TTS cache configured from the environment
+
+    ``TTS_CACHE_DIR``, ``TTS_CACHE_MAX_BYTES`` and ``TTS_CACHE_MEMORY_BYTES``
+    override the defaults.
+
+    Returns:
+        TTSCache: Shared cache instance
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TTSCache(
+                os.environ.get('TTS_CACHE_DIR', DEFAULT_CACHE_DIR),
+                int(os.environ.get('TTS_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+                int(os.environ.get('TTS_CACHE_MEMORY_BYTES', DEFAULT_MEMORY_BYTES))
+            )
+        return _default_cache
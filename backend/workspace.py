@@ -0,0 +1,281 @@
+"""
+Workspace Module
+Private scratch directories for pipeline runs, optionally on tmpfs
+Reference counted so files outlive the run while responses still stream them
+"""
+
+import os
+import re
+import uuid
+import shutil
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUOTA_BYTES = 4 * 1024 ** 3      # 4 GB per workspace
+DEFAULT_FAST_RESERVE = 256 * 1024 ** 2   # Left free on the fast root for everyone else
+
+# Directory names ``WorkspaceManager.create`` makes: prefix, underscore, 12 hex digits
+_NAME_RE = re.compile(r'^[a-z]+_[0-9a-f]{12}$')
+
+
+class QuotaExceeded(RuntimeError):
+    """Raised when a workspace outgrows its disk quota"""
+
+
+class Workspace:
+    """One run's scratch directory, split between fast storage and disk"""
+
+    def __init__(self, manager, name, quota):
+        """
+        Initialize workspace (use ``WorkspaceManager.create``)
+
+        Args:
+            manager (WorkspaceManager): Owning manager
+            name (str): Unique directory name
+            quota (int): Byte limit across both locations (None: unlimited)
+        """
+        self.manager = manager
+        self.name = name
+        self.quota = quota
+        self.disk_dir = os.path.join(manager.root, name)
+        self.fast_dir = os.path.join(manager.fast_root, name) if manager.fast_root else None
+        self.reserved = 0  # Bytes promised on the fast root
+        self._refs = 1
+        self._closed = False
+        self._lock = threading.Lock()
+        os.makedirs(self.disk_dir)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def path(self, filename, size=None):
+        """
+        Path for a new file, on fast storage when it fits
+
+        Files spill to disk when no fast root is configured, when the
+        expected size does not fit next to other workspaces' files, or
+        when the size is unknown.
+
+        Args:
+            filename (str): Plain file name
+            size (int): Expected bytes, None when unknown
+
+        Returns:
+            str: Absolute path inside the workspace
+
+        Raises:
+            QuotaExceeded: If the expected size would break the quota
+        """
+        if self._closed:
+            raise RuntimeError(f'Workspace {self.name} is closed')
+        if size and self.quota and self.usage() + size > self.quota:
+            raise QuotaExceeded(f'{filename} ({size} bytes) would exceed the {self.quota} byte workspace quota')
+        if size is not None and self.manager.reserve_fast(self, size):
+            os.makedirs(self.fast_dir, exist_ok=True)
+            return os.path.join(self.fast_dir, filename)
+        return os.path.join(self.disk_dir, filename)
+
+    def usage(self):
+        """
+        Bytes currently stored in the workspace
+
+        Returns:
+            int: Total size of files in both locations
+        """
+        total = 0
+        for folder in filter(None, (self.fast_dir, self.disk_dir)):
+            for root, _, files in os.walk(folder):
+                for name in files:
+                    try:
+                        total += os.path.getsize(os.path.join(root, name))
+                    except OSError:
+                        pass
+        return total
+
+    def check_quota(self):
+        """
+        Fail the run if the workspace has grown past its quota
+
+        Called between stages, not while ffmpeg or yt-dlp write, so a run
+        may overshoot by one stage's output before it fails; ``path``
+        already refuses files whose expected size would not fit.
+
+        Raises:
+            QuotaExceeded: If usage is over the limit
+        """
+        if self.quota:
+            used = self.usage()
+            if used > self.quota:
+                raise QuotaExceeded(f'Workspace {self.name} uses {used} bytes (quota {self.quota})')
+
+    def acquire(self):
+        """
+        Take another reference, e.g. for a response still sending a file
+
+        Returns:
+            bool: False if the workspace was already cleaned up
+        """
+        with self._lock:
+            if self._closed:
+                return False
+            self._refs += 1
+            return True
+
+    def release(self):
+        """Drop a reference; the last one deletes the directories"""
+        with self._lock:
+            if self._closed:
+                return
+            self._refs -= 1
+            if self._refs > 0:
+                return
+            self._closed = True
+        for folder in filter(None, (self.fast_dir, self.disk_dir)):
+            shutil.rmtree(folder, ignore_errors=True)
+        self.manager.forget(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def __repr__(self):
+        return f'<Workspace {self.name} refs={self._refs}>'
+
+
+class WorkspaceManager:
+    """Creates per-run workspaces and accounts for shared fast storage"""
+
+    def __init__(self, root, fast_root=None, quota=DEFAULT_QUOTA_BYTES, fast_reserve=DEFAULT_FAST_RESERVE):
+        """
+        Initialize workspace manager
+
+        Args:
+            root (str): Disk directory workspaces are created in
+            fast_root (str): Optional faster directory (e.g. tmpfs under /dev/shm)
+            quota (int): Per-workspace byte limit (None or 0: unlimited)
+            fast_reserve (int): Bytes always left free on the fast root
+        """
+        self.root = root
+        self.fast_root = fast_root
+        self.quota = quota or None
+        self.fast_reserve = fast_reserve
+        self.stats = {'created': 0, 'fast_files': 0, 'spilled_files': 0}
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def create(self, prefix='job'):
+        """
+        New empty workspace holding one reference
+
+        Args:
+            prefix (str): Directory name prefix (lowercase letters), for debugging
+
+        Returns:
+            Workspace: Release it (or use it as a context manager) when done
+        """
+        os.makedirs(self.root, exist_ok=True)
+        if self.fast_root:
+            os.makedirs(self.fast_root, exist_ok=True)
+        workspace = Workspace(self, f'{prefix}_{uuid.uuid4().hex[:12]}', self.quota)
+        with self._lock:
+            self._active[workspace.name] = workspace
+            self.stats['created'] += 1
+        return workspace
+
+    def reserve_fast(self, workspace, size):
+        """
+        Claim room for a file on the fast root
+
+        Free space is checked against what live workspaces have already
+        claimed, so concurrent runs cannot overcommit a small tmpfs.
+
+        Args:
+            workspace (Workspace): Claiming workspace
+            size (int): Expected bytes
+
+        Returns:
+            bool: True if the file should go on the fast root
+        """
+        if not self.fast_root:
+            return False
+        with self._lock:
+            try:
+                free = shutil.disk_usage(self.fast_root).free
+            except OSError:
+                free = 0
+            claimed = sum(w.reserved for w in self._active.values())
+            # Claims already partly written count twice here, which only errs towards disk
+            if free - claimed - self.fast_reserve < size:
+                self.stats['spilled_files'] += 1
+                return False
+            workspace.reserved += size
+            self.stats['fast_files'] += 1
+            return True
+
+    def forget(self, workspace):
+        """Drop a cleaned-up workspace from accounting"""
+        with self._lock:
+            self._active.pop(workspace.name, None)
+
+    def purge(self):
+        """
+        Delete leftover workspaces from earlier processes
+
+        Only directories named like workspaces are removed, so anything
+        else sharing the roots (e.g. other files in ``WORKSPACE_FAST_DIR``)
+        is left alone. Only safe while no other process shares the roots
+        (local server start), since their live workspaces look the same.
+        """
+        with self._lock:
+            live = set(self._active)
+        for root in filter(None, (self.root, self.fast_root)):
+            if not os.path.isdir(root):
+                continue
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                if name not in live and _NAME_RE.match(name) and os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def snapshot(self):
+        """
+        Counters and usage for monitoring
+
+        Returns:
+            dict: Active workspaces, fast-root claims and spill counts
+        """
+        with self._lock:
+            active = list(self._active.values())
+            stats = dict(self.stats)
+        return {
+            **stats,
+            'active': len(active),
+            'fast_root': self.fast_root,
+            'fast_reserved_bytes': sum(w.reserved for w in active)
+        }
+
+
+def workspaces_from_env(root):
+    """
+    Workspace manager configured from the environment
+
+    ``WORKSPACE_FAST_DIR`` enables fast scratch (e.g. ``/dev/shm/media``),
+    ``WORKSPACE_QUOTA_BYTES`` sets the per-run limit and
+    ``WORKSPACE_FAST_RESERVE`` the bytes kept free on the fast root.
+
+    Args:
+        root (str): Disk directory for workspaces
+
+    Returns:
+        WorkspaceManager: New manager
+    """
+    return WorkspaceManager(
+        root,
+        fast_root=os.environ.get('WORKSPACE_FAST_DIR') or None,
+        quota=int(os.environ.get('WORKSPACE_QUOTA_BYTES', DEFAULT_QUOTA_BYTES)),
+        fast_reserve=int(os.environ.get('WORKSPACE_FAST_RESERVE', DEFAULT_FAST_RESERVE))
+    )